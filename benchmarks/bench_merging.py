@@ -0,0 +1,101 @@
+"""
+Storage / serialization savings of merge_extractions over plain concatenation.
+
+    python -m benchmarks.bench_merging                 # synthetic 3-extractor docs
+    python -m benchmarks.bench_merging --pdf a.pdf b.pdf  # real extractor output (DocAI if configured)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from src.pdf_ingestion.normalizer.builders import build_super_json
+from src.pdf_ingestion.normalizer.merging import merge_extractions
+
+WORDS = (
+    "agreement supplier shall provide services client payment term invoice days "
+    "party notice termination renewal liability warranty confidential schedule"
+).split()
+
+
+def concatenate(*datas: Dict[str, Any]) -> Dict[str, Any]:
+    """The previous merge behaviour: every span and table from every tool."""
+    return {
+        "meta": {"num_pages": max(d["meta"].get("num_pages") or 0 for d in datas)},
+        "text_spans": [s for d in datas for s in d.get("text_spans", [])],
+        "tables": [t for d in datas for t in d.get("tables", [])],
+    }
+
+
+def synthetic_extractions(num_pages: int, seed: int = 0) -> Tuple[dict, dict, dict]:
+    """Three tools reading the same document with small differences."""
+    rng = random.Random(seed)
+    per_tool: Dict[str, Dict[str, List[dict]]] = {t: {"text_spans": [], "tables": []} for t in ("pdfplumber", "pymupdf", "docai")}
+    for page in range(1, num_pages + 1):
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(40))
+        for tool, spans in per_tool.items():
+            variant = text.replace(" ", "  ") if tool == "pdfplumber" else text
+            spans["text_spans"].append({"page": page, "text": variant, "bbox": None, "source": tool})
+        if page % 5 == 0:
+            cells = [{"row": r, "col": c, "text": f"{rng.choice(WORDS)} {r}.{c}"} for r in range(20) for c in range(5)]
+            for tool in ("pdfplumber", "docai"):
+                per_tool[tool]["tables"].append({"page": page, "cells": cells, "source": tool})
+    return tuple(
+        {"meta": {"num_pages": num_pages, "tool": tool}, **data}
+        for tool, data in per_tool.items()
+    )
+
+
+def real_extractions(pdf_path: str) -> Tuple[dict, dict, dict]:
+    from src.pipeline.steps import run_extraction
+
+    return run_extraction(pdf_path)
+
+
+def measure(name: str, merged: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    super_json = build_super_json(merged, doc_id="bench", filename="bench.pdf", source_path="bench.pdf")
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    encoded = json.dumps(super_json.model_dump(), ensure_ascii=False)
+    serialize_s = time.perf_counter() - started
+
+    return {
+        "variant": name,
+        "text_spans": len(merged["text_spans"]),
+        "tables": len(merged["tables"]),
+        "json_bytes": len(encoded.encode("utf-8")),
+        "build_ms": round(build_s * 1000, 1),
+        "serialize_ms": round(serialize_s * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", help="Benchmark real PDFs instead of synthetic docs")
+    parser.add_argument("--pages", type=int, nargs="*", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    cases = [(p, real_extractions(p)) for p in args.pdf] if args.pdf else [
+        (f"synthetic-{n}p", synthetic_extractions(n)) for n in args.pages
+    ]
+
+    for label, extractions in cases:
+        started = time.perf_counter()
+        merged = merge_extractions(*extractions)
+        merge_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        before = measure("concatenate", concatenate(*extractions))
+        after = measure("merge_extractions", merged)
+        saving = 1 - after["json_bytes"] / before["json_bytes"] if before["json_bytes"] else 0.0
+        print(f"{label}: merge {merge_ms} ms, JSON {saving:.0%} smaller")
+        for row in (before, after):
+            print("   ", json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
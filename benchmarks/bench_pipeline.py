@@ -0,0 +1,324 @@
+"""
+Offline pipeline benchmark: synthetic contracts + fake DocAI / BigQuery /
+Gemini (see benchmarks.synthetic and benchmarks.fakes).
+
+    python -m benchmarks.bench_pipeline                          # all scenarios
+    python -m benchmarks.bench_pipeline --scenarios single --pages 1 50 300 1000
+    python -m benchmarks.bench_pipeline --batch-docs 20 --workers 4 --gemini-latency 2
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/<earlier>.json
+
+Scenarios, each run in a fresh interpreter (so peak RSS is its own):
+- single:   process_single_pdf on one document per --pages size
+- batch:    process_batch over --batch-docs documents of --batch-pages pages
+- metadata: extract_and_store_contract_metadata for every doc of a batch
+For each: wall time, documents / pages per second, per-stage call count,
+latency percentiles and throughput, peak RSS of the process and of its
+pool workers. Results are written to benchmarks/results/ (one JSON file
+per run, named after the time and git commit) for comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+RESULT_PREFIX = "BENCH_RESULT "
+
+# Offline and uncached, so every run does the full work
+BENCH_ENV = {
+    "EXTRACTION_CACHE_ENABLED": "false",
+    "LLM_CACHE_ENABLED": "false",
+    "GEMINI_RPM": "0",
+    "GEMINI_TPM": "0",
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class StageTimer:
+    """Times calls to pipeline functions, per stage name, from any thread."""
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, module: Any, attr: str, stage: str) -> None:
+        func = getattr(module, attr)
+
+        @wraps(func)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.durations.setdefault(stage, []).append(elapsed)
+
+        setattr(module, attr, timed)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.durations = {}
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            durations = {k: list(v) for k, v in self.durations.items()}
+        return {
+            stage: {
+                "calls": len(values),
+                "busy_s": round(sum(values), 3),
+                "per_busy_s": round(len(values) / sum(values), 2) if sum(values) else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+            }
+            for stage, values in durations.items()
+        }
+
+
+def instrument() -> StageTimer:
+    """Time the stages of step 1 and step 2 where the pipeline calls them."""
+    from src.pipeline import metadata_pipeline, steps
+
+    timer = StageTimer()
+    timer.wrap(steps, "run_extraction", "extract")
+    timer.wrap(steps, "run_docai_extraction", "docai")
+    timer.wrap(steps, "merge_extractions", "merge")
+    timer.wrap(steps, "build_super_json", "build")
+    timer.wrap(steps, "encode_super_json", "serialize")
+    timer.wrap(steps, "write_processed_json", "write_local")
+    timer.wrap(steps, "save_super_json", "store_bq")
+    timer.wrap(metadata_pipeline, "get_super_json_record", "bq_read")
+    timer.wrap(metadata_pipeline, "generate_contract_metadata", "llm")
+    return timer
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux; for children it is the largest one
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """One scenario, in this (fresh) process. spec comes from the parent."""
+    from benchmarks.fakes import FakeBigQueryClient, FakeDocAIClient, FakeGeminiClient, install_fakes
+    from benchmarks.synthetic import make_contract_pdf
+    from src.pipeline.run_pipeline import process_batch, process_single_pdf
+    from src.storage.bq_writer import flush_all_writers
+
+    latency = spec["latency"]
+    fakes = install_fakes(
+        docai=FakeDocAIClient(latency["docai"], latency["docai_page"]),
+        bigquery=FakeBigQueryClient(latency["bq_insert"], latency["bq_query"]),
+        gemini=FakeGeminiClient(latency["gemini"]),
+    )
+    timer = instrument()
+    scenario = spec["scenario"]
+    result: Dict[str, Any] = {"scenario": scenario, "label": spec["label"]}
+
+    if scenario == "single":
+        pdf = make_contract_pdf("input/single.pdf", spec["pages"], seed=spec["seed"])
+        timer.reset()
+        started = time.perf_counter()
+        process_single_pdf("input/single.pdf", to_bigquery=True)
+        wall = time.perf_counter() - started
+        result.update(docs=1, pages=sum(pdf.values()))
+
+    else:
+        pages = 0
+        for i in range(spec["docs"]):
+            pages += sum(make_contract_pdf(f"input/contract-{i}.pdf", spec["pages"], seed=spec["seed"] + i).values())
+        timer.reset()
+        started = time.perf_counter()
+        summary = process_batch("input", to_bigquery=True, workers=spec["workers"])
+        wall = time.perf_counter() - started
+        result.update(docs=summary["succeeded"], failed=summary["failed"], pages=pages)
+
+        if scenario == "metadata":
+            from src.pipeline.metadata_pipeline import extract_and_store_contract_metadata
+
+            doc_ids = sorted({r["doc_id"] for table, rows in fakes["bigquery"].rows.items() for r in rows
+                              if table.endswith("super_json_docs")})
+            timer.reset()
+            failed = 0
+            started = time.perf_counter()
+            for doc_id in doc_ids:
+                try:
+                    extract_and_store_contract_metadata(doc_id)
+                except Exception as e:
+                    failed += 1
+                    print(f"[Bench] metadata failed for {doc_id}: {e}")
+            flush_all_writers()
+            wall = time.perf_counter() - started
+            result.update(docs=len(doc_ids) - failed, failed=failed)
+
+    result.update(
+        wall_s=round(wall, 3),
+        docs_per_s=round(result["docs"] / wall, 3) if wall else 0.0,
+        pages_per_s=round(result["pages"] / wall, 2) if wall and scenario != "metadata" else None,
+        stages=timer.report(),
+        service_calls={
+            "docai_requests": fakes["docai"].requests,
+            "docai_pages": fakes["docai"].pages,
+            "bq_insert_requests": fakes["bigquery"].insert_requests,
+            "gemini_requests": fakes["gemini"].requests,
+        },
+        peak_rss_mb=peak_rss_mb(),
+    )
+    return result
+
+
+def run_scenario(spec: Dict[str, Any], verbose: bool) -> Dict[str, Any]:
+    """Run spec in a fresh interpreter, inside a scratch working directory."""
+    env = {**os.environ, **BENCH_ENV, "PYTHONPATH": str(REPO_ROOT)}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pipeline", "--worker", json.dumps(spec)],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if verbose or proc.returncode != 0:
+        sys.stdout.write(proc.stdout)
+        sys.stderr.write(proc.stderr)
+    if proc.returncode != 0:
+        raise SystemExit(f"Scenario {spec['label']} failed (exit {proc.returncode})")
+    line = next(l for l in reversed(proc.stdout.splitlines()) if l.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_result(result: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    line = (
+        f"{result['label']}: {result['wall_s']:.2f}s, {result['docs_per_s']:.2f} docs/s"
+        + (f", {result['pages_per_s']:.1f} pages/s" if result.get("pages_per_s") else "")
+        + f", peak RSS {result['peak_rss_mb']['self']:.0f} MB (workers {result['peak_rss_mb']['children']:.0f} MB)"
+    )
+    if previous:
+        change = (result["wall_s"] - previous["wall_s"]) / previous["wall_s"] if previous["wall_s"] else 0.0
+        line += f"  [{change:+.0%} wall vs baseline]"
+    print(line)
+    for stage, stats in sorted(result["stages"].items(), key=lambda kv: -kv[1]["busy_s"]):
+        print(
+            f"    {stage:<12} {stats['calls']:>5} calls  {stats['busy_s']:>8.2f}s busy  "
+            f"{stats['per_busy_s']:>8.2f}/s  p50 {stats['p50_ms']:>8.1f}ms  "
+            f"p95 {stats['p95_ms']:>8.1f}ms  p99 {stats['p99_ms']:>8.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--scenarios", nargs="+", choices=["single", "batch", "metadata"],
+                        default=["single", "batch", "metadata"])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 300],
+                        help="Page counts for the single-document scenario")
+    parser.add_argument("--batch-docs", type=int, default=10)
+    parser.add_argument("--batch-pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2, help="process_batch workers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--docai-latency", type=float, default=0.3, help="Seconds per DocAI request")
+    parser.add_argument("--docai-page-latency", type=float, default=0.05, help="Extra seconds per DocAI page")
+    parser.add_argument("--bq-latency", type=float, default=0.1, help="Seconds per BigQuery insert request")
+    parser.add_argument("--bq-query-latency", type=float, default=0.5, help="Seconds per BigQuery query")
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="Seconds per Gemini request")
+    parser.add_argument("--compare", help="Earlier results file to compare wall times against")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a results file")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline output")
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(json.loads(args.worker))
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    latency = {
+        "docai": args.docai_latency,
+        "docai_page": args.docai_page_latency,
+        "bq_insert": args.bq_latency,
+        "bq_query": args.bq_query_latency,
+        "gemini": args.gemini_latency,
+    }
+    specs: List[Dict[str, Any]] = []
+    if "single" in args.scenarios:
+        specs += [
+            {"scenario": "single", "label": f"single-{n}p", "pages": n, "seed": args.seed, "latency": latency}
+            for n in args.pages
+        ]
+    for scenario in ("batch", "metadata"):
+        if scenario in args.scenarios:
+            specs.append({
+                "scenario": scenario,
+                "label": f"{scenario}-{args.batch_docs}x{args.batch_pages}p-w{args.workers}",
+                "docs": args.batch_docs,
+                "pages": args.batch_pages,
+                "workers": args.workers,
+                "seed": args.seed,
+                "latency": latency,
+            })
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["label"]: r for r in json.load(f)["results"]}
+
+    results = []
+    for spec in specs:
+        result = run_scenario(spec, args.verbose)
+        print_result(result, baseline.get(result["label"]))
+        results.append(result)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        revision = git_revision()
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        out_path = RESULTS_DIR / f"{stamp}-{revision}.json"
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "revision": revision,
+                    "created_at": stamp,
+                    "python": sys.version.split()[0],
+                    "cpu_count": os.cpu_count(),
+                    "args": {k: v for k, v in vars(args).items() if k not in ("worker", "compare")},
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+In-process stand-ins for Document AI, BigQuery and Gemini, with
+configurable latency, so the pipeline can be benchmarked offline.
+
+install_fakes() points settings at fake projects and registers the fakes
+in src.clients.registry under the names the real clients use. Only the
+calling process is affected: worker processes of a pool only run the
+local extractors, which need no client.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+from google.api_core.exceptions import NotFound
+
+from config.settings import settings
+from src.clients.registry import register_client
+
+
+def _sleep(base_s: float, jitter: float = 0.2) -> None:
+    if base_s > 0:
+        time.sleep(base_s * random.uniform(1 - jitter, 1 + jitter))
+
+
+class FakeDocAIClient:
+    """
+    process_document() returns a Document-shaped object with one layout
+    per page (text referenced through text_anchor segments, like DocAI).
+    Latency: latency_s per request + page_latency_s per page.
+    """
+
+    def __init__(self, latency_s: float = 0.3, page_latency_s: float = 0.05) -> None:
+        self.latency_s = latency_s
+        self.page_latency_s = page_latency_s
+        self.requests = 0
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def processor_path(self, project: str, location: str, processor: str) -> str:
+        return f"projects/{project}/locations/{location}/processors/{processor}"
+
+    def process_document(self, request: Any) -> Any:
+        with fitz.open(stream=request.raw_document.content, filetype="pdf") as doc:
+            num_pages = doc.page_count
+        with self._lock:
+            self.requests += 1
+            self.pages += num_pages
+        _sleep(self.latency_s + self.page_latency_s * num_pages)
+
+        text = ""
+        pages = []
+        for i in range(num_pages):
+            page_text = f"OCR page {i + 1}: " + "scanned contract text " * 40 + "\n"
+            segment = SimpleNamespace(start_index=len(text), end_index=len(text) + len(page_text))
+            text += page_text
+            layout = SimpleNamespace(text_anchor=SimpleNamespace(content="", text_segments=[segment]))
+            pages.append(SimpleNamespace(layout=layout, tables=[]))
+        return SimpleNamespace(document=SimpleNamespace(text=text, pages=pages))
+
+
+class _FakeRow(dict):
+    """Rows are read both as row["col"] and row.col by callers."""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+
+class _FakeQueryJob:
+    def __init__(self, rows: List[Dict[str, Any]], latency_s: float) -> None:
+        self._rows = rows
+        self._latency_s = latency_s
+        self.total_bytes_processed = sum(len(json.dumps(r, default=str)) for r in rows)
+
+    def result(self, page_size: Optional[int] = None) -> Iterator[_FakeRow]:
+        _sleep(self._latency_s)
+        return iter([_FakeRow(r) for r in self._rows])
+
+
+class FakeBigQueryClient:
+    """
+    Keeps tables in memory. insert_rows_json() appends rows; query() only
+    understands the super_json reads of src.storage.super_json_reader
+    (by doc_id / doc_ids / ingested_since, optionally excluding docs with
+    metadata, and projections from the structured child tables).
+    """
+
+    def __init__(self, insert_latency_s: float = 0.1, query_latency_s: float = 0.5) -> None:
+        self.insert_latency_s = insert_latency_s
+        self.query_latency_s = query_latency_s
+        self.datasets: Dict[str, Any] = {}
+        self.tables: Dict[str, Any] = {}
+        self.rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.insert_requests = 0
+        self._lock = threading.Lock()
+
+    def get_dataset(self, dataset_ref: Any) -> Any:
+        if str(dataset_ref) not in self.datasets:
+            raise NotFound(f"dataset {dataset_ref}")
+        return self.datasets[str(dataset_ref)]
+
+    def create_dataset(self, dataset: Any, exists_ok: bool = False) -> Any:
+        key = f"{dataset.project}.{dataset.dataset_id}"
+        self.datasets.setdefault(key, dataset)
+        return self.datasets[key]
+
+    def get_table(self, table_ref: Any) -> Any:
+        key = table_ref if isinstance(table_ref, str) else f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}"
+        if key not in self.tables:
+            raise NotFound(f"table {key}")
+        return self.tables[key]
+
+    def create_table(self, table: Any, exists_ok: bool = False) -> Any:
+        key = f"{table.project}.{table.dataset_id}.{table.table_id}"
+        self.tables.setdefault(key, table)
+        return self.tables[key]
+
+    def update_table(self, table: Any, fields: List[str]) -> Any:
+        return table
+
+    def insert_rows_json(self, table: str, rows: List[Dict[str, Any]], row_ids: Any = None) -> List[Any]:
+        _sleep(self.insert_latency_s)
+        with self._lock:
+            self.insert_requests += 1
+            self.rows.setdefault(str(table), []).extend(rows)
+        return []
+
+    def query(self, query: str, job_config: Any = None) -> _FakeQueryJob:
+        params = {p.name: getattr(p, "value", None) or getattr(p, "values", None) for p in getattr(job_config, "query_parameters", [])}
+        with self._lock:
+            tables = {table.rsplit(".", 1)[-1]: list(rows) for table, rows in self.rows.items()}
+        docs = tables.get(settings.BQ_TABLE, [])
+        done = {r["doc_id"] for r in tables.get("contract_metadata", [])}
+
+        wanted = None
+        if "doc_id" in params:
+            wanted = {params["doc_id"]}
+        elif "doc_ids" in params:
+            wanted = set(params["doc_ids"])
+
+        since = params.get("ingested_since")
+        latest: Dict[str, Dict[str, Any]] = {}
+        for row in docs:
+            if wanted is not None and row["doc_id"] not in wanted:
+                continue
+            if since is not None and not (
+                row.get("ingested_at")
+                and datetime.datetime.fromisoformat(row["ingested_at"]).replace(tzinfo=datetime.timezone.utc) >= since
+            ):
+                continue
+            if "NOT EXISTS" in query and row["doc_id"] in done:
+                continue
+            current = latest.get(row["doc_id"])
+            if current is None or (row.get("ingested_at") or "") > (current.get("ingested_at") or ""):
+                latest[row["doc_id"]] = row
+
+        selected = list(latest.values())
+        if "structured IS TRUE" in query:
+            selected = [r for r in selected if r.get("structured")]
+        elif "structured IS NOT TRUE" in query:
+            selected = [r for r in selected if not r.get("structured")]
+        if "ARRAY_AGG" in query:
+            selected = [self._projection(row, tables, query, params.get("pages")) for row in selected]
+        return _FakeQueryJob(selected, self.query_latency_s)
+
+    @staticmethod
+    def _projection(
+        doc: Dict[str, Any],
+        tables: Dict[str, List[Dict[str, Any]]],
+        query: str,
+        pages: Optional[List[int]],
+    ) -> Dict[str, Any]:
+        def children(table: str, order_key: str) -> List[Dict[str, Any]]:
+            rows = [
+                r for r in tables.get(table, [])
+                if r["doc_id"] == doc["doc_id"] and r["ingested_at"] == doc["ingested_at"]
+                and (pages is None or r["page"] in pages)
+            ]
+            return sorted(rows, key=lambda r: (r["page"], r[order_key]))
+
+        spans = [
+            {"page": r["page"], "source": r["source"], "text": r["text"]}
+            for r in children("super_json_text_spans", "span_index")
+            if r["canonical"] or "t.canonical" not in query
+        ]
+        doc_tables = [
+            {"page": r["page"], "source": r["source"], "rows_json": r["rows_json"]}
+            for r in children("super_json_tables", "table_index")
+        ]
+        return {
+            **{key: doc[key] for key in ("doc_id", "filename", "source_path", "num_pages")},
+            "text_spans": spans or None,
+            "tables": doc_tables or None,
+        }
+
+
+class FakeGeminiClient:
+    """
+    client.models.generate_content() returns a fixed metadata JSON after
+    latency_s plus output_tokens_per_s worth of "generation" time.
+    """
+
+    def __init__(self, latency_s: float = 1.0, output_tokens_per_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self.output_tokens_per_s = output_tokens_per_s
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model: str, contents: str) -> Any:
+        with self._lock:
+            self.requests += 1
+        output = {
+            "supplier_legal_name": "Supplier Ltd",
+            "supplier_names": "Supplier",
+            "effective_date": "2024-01-01",
+            "agreement_type": "MSA",
+            "is_evergreen": False,
+            "expiration_email_recipients": [],
+        }
+        text = json.dumps(output)
+        generation_s = len(text) / 4 / self.output_tokens_per_s if self.output_tokens_per_s else 0.0
+        _sleep(self.latency_s + generation_s)
+        usage = SimpleNamespace(total_token_count=len(contents) // 4 + len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def install_fakes(
+    docai: Optional[FakeDocAIClient] = None,
+    bigquery: Optional[FakeBigQueryClient] = None,
+    gemini: Optional[FakeGeminiClient] = None,
+) -> Dict[str, Any]:
+    """
+    Configure settings for fake projects and register the fakes (defaults
+    if not given). Returns the installed fakes by service name.
+    """
+    docai = docai or FakeDocAIClient()
+    bigquery = bigquery or FakeBigQueryClient()
+    gemini = gemini or FakeGeminiClient()
+
+    settings.DOC_AI_PROJECT_ID = settings.DOC_AI_PROJECT_ID or "bench-project"
+    settings.DOC_AI_PROCESSOR_ID = settings.DOC_AI_PROCESSOR_ID or "bench-processor"
+    settings.GCP_PROJECT_ID = settings.GCP_PROJECT_ID or "bench-project"
+    settings.GEMINI_API_KEY = settings.GEMINI_API_KEY or "bench-key"
+
+    # Same names the real factories use (see _docai_client, get_bq_client, gemini _get_client)
+    register_client(f"docai:{settings.DOC_AI_LOCATION}-documentai.googleapis.com", docai)
+    register_client(f"bigquery:{settings.GCP_PROJECT_ID}", bigquery)
+    fingerprint = hashlib.sha256(settings.GEMINI_API_KEY.encode("utf-8")).hexdigest()[:12]
+    register_client(f"gemini:{fingerprint}", gemini)
+
+    return {"docai": docai, "bigquery": bigquery, "gemini": gemini}
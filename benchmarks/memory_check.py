@@ -0,0 +1,144 @@
+"""
+Memory regression check: peak RSS of each extractor must not grow with
+the page count of the document.
+
+    python -m benchmarks.memory_check
+    python -m benchmarks.memory_check --pages 20 1000 --budget-mb 32
+
+Every check reads a small and a large synthetic contract (see
+benchmarks.synthetic), each in a fresh interpreter, and measures how far
+the peak RSS rose above the RSS after imports. The check fails (exit 1)
+if the large document needs more than --budget-mb over the small one.
+The streaming extractors are consumed page by page without keeping the
+output; DocAI goes through the fake client (see benchmarks.fakes) with
+the configured chunk size, so only chunking and parsing are measured.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "MEMORY_RESULT "
+
+
+def _pdfplumber(pdf_path: str) -> int:
+    from src.pdf_ingestion.extractors.pdfplumber_extractor import iter_pdfplumber_pages
+
+    return sum(1 for _ in iter_pdfplumber_pages(pdf_path))
+
+
+def _pymupdf(pdf_path: str) -> int:
+    from src.pdf_ingestion.extractors.pymupdf_extractor import iter_pymupdf_pages
+
+    return sum(1 for _ in iter_pymupdf_pages(pdf_path))
+
+
+def _routing(pdf_path: str) -> int:
+    from src.pdf_ingestion.routing import plan_extraction
+
+    plan, _ = plan_extraction(pdf_path)
+    return plan["num_pages"]
+
+
+def _docai(pdf_path: str) -> int:
+    from benchmarks.fakes import FakeDocAIClient, install_fakes
+    from src.pdf_ingestion.extractors.docai_extractor import process_with_docai
+
+    install_fakes(docai=FakeDocAIClient(latency_s=0.0, page_latency_s=0.0))
+    return process_with_docai(pdf_path)["meta"].get("pages_sent", 0)
+
+
+CHECKS: Dict[str, Callable[[str], int]] = {
+    "pdfplumber": _pdfplumber,
+    "pymupdf": _pymupdf,
+    "routing": _routing,
+    "docai": _docai,
+}
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """One check on one PDF, in this (fresh) process."""
+    check = CHECKS[spec["check"]]
+    # Import everything first: only the extraction itself should count
+    import benchmarks.fakes  # noqa: F401
+    import src.pdf_ingestion.extractors.docai_extractor  # noqa: F401
+    import src.pdf_ingestion.extractors.pdfplumber_extractor  # noqa: F401
+    import src.pdf_ingestion.routing  # noqa: F401
+
+    before = _rss_mb()
+    pages = check(spec["pdf"])
+    return {"pages": pages, "growth_mb": round(_rss_mb() - before, 1)}
+
+
+def measure(check: str, pdf_path: str) -> Dict[str, Any]:
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    spec = json.dumps({"check": check, "pdf": pdf_path})
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory_check", "--worker", spec],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stdout.write(proc.stdout)
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Check {check} failed on {pdf_path} (exit {proc.returncode})")
+    line = next(l for l in reversed(proc.stdout.splitlines()) if l.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--checks", nargs="+", choices=list(CHECKS), default=list(CHECKS))
+    parser.add_argument("--pages", type=int, nargs=2, default=[20, 300], metavar=("SMALL", "LARGE"),
+                        help="Page counts of the small and large documents")
+    parser.add_argument("--budget-mb", type=float, default=32.0,
+                        help="Allowed extra peak RSS for the large document over the small one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(RESULT_PREFIX + json.dumps(run_worker(json.loads(args.worker))))
+        return
+
+    from benchmarks.synthetic import make_contract_pdf
+
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="memcheck-") as workdir:
+        small, large = (str(Path(workdir) / f"contract-{n}p.pdf") for n in args.pages)
+        make_contract_pdf(small, args.pages[0], seed=args.seed)
+        make_contract_pdf(large, args.pages[1], seed=args.seed)
+
+        print(f"{'check':<12} {f'{args.pages[0]}p MB':>10} {f'{args.pages[1]}p MB':>10} {'budget MB':>10}  result")
+        for check in args.checks:
+            small_result = measure(check, small)
+            large_result = measure(check, large)
+            extra_mb = large_result["growth_mb"] - small_result["growth_mb"]
+            ok = extra_mb <= args.budget_mb
+            failed = failed or not ok
+            print(
+                f"{check:<12} {small_result['growth_mb']:>10.1f} {large_result['growth_mb']:>10.1f} "
+                f"{args.budget_mb:>10.0f}  {'ok' if ok else f'grows by {extra_mb:.0f} MB'}"
+            )
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
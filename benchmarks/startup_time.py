@@ -0,0 +1,113 @@
+"""
+Cold-start import budget for the CLI, checked with `python -X importtime`.
+
+    python -m benchmarks.startup_time                    # exit 1 on regression
+    python -m benchmarks.startup_time --budget-scale 2   # slower machine / CI
+    python -m benchmarks.startup_time --json startup.json
+
+Each subcommand's entry module is imported in a fresh interpreter. A check
+fails when its cumulative import time (median of --repeat runs) goes over
+budget, or when it imports a heavy library it does not need (e.g. `--help`
+loading PyMuPDF, step 1 loading the Gemini SDK).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+PDF_LIBS = ("pdfplumber", "fitz")
+DOCAI = "google.cloud.documentai_v1"
+GEMINI = "google.genai"
+BIGQUERY = "google.cloud.bigquery"
+
+# name -> (module imported first by the subcommand, budget in ms, modules it must not import)
+CHECKS: Dict[str, Tuple[str, float, Tuple[str, ...]]] = {
+    "cli --help": ("src.cli.main", 50, PDF_LIBS + (DOCAI, GEMINI, BIGQUERY, "pydantic")),
+    "process-pdf / process-batch": ("src.pipeline.run_pipeline", 1200, (DOCAI, GEMINI)),
+    "run": ("src.pipeline.streaming", 1200, (DOCAI, GEMINI)),
+    # The pipeline is only imported once the first new files show up
+    "watch": ("src.pipeline.watch", 300, PDF_LIBS + (DOCAI, GEMINI, BIGQUERY)),
+    "extract-metadata": ("src.pipeline.metadata_pipeline", 800, PDF_LIBS + (DOCAI, GEMINI)),
+    "init-storage": ("src.storage.bootstrap", 600, PDF_LIBS + (DOCAI, GEMINI)),
+}
+
+
+def import_profile(module: str) -> Tuple[float, Set[str]]:
+    """(cumulative import time of `module` in ms, every module it loaded)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = 0
+    loaded: Set[str] = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        loaded.add(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000.0, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts per check (median is used)")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply every budget by this")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results: List[Dict[str, object]] = []
+    failed = False
+    print(f"{'check':<30} {'median ms':>10} {'budget ms':>10}  result")
+    for name, (module, budget_ms, forbidden) in CHECKS.items():
+        timings = []
+        loaded: Set[str] = set()
+        for _ in range(max(1, args.repeat)):
+            elapsed_ms, loaded = import_profile(module)
+            timings.append(elapsed_ms)
+        median_ms = statistics.median(timings)
+        budget_ms *= args.budget_scale
+        unwanted = sorted(m for m in forbidden if m in loaded)
+
+        problems = []
+        if median_ms > budget_ms:
+            problems.append("over budget")
+        if unwanted:
+            problems.append("imports " + ", ".join(unwanted))
+        failed = failed or bool(problems)
+        print(f"{name:<30} {median_ms:>10.1f} {budget_ms:>10.0f}  {'; '.join(problems) or 'ok'}")
+        results.append(
+            {
+                "check": name,
+                "module": module,
+                "median_ms": round(median_ms, 1),
+                "budget_ms": budget_ms,
+                "unwanted_imports": unwanted,
+                "ok": not problems,
+            }
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Synthetic contract PDFs for benchmarks: digital text pages, ruled tables
+(price schedules) and scanned pages (text rendered to an image, no text
+layer), in a reproducible mix.
+
+    python -m benchmarks.synthetic --out /tmp/contracts --pages 1 50 300 1000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+WORDS = (
+    "agreement supplier shall provide services client payment term invoice days "
+    "party notice termination renewal liability warranty confidential schedule "
+    "effective date governing law amendment exhibit pricing delivery obligations"
+).split()
+
+# Share of each page kind in a generated contract (the first page is a cover)
+DEFAULT_MIX = {"text": 0.7, "table": 0.15, "scanned": 0.15}
+
+PAGE_RECT = fitz.paper_rect("letter")
+MARGIN = 54
+
+
+def _paragraphs(rng: random.Random, count: int, words: int = 60) -> str:
+    return "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+        for _ in range(count)
+    )
+
+
+def _text_page(page: fitz.Page, rng: random.Random, number: int) -> None:
+    body = fitz.Rect(MARGIN, MARGIN, PAGE_RECT.width - MARGIN, PAGE_RECT.height - MARGIN)
+    page.insert_text((MARGIN, MARGIN - 20), "MASTER SERVICES AGREEMENT - CONFIDENTIAL", fontsize=8)
+    page.insert_textbox(body, f"Section {number}\n\n" + _paragraphs(rng, 5), fontsize=10)
+    page.insert_text((PAGE_RECT.width / 2 - 20, PAGE_RECT.height - 30), f"Page {number}", fontsize=8)
+
+
+def _table_page(page: fitz.Page, rng: random.Random, number: int, rows: int = 25, cols: int = 5) -> None:
+    # One Shape per page: a commit per line / cell would rewrite the page each time
+    shape = page.new_shape()
+    shape.insert_text((MARGIN, MARGIN), f"Schedule {number}: pricing", fontsize=12)
+    top = MARGIN + 20
+    cell_w = (PAGE_RECT.width - 2 * MARGIN) / cols
+    cell_h = 22
+    for r in range(rows + 1):
+        y = top + r * cell_h
+        shape.draw_line((MARGIN, y), (MARGIN + cols * cell_w, y))
+    for c in range(cols + 1):
+        x = MARGIN + c * cell_w
+        shape.draw_line((x, top), (x, top + rows * cell_h))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    for r in range(rows):
+        for c in range(cols):
+            text = f"SKU-{number}-{r}" if c == 0 else (
+                f"{rng.uniform(1, 9999):.2f}" if c >= cols - 2 else rng.choice(WORDS)
+            )
+            shape.insert_text((MARGIN + c * cell_w + 4, top + r * cell_h + 15), text, fontsize=9)
+    shape.commit()
+
+
+def _scan_image(rng: random.Random) -> bytes:
+    """A page of text rendered to a grayscale PNG, like a scanner would."""
+    with fitz.open() as doc:
+        page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        _text_page(page, rng, 0)
+        return page.get_pixmap(dpi=100, colorspace=fitz.csGRAY).tobytes("png")
+
+
+def page_kinds(num_pages: int, mix: Optional[Dict[str, float]] = None, seed: int = 0) -> List[str]:
+    """Kind of every page: 'cover' first, then a seeded draw from mix."""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    return ["cover"] + rng.choices(kinds, weights=weights, k=max(0, num_pages - 1))
+
+
+def make_contract_pdf(
+    path: str,
+    num_pages: int,
+    mix: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """Write a synthetic contract to path. Returns the page count per kind."""
+    rng = random.Random(seed)
+    kinds = page_kinds(num_pages, mix, seed)
+    scan_xref = 0
+    scan_png: Optional[bytes] = None
+
+    with fitz.open() as doc:
+        for number, kind in enumerate(kinds, start=1):
+            page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+            if kind == "cover":
+                page.insert_text((MARGIN, 200), "MASTER SERVICES AGREEMENT", fontsize=20)
+                page.insert_text((MARGIN, 240), f"between Client Corp and Supplier {seed} Ltd", fontsize=12)
+            elif kind == "text":
+                _text_page(page, rng, number)
+            elif kind == "table":
+                _table_page(page, rng, number)
+            else:
+                # Every scanned page shows the same image, stored once in the file
+                if scan_xref:
+                    page.insert_image(page.rect, xref=scan_xref)
+                else:
+                    scan_png = scan_png or _scan_image(rng)
+                    scan_xref = page.insert_image(page.rect, stream=scan_png)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        doc.save(path, garbage=3, deflate=True)
+
+    counts: Dict[str, int] = {}
+    for kind in kinds:
+        counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Folder for the generated PDFs")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 300, 1000])
+    parser.add_argument("--copies", type=int, default=1, help="Documents per page count (different seeds)")
+    args = parser.parse_args()
+
+    for num_pages in args.pages:
+        for seed in range(args.copies):
+            path = Path(args.out) / f"contract-{num_pages}p-{seed}.pdf"
+            counts = make_contract_pdf(str(path), num_pages, seed=seed)
+            print(f"{path}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,94 @@ class Settings:
     GCP_PROJECT_ID: str = os.getenv("GCP_PROJECT_ID", "")
     BQ_DATASET: str = os.getenv("BQ_DATASET", "pdf_processing")
     BQ_TABLE: str = os.getenv("BQ_TABLE", "super_json_docs")
+    # Streaming inserts are buffered and sent in batches
+    BQ_BATCH_MAX_ROWS: int = int(os.getenv("BQ_BATCH_MAX_ROWS", "500"))
+    BQ_BATCH_MAX_BYTES: int = int(os.getenv("BQ_BATCH_MAX_BYTES", str(9 * 1024 * 1024)))
+    BQ_BATCH_FLUSH_SECONDS: float = float(os.getenv("BQ_BATCH_FLUSH_SECONDS", "5"))
+    BQ_INSERT_MAX_RETRIES: int = int(os.getenv("BQ_INSERT_MAX_RETRIES", "3"))
+    # Also store text spans and tables as rows of child tables
+    # (super_json_text_spans / super_json_tables), so step 2 and other
+    # readers fetch only canonical text or some pages, not the whole document
+    BQ_STRUCTURED_TABLES: bool = os.getenv("BQ_STRUCTURED_TABLES", "true").lower() in ("1", "true", "yes")
+
+    # Where documents and metadata are stored and read back from:
+    # "bigquery", "sqlite" (local file only, works offline) or "mirror"
+    # (BigQuery, with a local SQLite copy that serves doc_id lookups first)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "bigquery")
+    LOCAL_STORE_PATH: str = os.getenv("LOCAL_STORE_PATH", os.path.join("data", "store", "documents.sqlite"))
+
+    # Page-parallel extraction of a single large PDF
+    # 0 = one worker per CPU, 1 = disabled
+    PAGE_PARALLEL_WORKERS: int = int(os.getenv("PAGE_PARALLEL_WORKERS", "0"))
+    PAGE_PARALLEL_MIN_PAGES: int = int(os.getenv("PAGE_PARALLEL_MIN_PAGES", "200"))
+
+    # SuperJSON serialization: "pydantic" (model_dump_json), "orjson" or "json"
+    JSON_ENCODER: str = os.getenv("JSON_ENCODER", "pydantic")
+    # Local copies in data/processed: "json" (compact), "gzip", "zstd" or "pretty"
+    PROCESSED_JSON_FORMAT: str = os.getenv("PROCESSED_JSON_FORMAT", "json")
+    PROCESSED_JSON_COMPRESSION_LEVEL: int = int(os.getenv("PROCESSED_JSON_COMPRESSION_LEVEL", "3"))
+
+    # Per-run metrics: JSON summary + Prometheus textfile ("" disables)
+    METRICS_DIR: str = os.getenv("METRICS_DIR", os.path.join("data", "metrics"))
+
+    # Streaming `run` command: capacity of each queue between stages
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+    # Extractor routing: "adaptive" sends each page only to the extractors it
+    # needs (pdfplumber for table pages, DocAI for scanned pages), "all" runs
+    # every extractor on every page
+    EXTRACTION_ROUTING: str = os.getenv("EXTRACTION_ROUTING", "adaptive")
+    # A page with fewer text-layer characters than this counts as scanned
+    # (if images cover at least ROUTING_MIN_IMAGE_COVERAGE of it) or sparse
+    ROUTING_MIN_TEXT_CHARS: int = int(os.getenv("ROUTING_MIN_TEXT_CHARS", "100"))
+    ROUTING_MIN_IMAGE_COVERAGE: float = float(os.getenv("ROUTING_MIN_IMAGE_COVERAGE", "0.3"))
+    # Vector drawings (ruling lines, cell borders) needed to try table extraction
+    ROUTING_MIN_TABLE_LINES: int = int(os.getenv("ROUTING_MIN_TABLE_LINES", "4"))
+
+    # Local extraction cache (content-addressed by PDF SHA-256)
+    EXTRACTION_CACHE_ENABLED: bool = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXTRACTION_CACHE_DIR: str = os.getenv("EXTRACTION_CACHE_DIR", os.path.join("data", "cache", "extractions"))
+    EXTRACTION_CACHE_MAX_BYTES: int = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    # doc_id = <stem>-<first 8 hex of content hash> instead of a random suffix
+    DETERMINISTIC_DOC_IDS: bool = os.getenv("DETERMINISTIC_DOC_IDS", "false").lower() in ("1", "true", "yes")
+
+    # Processing ledger: per-file, per-stage state so batch runs can resume
+    LEDGER_ENABLED: bool = os.getenv("LEDGER_ENABLED", "true").lower() in ("1", "true", "yes")
+    LEDGER_PATH: str = os.getenv("LEDGER_PATH", os.path.join("data", "ledger", "processing.sqlite"))
+    # "stat": path + size + mtime (cheap); "hash": content SHA-256 (survives moves)
+    LEDGER_KEY: str = os.getenv("LEDGER_KEY", "stat")
+    # Runs that may fail a stage before the file is skipped (see `status --reset-failed`)
+    LEDGER_MAX_ATTEMPTS: int = int(os.getenv("LEDGER_MAX_ATTEMPTS", "3"))
+
+    # `watch`: inbox polling period, and how long a file must stay unmodified
+    # before it is ingested (so files still being copied are not picked up)
+    WATCH_INTERVAL_SECONDS: float = float(os.getenv("WATCH_INTERVAL_SECONDS", "10"))
+    WATCH_SETTLE_SECONDS: float = float(os.getenv("WATCH_SETTLE_SECONDS", "5"))
 
     # Document AI (optional)
     DOC_AI_PROJECT_ID: str = os.getenv("DOC_AI_PROJECT_ID", "")
     DOC_AI_LOCATION: str = os.getenv("DOC_AI_LOCATION", "us")
     DOC_AI_PROCESSOR_ID: str = os.getenv("DOC_AI_PROCESSOR_ID", "")
+    # Online (synchronous) requests are limited to 15 pages for most processors
+    DOC_AI_MAX_PAGES_PER_REQUEST: int = int(os.getenv("DOC_AI_MAX_PAGES_PER_REQUEST", "15"))
+    DOC_AI_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("DOC_AI_MAX_CONCURRENT_REQUESTS", "4"))
 
     # Gemini (Step 2)
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")  # or 1.5-pro
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+    # Quota limits enforced client-side (0 = no limit)
+    GEMINI_RPM: int = int(os.getenv("GEMINI_RPM", "60"))
+    GEMINI_TPM: int = int(os.getenv("GEMINI_TPM", "1000000"))
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+    # Step 2 input: compact, de-duplicated payload capped at this many tokens
+    LLM_COMPACT_PAYLOAD: bool = os.getenv("LLM_COMPACT_PAYLOAD", "true").lower() in ("1", "true", "yes")
+    LLM_TOKEN_BUDGET: int = int(os.getenv("LLM_TOKEN_BUDGET", "100000"))
+    # Local cache of Gemini responses (keyed by prompt version, payload, model)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join("data", "cache", "llm_responses.sqlite"))
+    LLM_CACHE_TTL_DAYS: float = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
 
 
 settings = Settings()
@@ -3,60 +3,504 @@ from __future__ import annotations
 import argparse
 import json
 
-from src.pipeline.run_pipeline import process_single_pdf, process_batch
-from src.pipeline.metadata_pipeline import extract_and_store_contract_metadata
+# Pipeline modules are imported inside each subcommand: they pull in
+# pdfplumber, PyMuPDF and the Google client libraries, which `--help` and
+# the other subcommands should not pay for at start-up.
+
+# Commands that process documents write a metrics summary. Read-only and
+# admin commands (status, init-storage, ...) do not: they would add a
+# run-*.json each time and overwrite the .prom file of the last real run.
+METRICS_COMMANDS = {"process-pdf", "process-batch", "run", "watch", "extract-metadata"}
+
+
+def _size(text: str) -> int:
+    """Byte count, with an optional K / M / G suffix (powers of 1024)."""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    text = text.strip().lower().removesuffix("b")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def _timestamp(text: str) -> float:
+    """ISO date or date-time (local time unless it has an offset) -> Unix time."""
+    import datetime
+
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def _utc_datetime(text: str) -> datetime.datetime:
+    """ISO date or date-time (UTC unless it has an offset) -> datetime."""
+    import datetime
+
+    value = datetime.datetime.fromisoformat(text)
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+def _add_extraction_arguments(
+    command: argparse.ArgumentParser,
+    ledger: bool = True,
+    ledger_help: str = "reprocess every file",
+) -> None:
+    """Options shared by the commands that run step 1 (see _extraction_kwargs)."""
+    command.add_argument(
+        "--no-bq",
+        action="store_true",
+        help="Do not send data to BigQuery (local JSON and local SQLite store only)",
+    )
+    command.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the local extraction cache and re-run all extractors",
+    )
+    command.add_argument(
+        "--deterministic-ids",
+        action="store_true",
+        help="Derive doc_id from the PDF content hash instead of a random suffix",
+    )
+    command.add_argument(
+        "--routing",
+        choices=["adaptive", "all"],
+        default=None,
+        help="adaptive: run pdfplumber / DocAI only on the pages that need them; "
+        "all: every extractor on every page (default: EXTRACTION_ROUTING)",
+    )
+    if ledger:
+        command.add_argument(
+            "--no-ledger",
+            action="store_true",
+            help=f"Do not consult or update the processing ledger ({ledger_help})",
+        )
+
+
+def _extraction_kwargs(args: argparse.Namespace) -> dict:
+    """Pipeline keyword arguments for the _add_extraction_arguments options."""
+    kwargs = {
+        "to_bigquery": not args.no_bq,
+        "use_cache": False if args.no_cache else None,
+        "deterministic_ids": True if args.deterministic_ids else None,
+        "routing": args.routing,
+    }
+    if hasattr(args, "no_ledger"):
+        kwargs["use_ledger"] = False if args.no_ledger else None
+    return kwargs
+
+
+def _add_discovery_arguments(command: argparse.ArgumentParser) -> None:
+    command.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="Only look at PDFs directly in the input folder, not in sub-folders",
+    )
+    command.add_argument(
+        "--pattern",
+        default=None,
+        help='Glob on the file name or its path under the input folder (e.g. "*-signed.pdf", "2024/*/*.pdf")',
+    )
+    command.add_argument("--min-size", type=_size, default=None, help="Skip smaller files (e.g. 10K)")
+    command.add_argument("--max-size", type=_size, default=None, help="Skip larger files (e.g. 200M)")
+    command.add_argument(
+        "--modified-since",
+        type=_timestamp,
+        default=None,
+        help="Skip files last modified before this ISO date / date-time",
+    )
+
+
+def _discovery(args: argparse.Namespace) -> dict:
+    return {
+        "recursive": not args.no_recursive,
+        "pattern": args.pattern,
+        "min_size": args.min_size,
+        "max_size": args.max_size,
+        "modified_since": args.modified_since,
+    }
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="PDF processing pipeline")
+    parser.add_argument(
+        "--metrics-dir",
+        default=None,
+        help="Where document processing commands write the run summary JSON and "
+        "Prometheus textfile (default: METRICS_DIR; empty string disables)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=None,
+        help="Run each pipeline stage under cProfile and write <stage>.prof / .txt to DIR",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["bigquery", "sqlite", "mirror"],
+        default=None,
+        help="Document store: BigQuery, the local SQLite store (LOCAL_STORE_PATH), "
+        "or BigQuery mirrored locally for fast doc_id reads (default: STORAGE_BACKEND)",
+    )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # Step 1: process single pdf
     single = subparsers.add_parser("process-pdf", help="Process a single PDF")
     single.add_argument("--input", required=True, help="Path to input PDF")
+    _add_extraction_arguments(single, ledger=False)
     single.add_argument(
-        "--no-bq",
-        action="store_true",
-        help="Do not send data to BigQuery (only local JSON)",
+        "--page-workers",
+        type=int,
+        default=None,
+        help="Processes used to split a large PDF by pages "
+        "(default: PAGE_PARALLEL_WORKERS; 1 disables)",
     )
 
     # Step 1: process batch
     batch = subparsers.add_parser("process-batch", help="Process all PDFs in a folder")
-    batch.add_argument("--input-dir", required=True, help="Path to folder with PDFs")
+    batch.add_argument("--input-dir", required=True, help="Path to folder with PDFs (searched recursively)")
     batch.add_argument(
-        "--no-bq",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for extraction (default: 1, sequential)",
+    )
+    _add_extraction_arguments(batch)
+    _add_discovery_arguments(batch)
+
+    # Steps 1 + 2 streamed: extraction feeds Gemini through bounded queues
+    run = subparsers.add_parser(
+        "run",
+        help="Process all PDFs in a folder and extract their metadata in one streaming pass",
+    )
+    run.add_argument("--input-dir", required=True, help="Path to folder with PDFs (searched recursively)")
+    run.add_argument(
+        "--extract-workers",
+        type=int,
+        default=1,
+        help="Worker processes for extraction (default: 1)",
+    )
+    run.add_argument(
+        "--llm-workers",
+        type=int,
+        default=None,
+        help="Gemini requests in flight (default: GEMINI_MAX_CONCURRENCY)",
+    )
+    run.add_argument(
+        "--queue-size",
+        type=int,
+        default=None,
+        help="Documents buffered between stages (default: PIPELINE_QUEUE_SIZE)",
+    )
+    run.add_argument(
+        "--refresh",
         action="store_true",
-        help="Do not send data to BigQuery (only local JSON)",
+        help="Bypass the local Gemini response cache (the fresh answer replaces it)",
     )
+    run.add_argument(
+        "--print",
+        action="store_true",
+        help="Print each document's metadata to stdout as one JSON line",
+    )
+    _add_extraction_arguments(run)
+    _add_discovery_arguments(run)
+
+    # Poll an inbox folder and ingest new files as they arrive
+    watch = subparsers.add_parser(
+        "watch",
+        help="Poll a folder and process new PDFs as they arrive",
+    )
+    watch.add_argument("--input-dir", required=True, help="Inbox folder to watch (searched recursively)")
+    watch.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Seconds between scans (default: WATCH_INTERVAL_SECONDS)",
+    )
+    watch.add_argument(
+        "--settle",
+        type=float,
+        default=None,
+        help="Seconds a file must stay unmodified before it is picked up (default: WATCH_SETTLE_SECONDS)",
+    )
+    watch.add_argument(
+        "--max-scans",
+        type=int,
+        default=None,
+        help="Stop after this many scans (default: run until interrupted)",
+    )
+    watch.add_argument(
+        "--with-metadata",
+        action="store_true",
+        help="Also extract metadata with Gemini (streaming, like `run`)",
+    )
+    watch.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for extraction (default: 1)",
+    )
+    _add_extraction_arguments(watch, ledger_help="files are only tracked in memory")
+    _add_discovery_arguments(watch)
 
     # Step 2: extract normalized metadata via Gemini and save to BigQuery
     meta = subparsers.add_parser(
         "extract-metadata",
-        help="Extract contract metadata from BigQuery JSON via Gemini",
+        help="Extract contract metadata from stored SuperJSON (BigQuery or local store) via Gemini",
     )
-    meta.add_argument(
+    targets = meta.add_mutually_exclusive_group(required=True)
+    targets.add_argument(
         "--doc-id",
-        required=True,
         help="doc_id of the record in super_json_docs",
     )
+    targets.add_argument(
+        "--doc-ids-file",
+        help="File with one doc_id per line (fetched with a single query)",
+    )
+    targets.add_argument(
+        "--all-pending",
+        action="store_true",
+        help="Every doc in super_json_docs that has no contract_metadata row yet",
+    )
     meta.add_argument(
         "--print",
         action="store_true",
-        help="Print resulting JSON to stdout",
+        help="Print resulting JSON to stdout (one line per document in bulk mode)",
+    )
+    meta.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Gemini requests in flight in bulk mode (default: GEMINI_MAX_CONCURRENCY)",
+    )
+    meta.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Bypass the local Gemini response cache (the fresh answer replaces it)",
+    )
+    meta.add_argument(
+        "--ingested-since",
+        type=_utc_datetime,
+        default=None,
+        help="Only documents ingested at or after this ISO date / date-time (UTC); "
+        "BigQuery then reads only those partitions",
+    )
+    meta.add_argument(
+        "--no-bq",
+        action="store_true",
+        help="Read documents from and store metadata in the local SQLite store "
+        "(same as --storage sqlite)",
+    )
+
+    # Progress of batch runs, from the processing ledger (works during a run)
+    status = subparsers.add_parser(
+        "status",
+        help="Show per-stage progress and failures recorded in the processing ledger",
+    )
+    status.add_argument(
+        "--failures",
+        type=int,
+        default=10,
+        help="How many of the most recent failures to list (default: 10)",
+    )
+    status.add_argument(
+        "--reset-failed",
+        action="store_true",
+        help="Give failed files a fresh set of LEDGER_MAX_ATTEMPTS on the next run",
+    )
+    status.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the report as JSON",
+    )
+
+    # Storage bootstrap: create tables and check their schema once
+    init = subparsers.add_parser(
+        "init-storage",
+        help="Create BigQuery dataset/tables and check them for schema drift",
+    )
+    init.add_argument(
+        "--check-only",
+        action="store_true",
+        help="Only report drift; do not create tables or add columns",
+    )
+
+    # Rewrite tables created before partitioning / clustering was added
+    migrate = subparsers.add_parser(
+        "migrate-storage",
+        help="Rewrite existing BigQuery tables as partitioned / clustered tables "
+        "(run with the pipeline stopped; the old tables are kept as backups)",
+    )
+    migrate.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the tables that need it and the statements that would run",
     )
 
     args = parser.parse_args()
 
+    from src.metrics.recorder import get_metrics
+
+    from config.settings import settings
+
+    if args.storage:
+        settings.STORAGE_BACKEND = args.storage
+
+    metrics = get_metrics()
+    if args.profile:
+        metrics.enable_profiling()
+    try:
+        run_command(parser, args)
+    finally:
+        metrics_dir = _metrics_dir(args)
+        if metrics_dir and args.command in METRICS_COMMANDS:
+            paths = metrics.write(metrics_dir, command=args.command)
+            print(f"[Metrics] Run summary: {paths['summary']}")
+        if args.profile:
+            metrics.dump_profiles(args.profile)
+            print(f"[Metrics] Stage profiles written to {args.profile}")
+
+
+def _metrics_dir(args: argparse.Namespace) -> str:
+    from config.settings import settings
+
+    return settings.METRICS_DIR if args.metrics_dir is None else args.metrics_dir
+
+
+def _exit_if_rows_failed(result: dict) -> None:
+    """Exit non-zero when rows were lost: insert failures are not raised."""
+    if result.get("rows_failed"):
+        print(f"[BQ] {result['rows_failed']} rows could not be written to BigQuery")
+        raise SystemExit(1)
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
     if args.command == "process-pdf":
-        process_single_pdf(args.input, to_bigquery=not args.no_bq)
+        from src.pipeline.run_pipeline import process_single_pdf
+
+        result = process_single_pdf(
+            args.input,
+            page_workers=args.page_workers,
+            **_extraction_kwargs(args),
+        )
+        _exit_if_rows_failed(result)
 
     elif args.command == "process-batch":
-        process_batch(args.input_dir, to_bigquery=not args.no_bq)
+        from src.pipeline.run_pipeline import process_batch
+
+        summary = process_batch(
+            args.input_dir,
+            workers=args.workers,
+            discovery=_discovery(args),
+            **_extraction_kwargs(args),
+        )
+        _exit_if_rows_failed(summary)
+
+    elif args.command == "run":
+        from src.pipeline.streaming import run_streaming_pipeline
+
+        def print_result(doc_id: str, metadata: dict) -> None:
+            print(json.dumps({"doc_id": doc_id, **metadata}, ensure_ascii=False))
+
+        run_streaming_pipeline(
+            args.input_dir,
+            extract_workers=args.extract_workers,
+            llm_workers=args.llm_workers,
+            queue_size=args.queue_size,
+            refresh=args.refresh,
+            on_result=print_result if args.print else None,
+            discovery=_discovery(args),
+            **_extraction_kwargs(args),
+        )
+
+    elif args.command == "watch":
+        from src.pipeline.watch import watch_inbox
+
+        pipeline_kwargs = _extraction_kwargs(args)
+        if args.with_metadata:
+            pipeline_kwargs["extract_workers"] = args.workers
+        else:
+            pipeline_kwargs["workers"] = args.workers
+        watch_inbox(
+            args.input_dir,
+            interval=args.interval,
+            settle_seconds=args.settle,
+            max_scans=args.max_scans,
+            with_metadata=args.with_metadata,
+            discovery=_discovery(args),
+            metrics_dir=_metrics_dir(args),
+            **pipeline_kwargs,
+        )
 
     elif args.command == "extract-metadata":
-        metadata = extract_and_store_contract_metadata(args.doc_id)
-        if args.print:
-            print(json.dumps(metadata, ensure_ascii=False, indent=2))
+        from config.settings import settings
+        from src.pipeline.metadata_pipeline import (
+            extract_and_store_contract_metadata,
+            extract_metadata_for_records,
+            iter_metadata_records,
+        )
+        from src.storage.bq_writer import flush_all_writers
+
+        if args.no_bq:
+            settings.STORAGE_BACKEND = "sqlite"
+        if args.doc_id:
+            metadata = extract_and_store_contract_metadata(
+                args.doc_id, refresh=args.refresh, ingested_since=args.ingested_since
+            )
+            flush_all_writers()
+            if args.print:
+                print(json.dumps(metadata, ensure_ascii=False, indent=2))
+        else:
+            doc_ids = None
+            if args.doc_ids_file:
+                with open(args.doc_ids_file, encoding="utf-8") as f:
+                    doc_ids = [line.strip() for line in f if line.strip()]
+
+            def print_result(doc_id: str, metadata: dict) -> None:
+                print(json.dumps({"doc_id": doc_id, **metadata}, ensure_ascii=False))
+
+            records = iter_metadata_records(
+                doc_ids=doc_ids, pending_only=args.all_pending, ingested_since=args.ingested_since
+            )
+            extract_metadata_for_records(
+                records,
+                on_result=print_result if args.print else None,
+                concurrency=args.concurrency,
+                refresh=args.refresh,
+            )
+            flush_all_writers()
+
+    elif args.command == "status":
+        from src.storage.ledger import get_ledger
+
+        ledger = get_ledger()
+        if args.reset_failed:
+            print(f"[Ledger] Reset attempts of {ledger.reset_failed()} failed stages")
+        report = {**ledger.progress(), "failures": ledger.failures(limit=args.failures)}
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"{report['files']} files in {ledger.path}")
+            for stage_name, counts in report["stages"].items():
+                line = ", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "-"
+                print(f"  {stage_name:<10} {line}")
+            for failure in report["failures"]:
+                gave_up = " (gave up)" if failure["gave_up"] else ""
+                print(f"  ✘ {failure['path']} [{failure['stage']}, {failure['attempts']} attempts{gave_up}]: {failure['error']}")
+
+    elif args.command == "init-storage":
+        from src.storage.bootstrap import check_storage, init_storage
+
+        if args.check_only:
+            report = check_storage()
+            print(json.dumps(report, indent=2))
+            ok = not any(r.get("incompatible") or r.get("missing_table") for r in report.values())
+        else:
+            ok = init_storage()
+        if not ok:
+            raise SystemExit(1)
+
+    elif args.command == "migrate-storage":
+        from src.storage.bootstrap import migrate_storage
+
+        if not migrate_storage(dry_run=args.dry_run):
+            raise SystemExit(1)
 
     else:
         parser.print_help()
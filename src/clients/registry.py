@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+# One client per (name, process). Creating a Google client means auth,
+# a gRPC channel or an HTTP session, which costs more than a small document's
+# whole round-trip, so clients are created lazily once and then reused.
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def get_client(name: str, factory: Callable[[], T]) -> T:
+    """
+    Return the shared client registered under name, creating it with
+    factory() on first use. Callers should put anything that changes the
+    client (project, endpoint...) into the name.
+    Safe to call from many threads; factory runs at most once per name.
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = factory()
+            _clients[name] = client
+        return client
+
+
+def register_client(name: str, client: Any) -> None:
+    """Install a client explicitly (e.g. a stand-in for benchmarks)."""
+    with _lock:
+        _clients[name] = client
+
+
+def reset_clients() -> None:
+    """Close and forget every client of this process."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                print(f"[Clients] Error closing {type(client).__name__}: {e}")
+
+
+def _after_fork_in_child() -> None:
+    # Connections and gRPC channels inherited from the parent must not be
+    # used (or closed) by the child: forget them and start from scratch.
+    global _lock
+    _clients.clear()
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
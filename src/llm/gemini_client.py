@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import random
 import re
-from typing import Any, Dict
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-from google import genai
 from config.settings import settings
+from src.clients.registry import get_client
+from src.llm.rate_limiter import get_rate_limiter
+from src.llm.tokens import estimate_tokens
+from src.metrics.recorder import get_metrics, stage
+
+if TYPE_CHECKING:
+    # google.genai takes about a second to import: only load it on first use
+    from google import genai
+
+# Rate limited / transient server errors are worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Rough size of the metadata JSON the model returns
+EXPECTED_OUTPUT_TOKENS = 1_000
 
 
 class GeminiError(RuntimeError):
@@ -15,7 +31,16 @@ class GeminiError(RuntimeError):
 def _get_client() -> genai.Client:
     if not settings.GEMINI_API_KEY:
         raise GeminiError("GEMINI_API_KEY is not set in environment/.env")
-    return genai.Client(api_key=settings.GEMINI_API_KEY)
+    api_key = settings.GEMINI_API_KEY
+    # Keyed by a short fingerprint so the key itself never appears in the name
+    fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+    def factory() -> genai.Client:
+        from google import genai
+
+        return genai.Client(api_key=api_key)
+
+    return get_client(f"gemini:{fingerprint}", factory)
 
 
 def _extract_json_from_text(text: str) -> Dict[str, Any]:
@@ -37,23 +62,102 @@ def _extract_json_from_text(text: str) -> Dict[str, Any]:
         raise GeminiError(f"Model output is not valid JSON: {e}\nRaw text: {text}") from e
 
 
-def generate_contract_metadata(json_payload: str) -> Dict[str, Any]:
+def _backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _usage_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage else None
+
+
+def _generate_with_retry(client: genai.Client, prompt: str) -> Any:
+    """
+    generate_content() behind the shared rate limiter, retrying 429 / 5xx
+    and connection errors with jittered exponential backoff.
+    """
+    import requests
+    from google.genai import errors as genai_errors
+
+    # google-genai sends its requests with `requests`, whose connection
+    # errors / timeouts are not the builtin ConnectionError / TimeoutError
+    network_errors = (
+        ConnectionError,
+        TimeoutError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+    )
+
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+    max_retries = settings.GEMINI_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire(estimated)
+        try:
+            response = client.models.generate_content(
+                model=settings.GEMINI_MODEL,
+                contents=prompt,
+            )
+        except genai_errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise GeminiError(f"Gemini API error {e.code}: {e}") from e
+            delay = _backoff_delay(attempt)
+            get_metrics().count("llm_retries")
+            print(f"[Gemini] {e.code} on attempt {attempt + 1}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        except network_errors as e:
+            if attempt == max_retries:
+                raise GeminiError(f"Gemini connection error: {e}") from e
+            delay = _backoff_delay(attempt)
+            get_metrics().count("llm_retries")
+            print(f"[Gemini] {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        limiter.record_usage(estimated, _usage_tokens(response))
+        return response
+
+    raise GeminiError("Gemini retries exhausted")  # not reached
+
+
+def generate_contract_metadata(json_payload: str, refresh: bool = False) -> Dict[str, Any]:
     """
     Given a JSON payload as string, call Gemini with the metadata prompt and return
     the parsed JSON dict.
+    Safe to call from several threads: requests share one client and one
+    requests/tokens-per-minute limiter (GEMINI_RPM / GEMINI_TPM).
+    Responses are cached locally (LLM_CACHE_*); refresh=True skips the
+    lookup and overwrites the cached entry.
     """
-    from src.llm.prompt_templates import build_contract_metadata_prompt
+    from src.llm.prompt_templates import CONTRACT_METADATA_PROMPT_VERSION, build_contract_metadata_prompt
+    from src.llm.response_cache import get_response_cache, response_cache_key
 
-    client = _get_client()
+    # Key on the prompt as sent, so any change to the builder is a new entry
     prompt = build_contract_metadata_prompt(json_payload)
+    cache = get_response_cache() if settings.LLM_CACHE_ENABLED else None
+    cache_key = response_cache_key(CONTRACT_METADATA_PROMPT_VERSION, prompt, settings.GEMINI_MODEL)
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            get_metrics().skip("llm", "cache_hit")
+            return cached
 
-    response = client.models.generate_content(
-        model=settings.GEMINI_MODEL,
-        contents=prompt,
-    )
+    with stage("llm", bytes=len(json_payload)) as info:
+        client = _get_client()
+        info["input_tokens"] = estimate_tokens(prompt)
+
+        response = _generate_with_retry(client, prompt)
+        info["tokens"] = _usage_tokens(response) or 0
+
+        text = response.text or ""
+        if not text.strip():
+            raise GeminiError("Empty response from Gemini")
 
-    text = response.text or ""
-    if not text.strip():
-        raise GeminiError("Empty response from Gemini")
+        metadata = _extract_json_from_text(text)
 
-    return _extract_json_from_text(text)
+    if cache is not None:
+        cache.put(cache_key, settings.GEMINI_MODEL, metadata)
+    return metadata
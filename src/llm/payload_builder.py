@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from src.llm.tokens import estimate_tokens
+from src.pdf_ingestion.normalizer.canonical import best_source, page_texts_by_source, source_rank
+
+# Pages with less real text than this (after boilerplate removal) are dropped
+MIN_PAGE_CHARS = 20
+
+# A line in the top/bottom EDGE_LINES of at least this share of pages
+# (and 3+ pages) is a running header/footer
+BOILERPLATE_MIN_SHARE = 0.5
+EDGE_LINES = 2
+
+_WS_RE = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _normalize_text(text: str) -> str:
+    lines = [_WS_RE.sub(" ", line).strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def canonical_page_texts(text_spans: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    One text per page: the canonical extractor output (see
+    normalizer.canonical), spans from the same source on one page joined.
+    """
+    return {
+        page: _normalize_text(texts[best_source(texts)])
+        for page, texts in page_texts_by_source(text_spans).items()
+    }
+
+
+def _edge_lines(text: str) -> List[str]:
+    lines = [line for line in text.splitlines() if line]
+    if len(lines) <= 2 * EDGE_LINES:
+        return lines
+    return lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+
+
+def _boilerplate_lines(pages: Dict[int, str]) -> set:
+    """
+    Running headers/footers: lines at the top or bottom of most pages
+    (digits masked, so 'Page 3 of 9' matches on every page).
+    """
+    if len(pages) < 3:
+        return set()
+    counts: Counter = Counter()
+    for text in pages.values():
+        counts.update({_DIGITS_RE.sub("#", line) for line in _edge_lines(text)})
+    threshold = max(3, int(len(pages) * BOILERPLATE_MIN_SHARE))
+    return {line for line, n in counts.items() if n >= threshold}
+
+
+def _strip_boilerplate(text: str, boilerplate: set) -> str:
+    if not boilerplate:
+        return text
+    lines = text.splitlines()
+    non_empty = [i for i, line in enumerate(lines) if line]
+    edges = set(non_empty[:EDGE_LINES] + non_empty[-EDGE_LINES:])
+    return "\n".join(
+        line for i, line in enumerate(lines)
+        if i not in edges or _DIGITS_RE.sub("#", line) not in boilerplate
+    ).strip()
+
+
+def _table_rows(table: Dict[str, Any]) -> List[List[str]]:
+    """Row-major cell texts, from either compact 'rows' or {row, col, text} cells."""
+    if "rows" in table:
+        return [[cell or "" for cell in row] for row in table["rows"]]
+    cells = table.get("cells", [])
+    if not cells:
+        return []
+    n_rows = max(c["row"] for c in cells) + 1
+    n_cols = max(c["col"] for c in cells) + 1
+    rows = [[""] * n_cols for _ in range(n_rows)]
+    for c in cells:
+        rows[c["row"]][c["col"]] = c.get("text") or ""
+    return rows
+
+
+def compact_tables(tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Tables as {page, rows}, without empty rows/tables and without tables
+    that another extractor already found on the same page.
+    """
+    result: List[Dict[str, Any]] = []
+    seen = set()
+    for table in sorted(tables, key=lambda t: (t.get("page", 0), source_rank(t.get("source", "")))):
+        rows = [[_normalize_text(cell) for cell in row] for row in _table_rows(table)]
+        rows = [row for row in rows if any(row)]
+        if not rows:
+            continue
+        fingerprint = (table.get("page", 0), frozenset(cell.lower() for row in rows for cell in row if cell))
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        result.append({"page": table.get("page", 0), "rows": rows})
+    return result
+
+
+def _page_priority(page_numbers: List[int]) -> List[int]:
+    """
+    Order pages for the budget: parties and dates live at the start,
+    signatures at the end, so alternate first, last, second, second-last...
+    """
+    order: List[int] = []
+    lo, hi = 0, len(page_numbers) - 1
+    while lo <= hi:
+        order.append(page_numbers[lo])
+        if lo != hi:
+            order.append(page_numbers[hi])
+        lo += 1
+        hi -= 1
+    return order
+
+
+def _page_ranges(pages: List[int]) -> List[str]:
+    ranges: List[str] = []
+    for page in sorted(pages):
+        if ranges and int(ranges[-1].split("-")[-1]) == page - 1:
+            ranges[-1] = f"{ranges[-1].split('-')[0]}-{page}"
+        else:
+            ranges.append(str(page))
+    return ranges
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_llm_payload(
+    super_json: Dict[str, Any],
+    token_budget: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Turn a SuperJSON dict into a compact JSON payload for the LLM:
+    - one canonical text per page instead of one per extractor
+    - headers/footers repeated across pages (kept once, on the first page)
+      and near-empty pages removed
+    - tables as lists of rows, de-duplicated across extractors
+    - if still over token_budget (default LLM_TOKEN_BUDGET), keep pages
+      from both ends of the document inwards and list the omitted ones
+    Returns (payload_json, stats) where stats has estimated input tokens
+    before and after.
+    """
+    token_budget = settings.LLM_TOKEN_BUDGET if token_budget is None else token_budget
+
+    pages = canonical_page_texts(super_json.get("text_spans", []))
+    boilerplate = _boilerplate_lines(pages)
+    # The first page keeps its header: it often carries the agreement title
+    first_page = min(pages) if pages else None
+    pages = {
+        page: text if page == first_page else _strip_boilerplate(text, boilerplate)
+        for page, text in pages.items()
+    }
+    dropped_pages = [page for page, text in pages.items() if len(text.replace(" ", "")) < MIN_PAGE_CHARS]
+    pages = {page: text for page, text in pages.items() if page not in dropped_pages}
+
+    tables = compact_tables(super_json.get("tables", []))
+
+    payload: Dict[str, Any] = {
+        "doc_id": super_json.get("doc_id"),
+        "filename": super_json.get("filename"),
+        "num_pages": super_json.get("num_pages"),
+        "pages": [{"page": page, "text": pages[page]} for page in sorted(pages)],
+        "tables": tables,
+    }
+
+    omitted: List[int] = []
+    payload_json = _dumps(payload)
+    if token_budget and estimate_tokens(payload_json) > token_budget:
+        # Fill the budget page by page (text plus that page's tables)
+        page_cost = {page: estimate_tokens(text) + 10 for page, text in pages.items()}
+        table_cost: Dict[int, int] = defaultdict(int)
+        for table in tables:
+            table_cost[table["page"]] += estimate_tokens(_dumps(table))
+        used = estimate_tokens(_dumps({**payload, "pages": [], "tables": []})) + 50
+        kept = set()
+        for page in _page_priority(sorted(pages)):
+            cost = page_cost[page] + table_cost.get(page, 0)
+            if used + cost > token_budget:
+                continue
+            kept.add(page)
+            used += cost
+        omitted = sorted(set(pages) - kept)
+        payload["pages"] = [p for p in payload["pages"] if p["page"] in kept]
+        payload["tables"] = [t for t in tables if t["page"] in kept]
+        payload["omitted_pages"] = _page_ranges(omitted)
+        payload_json = _dumps(payload)
+
+    stats = {
+        # What the raw SuperJSON costs when sent as-is (default separators)
+        "tokens_before": estimate_tokens(json.dumps(super_json, ensure_ascii=False)),
+        "tokens_after": estimate_tokens(payload_json),
+        "pages_kept": len(payload["pages"]),
+        "pages_dropped_empty": len(dropped_pages),
+        "pages_omitted_budget": len(omitted),
+        "boilerplate_lines": len(boilerplate),
+    }
+    return payload_json, stats
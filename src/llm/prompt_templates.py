@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+# Bump when the prompt changes meaning, so cached responses are not reused
+CONTRACT_METADATA_PROMPT_VERSION = "1"
+
 CONTRACT_METADATA_PROMPT = """
 ### ROLE
 Act as a Senior Legal Contract Analyst and Data Quality Engineer.
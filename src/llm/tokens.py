@@ -0,0 +1,6 @@
+from __future__ import annotations
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local estimate (~4 characters per token), no API call."""
+    return len(text) // 4 + 1
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Durations kept per stage for percentiles; older ones are sampled out
+_MAX_SAMPLES = 10_000
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _escape_label_value(value: Any) -> str:
+    """Backslash, double quote and newline escaped, as the text format requires."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _StageStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.skips: Dict[str, int] = {}
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.durations: List[float] = []
+        self.totals: Dict[str, float] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 4),
+            "p50_seconds": round(_percentile(self.durations, 0.5), 4),
+            "p95_seconds": round(_percentile(self.durations, 0.95), 4),
+            "max_seconds": round(self.max_seconds, 4),
+            "errors": dict(self.errors),
+            "skips": dict(self.skips),
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in self.totals.items()},
+        }
+
+
+class MetricsRecorder:
+    """
+    Process-wide, thread-safe record of what each pipeline stage did:
+    calls, duration, errors (by exception type), skip reasons and summed
+    numeric fields (pages, bytes, tokens, rows...).
+    Stages that run inside pool worker processes are not seen here; their
+    time is part of the enclosing stage of this process ("extract").
+    With profiling enabled, the outermost stage of each thread is also run
+    under cProfile and the stats are merged per stage.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._stages: Dict[str, _StageStats] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._profiling = False
+        self._profiles: Dict[str, pstats.Stats] = {}
+        self._local = threading.local()
+
+    # -- recording ---------------------------------------------------------
+
+    def _stats(self, name: str) -> _StageStats:
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = _StageStats()
+        return stats
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        error: Optional[str] = None,
+        skip_reason: Optional[str] = None,
+        **fields: Any,
+    ) -> None:
+        with self._lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if len(stats.durations) < _MAX_SAMPLES:
+                stats.durations.append(seconds)
+            else:
+                stats.durations[stats.calls % _MAX_SAMPLES] = seconds
+            if error:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+            if skip_reason:
+                stats.skips[skip_reason] = stats.skips.get(skip_reason, 0) + 1
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats.totals[key] = stats.totals.get(key, 0) + value
+
+    def skip(self, name: str, reason: str) -> None:
+        """A stage that was not run at all (not configured, routed out...)."""
+        with self._lock:
+            stats = self._stats(name)
+            stats.skips[reason] = stats.skips.get(reason, 0) + 1
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the block as one call of stage `name`. The yielded dict can be
+        filled with pages / bytes / tokens / skip_reason... An exception
+        is recorded as an error of that stage and re-raised.
+        """
+        info: Dict[str, Any] = dict(fields)
+        profiler = self._start_profile()
+        error: Optional[str] = None
+        started = time.perf_counter()
+        try:
+            yield info
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stop_profile(name, profiler)
+            self.record(name, elapsed, error=error, **info)
+
+    # -- profiling ---------------------------------------------------------
+
+    def enable_profiling(self) -> None:
+        self._profiling = True
+
+    def _start_profile(self) -> Optional[cProfile.Profile]:
+        if not self._profiling:
+            return None
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth:
+            return None  # one profiler per thread at a time: nested stages are in the outer one
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, name: str, profiler: Optional[cProfile.Profile]) -> None:
+        if not self._profiling:
+            return
+        self._local.depth = max(0, getattr(self._local, "depth", 1) - 1)
+        if profiler is None:
+            return
+        profiler.disable()
+        with self._lock:
+            if name in self._profiles:
+                self._profiles[name].add(profiler)
+            else:
+                self._profiles[name] = pstats.Stats(profiler)
+
+    def dump_profiles(self, out_dir: str, top: int = 30) -> List[Path]:
+        """<stage>.prof (for snakeviz / pstats) and <stage>.txt (top functions by cumulative time)."""
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        written = []
+        with self._lock:
+            profiles = dict(self._profiles)
+        for name, stats in profiles.items():
+            prof_path = Path(out_dir) / f"{name}.prof"
+            stats.dump_stats(str(prof_path))
+            text = io.StringIO()
+            pstats.Stats(str(prof_path), stream=text).sort_stats("cumulative").print_stats(top)
+            (Path(out_dir) / f"{name}.txt").write_text(text.getvalue(), encoding="utf-8")
+            written.append(prof_path)
+        return written
+
+    # -- export ------------------------------------------------------------
+
+    def summary(self, **run_info: Any) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: stats.to_dict() for name, stats in sorted(self._stages.items())}
+            counters = dict(self._counters)
+        return {
+            **run_info,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at, datetime.timezone.utc).isoformat(),
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def prometheus_text(self, summary: Dict[str, Any], prefix: str = "pdf_pipeline") -> str:
+        """Last-run values in the Prometheus text exposition format (all gauges)."""
+        command = summary.get("command", "")
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{k}="{_escape_label_value(v)}"' for k, v in {"command": command, **labels}.items()
+                )
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        stages = summary["stages"]
+        metric("last_run_timestamp_seconds", "Start time of the last run.", [({}, round(self.started_at, 3))])
+        metric("last_run_duration_seconds", "Wall time of the last run.", [({}, summary["wall_seconds"])])
+        metric("stage_calls", "Calls per stage in the last run.",
+               [({"stage": n}, s["calls"]) for n, s in stages.items()])
+        metric("stage_duration_seconds", "Time spent per stage in the last run (summed over calls).",
+               [({"stage": n}, s["seconds"]) for n, s in stages.items()])
+        metric("stage_duration_quantile_seconds", "Per-call stage duration quantiles in the last run.",
+               [({"stage": n, "quantile": q}, s[f"p{int(float(q) * 100)}_seconds"])
+                for n, s in stages.items() for q in ("0.5", "0.95")])
+        metric("stage_errors", "Failed calls per stage and exception type in the last run.",
+               [({"stage": n, "error": e}, c) for n, s in stages.items() for e, c in s["errors"].items()])
+        metric("stage_skips", "Skipped work per stage and reason in the last run.",
+               [({"stage": n, "reason": r}, c) for n, s in stages.items() for r, c in s["skips"].items()])
+        for field in ("pages", "bytes", "tokens", "rows"):
+            samples = [({"stage": n}, s[field]) for n, s in stages.items() if field in s]
+            if samples:
+                metric(f"stage_{field}", f"{field.capitalize()} handled per stage in the last run.", samples)
+        if summary["counters"]:
+            metric("events", "Event counters of the last run.",
+                   [({"event": k}, v) for k, v in summary["counters"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, out_dir: str, command: str, **run_info: Any) -> Dict[str, Path]:
+        """
+        Write run-<timestamp>-<command>.json and <prefix>.prom (overwritten
+        each run, atomically, for the node_exporter textfile collector).
+        """
+        summary = self.summary(command=command, **run_info)
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self.started_at, datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        json_path = Path(out_dir) / f"run-{stamp}-{command}.json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        prom_path = Path(out_dir) / "pdf_pipeline.prom"
+        tmp_path = prom_path.with_name(f"{prom_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.prometheus_text(summary), encoding="utf-8")
+        os.replace(tmp_path, prom_path)
+        return {"summary": json_path, "prometheus": prom_path}
+
+
+_recorder: Optional[MetricsRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = MetricsRecorder()
+        return _recorder
+
+
+def reset_metrics() -> MetricsRecorder:
+    """Start a new run (e.g. between benchmark scenarios)."""
+    global _recorder
+    with _recorder_lock:
+        _recorder = MetricsRecorder()
+        return _recorder
+
+
+def stage(name: str, **fields: Any):
+    """get_metrics().stage(...), for `with stage("merge") as info:`."""
+    return get_metrics().stage(name, **fields)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, Iterable, List, Optional, Union
+from pydantic import BaseModel, Field, model_validator
 
 
 class TextSpan(BaseModel):
@@ -17,11 +17,43 @@ class TableCell(BaseModel):
     text: str
 
 
+def rows_from_cells(cells: Iterable[Union[TableCell, Dict[str, Any]]]) -> List[List[Optional[str]]]:
+    """{row, col, text} cells -> row-major list of lists (None where no cell)."""
+    cells = [c.model_dump() if isinstance(c, TableCell) else c for c in cells]
+    if not cells:
+        return []
+    n_cols = max(c["col"] for c in cells) + 1
+    rows: List[List[Optional[str]]] = [[None] * n_cols for _ in range(max(c["row"] for c in cells) + 1)]
+    for c in cells:
+        rows[c["row"]][c["col"]] = c["text"]
+    return rows
+
+
 class Table(BaseModel):
     page: int
-    cells: List[TableCell]
+    # Row-major cell texts; None where the extractor found no cell
+    rows: List[List[Optional[str]]]
     source: str
 
+    @model_validator(mode="before")
+    @classmethod
+    def _accept_cells(cls, data: Any) -> Any:
+        # Documents written before tables were stored as rows
+        if isinstance(data, dict) and "rows" not in data and "cells" in data:
+            data = dict(data)
+            data["rows"] = rows_from_cells(data.pop("cells") or [])
+        return data
+
+    @property
+    def cells(self) -> List[TableCell]:
+        """Cell-by-cell view of `rows`, for readers of the old format (empty cells skipped)."""
+        return [
+            TableCell.model_construct(row=r, col=c, text=text)
+            for r, row in enumerate(self.rows)
+            for c, text in enumerate(row)
+            if text is not None
+        ]
+
 
 class SuperJSON(BaseModel):
     doc_id: str
@@ -1,19 +1,32 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-from google.api_core.client_options import ClientOptions
-from google.cloud import documentai_v1 as documentai
-from google.api_core.exceptions import InvalidArgument
+import fitz  # PyMuPDF, only used to split large PDFs into page chunks
 
 from config.settings import settings
+from src.clients.registry import get_client
+
+if TYPE_CHECKING:
+    # The DocAI client library is slow to import: only load it when DocAI
+    # is configured and a document actually needs it
+    from google.cloud import documentai_v1 as documentai
 
 
 def _docai_client() -> documentai.DocumentProcessorServiceClient:
-    client_options = ClientOptions(
-        api_endpoint=f"{settings.DOC_AI_LOCATION}-documentai.googleapis.com"
-    )
-    return documentai.DocumentProcessorServiceClient(client_options=client_options)
+    """Shared DocAI client (one gRPC channel per process, thread-safe)."""
+    api_endpoint = f"{settings.DOC_AI_LOCATION}-documentai.googleapis.com"
+
+    def factory() -> documentai.DocumentProcessorServiceClient:
+        from google.api_core.client_options import ClientOptions
+        from google.cloud import documentai_v1 as documentai
+
+        client_options = ClientOptions(api_endpoint=api_endpoint)
+        return documentai.DocumentProcessorServiceClient(client_options=client_options)
+
+    return get_client(f"docai:{api_endpoint}", factory)
 
 
 def _empty_result(reason: str) -> Dict[str, Any]:
@@ -30,18 +43,200 @@ def _empty_result(reason: str) -> Dict[str, Any]:
     }
 
 
-def process_with_docai(pdf_bytes: bytes) -> Dict[str, Any]:
+def iter_pdf_chunks(
+    pdf: Union[str, bytes],
+    pages_per_chunk: int,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[List[int], bytes]]:
+    """
+    Split a PDF (a path or its bytes; only its page_numbers, 1-based, if
+    given) into chunks of at most pages_per_chunk pages, built lazily so
+    only the chunks being sent are in memory.
+    Yields (original page numbers, chunk_bytes) pairs.
+    A whole document that already fits is sent as-is, without re-encoding.
+    """
+    if isinstance(pdf, (bytes, bytearray)):
+        src = fitz.open(stream=pdf, filetype="pdf")
+    else:
+        src = fitz.open(pdf)
+    with src:
+        if page_numbers is None:
+            if src.page_count <= pages_per_chunk:
+                if src.page_count:
+                    if isinstance(pdf, (bytes, bytearray)):
+                        whole = bytes(pdf)
+                    else:
+                        with open(pdf, "rb") as f:
+                            whole = f.read()
+                    yield list(range(1, src.page_count + 1)), whole
+                return
+            page_numbers = range(1, src.page_count + 1)
+
+        selected = [n for n in page_numbers if 1 <= n <= src.page_count]
+        for start in range(0, len(selected), pages_per_chunk):
+            chunk_pages = selected[start:start + pages_per_chunk]
+            with fitz.open() as part:
+                for n in chunk_pages:
+                    part.insert_pdf(src, from_page=n - 1, to_page=n - 1)
+                chunk_bytes = part.tobytes(garbage=3, deflate=True)
+            yield chunk_pages, chunk_bytes
+
+
+def split_pdf_bytes(
+    pdf_bytes: bytes,
+    pages_per_chunk: int,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> List[Tuple[List[int], bytes]]:
+    """All chunks of iter_pdf_chunks() at once."""
+    return list(iter_pdf_chunks(pdf_bytes, pages_per_chunk, page_numbers))
+
+
+def _layout_text(layout: Any, full_text: str) -> str:
+    """
+    Resolve the text of a layout element. DocAI usually leaves
+    text_anchor.content empty and points into document.text via segments.
+    """
+    if not layout or not layout.text_anchor:
+        return ""
+    anchor = layout.text_anchor
+    if anchor.content:
+        return anchor.content
+    return "".join(
+        full_text[int(seg.start_index or 0):int(seg.end_index)]
+        for seg in anchor.text_segments
+    )
+
+
+def _parse_document(doc: Any, page_map: List[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Per-page text spans and tables. page_map[i] is the page number, in the
+    full PDF, of the i-th page DocAI saw.
+    """
+    text_spans: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+    full_text = doc.text or ""
+
+    for page_index, page in enumerate(doc.pages):
+        if page_index >= len(page_map):
+            break
+        page_number = page_map[page_index]
+
+        page_text = _layout_text(page.layout, full_text)
+        if page_text.strip():
+            text_spans.append(
+                {
+                    "page": page_number,
+                    "text": page_text,
+                    "bbox": None,
+                    "source": "docai",
+                }
+            )
+
+        # Minimal table parsing
+        for table in page.tables:
+            # header_rows + body_rows
+            rows = [
+                [_layout_text(cell.layout, full_text) for cell in row.cells]
+                for row in list(table.header_rows) + list(table.body_rows)
+            ]
+            if any(rows):
+                tables.append(
+                    {
+                        "page": page_number,
+                        "rows": rows,
+                        "source": "docai",
+                    }
+                )
+
+    # Processor did not return page layouts: keep the text, attributed to the chunk
+    if not text_spans and full_text.strip():
+        text_spans.append(
+            {
+                "page": page_map[0],
+                "text": full_text,
+                "bbox": None,
+                "source": "docai",
+            }
+        )
+
+    return text_spans, tables
+
+
+def _process_chunk(
+    client: documentai.DocumentProcessorServiceClient,
+    name: str,
+    chunk_bytes: bytes,
+) -> Any:
+    from google.cloud import documentai_v1 as documentai
+
+    raw_document = documentai.RawDocument(
+        content=chunk_bytes, mime_type="application/pdf"
+    )
+    request = documentai.ProcessRequest(name=name, raw_document=raw_document)
+    return client.process_document(request=request).document
+
+
+def _failure_reason(error: Exception) -> str:
+    from google.api_core.exceptions import InvalidArgument
+
+    if isinstance(error, InvalidArgument):
+        # Handle page limit issues and similar parameter errors
+        if "PAGE_LIMIT_EXCEEDED" in str(error):
+            return "page_limit_exceeded"
+        return "invalid_argument"
+    return "unexpected_error"
+
+
+def process_with_docai(
+    pdf: Union[str, bytes],
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
     """
-    Calls Google Document AI if configured.
-    If configuration is missing or API returns PAGE_LIMIT_EXCEEDED (or any other
-    error), we log and return an empty structure so the pipeline can continue
-    with pdfplumber / PyMuPDF only.
+    Calls Google Document AI if configured. pdf is a path (preferred: the
+    file is never read whole unless it is sent whole) or the PDF bytes.
+    page_numbers (1-based) limits the request to those pages (sent as a
+    subset PDF); output page numbers always refer to the full document.
+    PDFs longer than DOC_AI_MAX_PAGES_PER_REQUEST are split into page chunks
+    that are sent concurrently (at most DOC_AI_MAX_CONCURRENT_REQUESTS in
+    flight) and stitched back with page numbers of the original file.
+    Chunks are built as slots free up and each response is parsed and
+    dropped as soon as it is in order, so request / response memory is
+    bounded by the number of chunks in flight, not by the page count; the
+    returned spans and tables still grow with it.
+    If configuration is missing or every chunk fails, we log and return an
+    empty structure so the pipeline can continue with pdfplumber / PyMuPDF
+    only. Chunks that fail on their own are listed in meta["failed_chunks"].
     """
     # If DocAI is not configured, skip it gracefully
     if not (settings.DOC_AI_PROJECT_ID and settings.DOC_AI_PROCESSOR_ID):
         print("[DocAI] Skipping: DOC_AI_PROJECT_ID or DOC_AI_PROCESSOR_ID not set.")
         return _empty_result("not_configured")
 
+    text_spans: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+    failed_chunks: List[Dict[str, Any]] = []
+    num_pages = 0
+    num_chunks = 0
+    pages_sent = 0
+
+    def run_chunk(page_map: List[int], chunk_bytes: bytes) -> Tuple[Optional[Any], Optional[Exception]]:
+        try:
+            return _process_chunk(client, name, chunk_bytes), None
+        except Exception as e:
+            return None, e
+
+    def collect(page_map: List[int], doc: Optional[Any], error: Optional[Exception]) -> None:
+        nonlocal num_pages
+        if error is not None:
+            reason = _failure_reason(error)
+            print(f"[DocAI] Chunk with pages {page_map[0]}-{page_map[-1]} failed ({reason}): {error}")
+            failed_chunks.append({"first_page": page_map[0], "last_page": page_map[-1], "reason": reason})
+            return
+        chunk_spans, chunk_tables = _parse_document(doc, page_map)
+        text_spans.extend(chunk_spans)
+        tables.extend(chunk_tables)
+        num_pages = max(num_pages, page_map[min(len(doc.pages), len(page_map)) - 1] if doc.pages else 0)
+
     try:
         client = _docai_client()
 
@@ -51,77 +246,56 @@ def process_with_docai(pdf_bytes: bytes) -> Dict[str, Any]:
             settings.DOC_AI_PROCESSOR_ID,
         )
 
-        raw_document = documentai.RawDocument(
-            content=pdf_bytes, mime_type="application/pdf"
+        chunks = iter_pdf_chunks(
+            pdf,
+            max(1, settings.DOC_AI_MAX_PAGES_PER_REQUEST),
+            page_numbers=page_numbers,
         )
-        request = documentai.ProcessRequest(name=name, raw_document=raw_document)
-
-        result = client.process_document(request=request)
-        doc = result.document
 
-    except InvalidArgument as e:
-        # Handle page limit issues and similar parameter errors
-        if "PAGE_LIMIT_EXCEEDED" in str(e):
-            print(f"[DocAI] Skipping due to page limit: {e}")
-            return _empty_result("page_limit_exceeded")
-        print(f"[DocAI] InvalidArgument, skipping DocAI: {e}")
-        return _empty_result("invalid_argument")
+        max_in_flight = max(1, settings.DOC_AI_MAX_CONCURRENT_REQUESTS)
+        if max_in_flight == 1:
+            for page_map, chunk_bytes in chunks:
+                num_chunks += 1
+                pages_sent += len(page_map)
+                collect(page_map, *run_chunk(page_map, chunk_bytes))
+        else:
+            with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="docai") as pool:
+                # Oldest first, so pages are stitched back in order
+                in_flight: Deque[Tuple[List[int], Future]] = deque()
+                for page_map, chunk_bytes in chunks:
+                    num_chunks += 1
+                    pages_sent += len(page_map)
+                    in_flight.append((page_map, pool.submit(run_chunk, page_map, chunk_bytes)))
+                    del chunk_bytes
+                    if len(in_flight) >= max_in_flight:
+                        done_map, future = in_flight.popleft()
+                        collect(done_map, *future.result())
+                while in_flight:
+                    done_map, future = in_flight.popleft()
+                    collect(done_map, *future.result())
     except Exception as e:
-        # Any other unexpected error -> log and skip
+        # Any other unexpected error (opening / splitting the PDF) -> log and skip
         print(f"[DocAI] Unexpected error, skipping DocAI: {e}")
         return _empty_result("unexpected_error")
 
-    # If we reach here, DocAI worked
-    text_spans = []
-    tables = []
-
-    # Simple pass: whole document text as one span
-    if doc.text:
-        text_spans.append(
-            {
-                "page": 1,
-                "text": doc.text,
-                "bbox": None,
-                "source": "docai",
-            }
-        )
+    if not num_chunks:
+        return _empty_result("no_pages")
 
-    num_pages = len(doc.pages)
+    if len(failed_chunks) == num_chunks:
+        return _empty_result(failed_chunks[0]["reason"])
 
-    # Minimal table parsing
-    for page_index, page in enumerate(doc.pages):
-        for table in page.tables:
-            cells = []
-            # header_rows + body_rows
-            all_rows = list(table.header_rows) + list(table.body_rows)
-            for r_idx, row in enumerate(all_rows):
-                for c_idx, cell in enumerate(row.cells):
-                    # Some layouts might not have text_anchor.content populated
-                    cell_text = ""
-                    if cell.layout and cell.layout.text_anchor:
-                        cell_text = cell.layout.text_anchor.content or ""
-                    cells.append(
-                        {
-                            "row": r_idx,
-                            "col": c_idx,
-                            "text": cell_text,
-                        }
-                    )
-            if cells:
-                tables.append(
-                    {
-                        "page": page_index + 1,
-                        "cells": cells,
-                        "source": "docai",
-                    }
-                )
+    meta: Dict[str, Any] = {
+        "num_pages": num_pages,
+        "tool": "docai",
+        "skipped": False,
+        "chunks": num_chunks,
+        "pages_sent": pages_sent,
+    }
+    if failed_chunks:
+        meta["failed_chunks"] = failed_chunks
 
     return {
-        "meta": {
-            "num_pages": num_pages,
-            "tool": "docai",
-            "skipped": False,
-        },
+        "meta": meta,
         "text_spans": text_spans,
         "tables": tables,
     }
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import fitz  # PyMuPDF
+
+from config.settings import settings
+
+Extractor = Callable[..., Dict[str, Any]]
+
+
+def count_pages(pdf_path: str) -> int:
+    """Cheap page count (PyMuPDF only reads the page tree)."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def split_page_ranges(
+    num_pages: int,
+    num_chunks: int,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> List[List[int]]:
+    """
+    Split pages 1..num_pages (or the given page_numbers, in order) into at
+    most num_chunks contiguous runs of (almost) equal size.
+    Returns 1-based page numbers.
+    """
+    pages = list(page_numbers) if page_numbers is not None else list(range(1, num_pages + 1))
+    if not pages:
+        return []
+    num_chunks = max(1, min(num_chunks, len(pages)))
+    base, extra = divmod(len(pages), num_chunks)
+
+    ranges: List[List[int]] = []
+    start = 0
+    for i in range(num_chunks):
+        size = base + (1 if i < extra else 0)
+        ranges.append(pages[start:start + size])
+        start += size
+    return ranges
+
+
+def _merge_chunk_results(chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reassemble per-chunk results (already in page order) into the same shape
+    a single-process extractor returns.
+    """
+    text_spans: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+    decisions: List[Dict[str, Any]] = []
+    num_pages = 0
+    tool = None
+
+    for result in chunk_results:
+        text_spans.extend(result.get("text_spans", []))
+        tables.extend(result.get("tables", []))
+        decisions.extend(result.get("decisions", []))
+        meta = result.get("meta", {})
+        num_pages = max(num_pages, meta.get("num_pages") or 0)
+        tool = tool or meta.get("tool")
+
+    # Chunks are contiguous, but keep the guarantee explicit (stable sort)
+    text_spans.sort(key=lambda s: s["page"])
+    tables.sort(key=lambda t: t["page"])
+
+    merged: Dict[str, Any] = {
+        "meta": {
+            "num_pages": num_pages,
+            "tool": tool,
+            "page_parallel_chunks": len(chunk_results),
+        },
+        "text_spans": text_spans,
+        "tables": tables,
+    }
+    if decisions:
+        # Routing scores (routing.score_pages), one per page
+        merged["decisions"] = decisions
+    return merged
+
+
+def extract_pages_in_parallel(
+    extractors: Sequence[Extractor],
+    pdf_path: str,
+    workers: Optional[int] = None,
+    min_pages: Optional[int] = None,
+    num_pages: Optional[int] = None,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run page-aware extractors (extract_with_pdfplumber / extract_with_pymupdf)
+    over one document, splitting its pages across worker processes.
+    page_numbers (1-based) restricts the work to a subset of pages.
+    Returns one result per extractor, in the same order.
+    Documents with fewer than min_pages pages (or workers <= 1) stay on the
+    single-process path, where pool start-up would cost more than it saves.
+    """
+    workers = settings.PAGE_PARALLEL_WORKERS if workers is None else workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    min_pages = settings.PAGE_PARALLEL_MIN_PAGES if min_pages is None else min_pages
+
+    if page_numbers is not None:
+        num_pages = len(page_numbers)
+    elif workers > 1 and num_pages is None:
+        num_pages = count_pages(pdf_path)
+    if workers <= 1 or num_pages < min_pages:
+        return [extractor(pdf_path, page_numbers) for extractor in extractors]
+
+    page_ranges = split_page_ranges(num_pages, workers, page_numbers=page_numbers)
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(page_ranges), mp_context=mp_context) as pool:
+        # One pool for all extractors; submit everything before waiting
+        futures = [
+            [pool.submit(extractor, pdf_path, page_range) for page_range in page_ranges]
+            for extractor in extractors
+        ]
+        # Futures are kept in range order, so chunks come back in page order
+        return [
+            _merge_chunk_results([f.result() for f in chunk_futures])
+            for chunk_futures in futures
+        ]
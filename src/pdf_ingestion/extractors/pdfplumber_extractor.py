@@ -1,55 +1,74 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import pdfplumber
 
 
-def extract_with_pdfplumber(pdf_path: str) -> Dict[str, Any]:
+def iter_pdfplumber_pages(
+    pdf_path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]]:
     """
-    Basic extraction with pdfplumber.
-    Returns a dict with text_spans and tables.
+    Yield (text span or None, tables) page by page. Each page's parsed
+    objects are released once it has been read, so memory does not grow
+    with the page count; the file is closed when the generator ends.
     """
-    text_spans: List[Dict[str, Any]] = []
-    tables: List[Dict[str, Any]] = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        num_pages = len(pdf.pages)
-        for page_index, page in enumerate(pdf.pages):
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                text_spans.append(
-                    {
+    pages = list(page_numbers) if page_numbers is not None else None
+    with pdfplumber.open(pdf_path, pages=pages) as pdf:
+        for page in pdf.pages:
+            page_index = page.page_number - 1
+            try:
+                page_text = page.extract_text() or ""
+                span = None
+                if page_text.strip():
+                    span = {
                         "page": page_index + 1,
                         "text": page_text,
                         "bbox": None,
                         "source": "pdfplumber",
                     }
-                )
-
-            # crude table extraction (if any)
-            extracted_tables = page.extract_tables()
-            for t in extracted_tables:
-                cells = []
-                for r_idx, row in enumerate(t):
-                    for c_idx, cell_text in enumerate(row):
-                        if cell_text is None:
-                            continue
-                        cells.append(
+
+                # crude table extraction (if any)
+                tables: List[Dict[str, Any]] = []
+                for t in page.extract_tables():
+                    # Row-major, None where pdfplumber found no cell
+                    if any(cell is not None for row in t for cell in row):
+                        tables.append(
                             {
-                                "row": r_idx,
-                                "col": c_idx,
-                                "text": cell_text,
+                                "page": page_index + 1,
+                                "rows": t,
+                                "source": "pdfplumber",
                             }
                         )
-                if cells:
-                    tables.append(
-                        {
-                            "page": page_index + 1,
-                            "cells": cells,
-                            "source": "pdfplumber",
-                        }
-                    )
+            finally:
+                # Drops the page's cached chars / lines / layout; close() keeps
+                # the lru_cache of get_textmap, which references every char
+                page.close()
+                page.get_textmap.cache_clear()
+            yield span, tables
+
+
+def extract_with_pdfplumber(
+    pdf_path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Basic extraction with pdfplumber.
+    Returns a dict with text_spans and tables.
+    page_numbers (1-based) restricts extraction to those pages; page numbers
+    in the output always refer to the full document.
+    Each page's parsed objects are released after it is read (see
+    iter_pdfplumber_pages), but the returned spans / tables are collected
+    for the whole document and grow with the page count.
+    """
+    text_spans: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+
+    for span, page_tables in iter_pdfplumber_pages(pdf_path, page_numbers):
+        if span is not None:
+            text_spans.append(span)
+        tables.extend(page_tables)
 
     return {
         "meta": {
@@ -1,33 +1,62 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 
 import fitz  # PyMuPDF
 
 
-def extract_with_pymupdf(pdf_path: str) -> Dict[str, Any]:
+def _iter_page_spans(
+    doc: fitz.Document,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    if page_numbers is None:
+        page_indexes: Sequence[int] = range(doc.page_count)
+    else:
+        page_indexes = [n - 1 for n in page_numbers]
+
+    for page_index in page_indexes:
+        # Only one page is loaded at a time
+        page_text = doc.load_page(page_index).get_text("text") or ""
+        if page_text.strip():
+            yield {
+                "page": page_index + 1,
+                "text": page_text,
+                "bbox": None,
+                "source": "pymupdf",
+            }
+
+
+def iter_pymupdf_pages(
+    pdf_path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the text span of each non-empty page as it is read; the document
+    is closed when the generator finishes or is closed.
+    """
+    with fitz.open(pdf_path) as doc:
+        yield from _iter_page_spans(doc, page_numbers)
+
+
+def extract_with_pymupdf(
+    pdf_path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
     """
     Basic text extraction with PyMuPDF.
     For now, we ignore tables and use only text blocks.
+    page_numbers (1-based) restricts extraction to those pages.
+    Pages are loaded one at a time, but the returned spans cover the whole
+    document: only the parsing is bounded, the output grows with the page
+    count (iter_pymupdf_pages streams it instead).
     """
-    text_spans: List[Dict[str, Any]] = []
-
-    doc = fitz.open(pdf_path)
-    for page_index, page in enumerate(doc):
-        page_text = page.get_text("text") or ""
-        if page_text.strip():
-            text_spans.append(
-                {
-                    "page": page_index + 1,
-                    "text": page_text,
-                    "bbox": None,
-                    "source": "pymupdf",
-                }
-            )
+    with fitz.open(pdf_path) as doc:
+        num_pages = doc.page_count
+        text_spans: List[Dict[str, Any]] = list(_iter_page_spans(doc, page_numbers))
 
     return {
         "meta": {
-            "num_pages": len(doc),
+            "num_pages": num_pages,
             "tool": "pymupdf",
         },
         "text_spans": text_spans,
@@ -1,19 +1,91 @@
 from __future__ import annotations
 
+import fnmatch
 import os
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional
 
 
-def list_pdfs(raw_dir: str) -> List[Path]:
-    """Return all PDF files under data/raw (non-recursive for now)."""
-    p = Path(raw_dir)
-    return [f for f in p.iterdir() if f.is_file() and f.suffix.lower() == ".pdf"]
+def pdf_matches(
+    entry: os.DirEntry,
+    relative_path: str,
+    pattern: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    modified_since: Optional[float] = None,
+) -> bool:
+    """
+    Discovery filters for one file. pattern is a glob matched against the
+    file name and against its path relative to the input folder (so both
+    "*-signed.pdf" and "2024/*/*.pdf" work). The file is only stat'ed when
+    a size or date filter needs it.
+    """
+    if not entry.name.lower().endswith(".pdf"):
+        return False
+    if pattern and not (fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(relative_path, pattern)):
+        return False
+    if min_size is None and max_size is None and modified_since is None:
+        return True
+    try:
+        st = entry.stat()
+    except OSError:
+        return False  # removed since it was listed
+    if min_size is not None and st.st_size < min_size:
+        return False
+    if max_size is not None and st.st_size > max_size:
+        return False
+    if modified_since is not None and st.st_mtime < modified_since:
+        return False
+    return True
+
+
+def iter_pdfs(
+    raw_dir: str,
+    recursive: bool = True,
+    pattern: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    modified_since: Optional[float] = None,
+) -> Iterator[Path]:
+    """
+    Yield the PDF files under raw_dir as they are found (os.scandir, one
+    directory at a time), so processing can start before the whole tree has
+    been listed. Hidden entries are skipped and symlinked directories are
+    not followed. modified_since is a Unix timestamp.
+    """
+    stack = [(raw_dir, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    relative_path = f"{prefix}{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            subdirs.append((entry.path, f"{relative_path}/"))
+                    elif entry.is_file() and pdf_matches(
+                        entry, relative_path, pattern, min_size, max_size, modified_since
+                    ):
+                        yield Path(entry.path)
+        except OSError as e:
+            # A folder that vanished or is unreadable must not stop the walk
+            print(f"[Discovery] Skipping {directory}: {e}")
+            continue
+        # Depth-first, sub-folders in name order
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+def list_pdfs(raw_dir: str, recursive: bool = True, **filters) -> List[Path]:
+    """All PDF files under raw_dir at once (see iter_pdfs)."""
+    return list(iter_pdfs(raw_dir, recursive=recursive, **filters))
 
 
 def ensure_dir(path: str) -> None:
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
-def get_processed_json_path(processed_dir: str, doc_id: str) -> Path:
-    return Path(processed_dir) / f"{doc_id}.json"
+def get_processed_json_path(processed_dir: str, doc_id: str, suffix: str = ".json") -> Path:
+    return Path(processed_dir) / f"{doc_id}{suffix}"
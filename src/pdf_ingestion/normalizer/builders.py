@@ -1,8 +1,14 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-from src.models.super_json_schema import SuperJSON, TextSpan, Table, TableCell
+from src.models.super_json_schema import SuperJSON, TextSpan, Table, rows_from_cells
+
+
+def _table_rows(table_dict: Dict[str, Any]) -> List[List[Optional[str]]]:
+    if "rows" in table_dict:
+        return table_dict["rows"]
+    return rows_from_cells(table_dict.get("cells", []))
 
 
 def build_super_json(
@@ -10,26 +16,47 @@ def build_super_json(
     doc_id: str,
     filename: str,
     source_path: str,
+    validate: bool = False,
 ) -> SuperJSON:
+    """
+    merged_data comes from our own extractors and merge step, so by default
+    the models are built with model_construct (no per-span / per-table
+    validation). validate=True runs full pydantic validation instead.
+    """
     meta = merged_data.get("meta", {})
     num_pages = int(meta.get("num_pages", 0))
 
+    if validate:
+        return SuperJSON(
+            doc_id=doc_id,
+            filename=filename,
+            source_path=source_path,
+            num_pages=num_pages,
+            metadata=meta,
+            text_spans=merged_data.get("text_spans", []),
+            tables=merged_data.get("tables", []),
+        )
+
     text_span_models = [
-        TextSpan(**span_dict) for span_dict in merged_data.get("text_spans", [])
+        TextSpan.model_construct(
+            page=span_dict["page"],
+            text=span_dict["text"],
+            bbox=span_dict.get("bbox"),
+            source=span_dict["source"],
+        )
+        for span_dict in merged_data.get("text_spans", [])
     ]
 
-    table_models = []
-    for table_dict in merged_data.get("tables", []):
-        cells = [TableCell(**c) for c in table_dict.get("cells", [])]
-        table_models.append(
-            Table(
-                page=table_dict.get("page", 0),
-                cells=cells,
-                source=table_dict.get("source", "unknown"),
-            )
+    table_models = [
+        Table.model_construct(
+            page=table_dict.get("page", 0),
+            rows=_table_rows(table_dict),
+            source=table_dict.get("source", "unknown"),
         )
+        for table_dict in merged_data.get("tables", [])
+    ]
 
-    super_json = SuperJSON(
+    return SuperJSON.model_construct(
         doc_id=doc_id,
         filename=filename,
         source_path=source_path,
@@ -38,4 +65,3 @@ def build_super_json(
         text_spans=text_span_models,
         tables=table_models,
     )
-    return super_json
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, List
+
+# When two extractors read a page equally well, prefer this order
+SOURCE_PREFERENCE = ("pymupdf", "pdfplumber", "docai")
+
+
+def source_rank(source: str) -> int:
+    return SOURCE_PREFERENCE.index(source) if source in SOURCE_PREFERENCE else len(SOURCE_PREFERENCE)
+
+
+def text_quality(text: str) -> int:
+    """How much real content a reading has (OCR noise and blanks score low)."""
+    return sum(ch.isalnum() for ch in text)
+
+
+def rank_sources(texts_by_source: Dict[str, str]) -> List[str]:
+    """
+    Sources of one page's readings, best first: most content, ties broken
+    by SOURCE_PREFERENCE. The first one is the page's canonical reading,
+    both when merging the extractors' output and in the LLM payload.
+    """
+    return sorted(texts_by_source, key=lambda source: (-text_quality(texts_by_source[source]), source_rank(source)))
+
+
+def best_source(texts_by_source: Dict[str, str]) -> str:
+    return rank_sources(texts_by_source)[0]
+
+
+def page_texts_by_source(text_spans: List[Dict[str, Any]]) -> Dict[int, Dict[str, str]]:
+    """page -> source -> text of its spans on that page, joined."""
+    by_page: Dict[int, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+    for span in text_spans:
+        by_page[int(span.get("page", 0))][span.get("source", "unknown")].append(span.get("text") or "")
+    return {
+        page: {source: "\n".join(texts) for source, texts in by_source.items()}
+        for page, by_source in by_page.items()
+    }
+
+
+def canonical_sources(text_spans: List[Dict[str, Any]]) -> Dict[int, str]:
+    """The canonical source (see best_source) of each page."""
+    return {page: best_source(texts) for page, texts in page_texts_by_source(text_spans).items()}
@@ -1,6 +1,108 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+from src.pdf_ingestion.normalizer.canonical import rank_sources, source_rank
+
+# Word shingle size used to compare texts
+SHINGLE_SIZE = 3
+
+# A candidate whose shingles are at least this much contained in the chosen
+# text adds nothing and is dropped; below it, it is kept as an alternate
+TEXT_CONTAINMENT_THRESHOLD = 0.8
+TABLE_CONTAINMENT_THRESHOLD = 0.8
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(words: List[str], size: int = SHINGLE_SIZE) -> Set[Tuple[str, ...]]:
+    """
+    Word shingles, as a hash set. Comparing two pages is then a set
+    intersection, linear in the text length (no pairwise diffing).
+    """
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return set(zip(*(words[i:] for i in range(size))))
+
+
+def _containment(part: Set[Any], whole: Set[Any]) -> float:
+    """Share of `part` found in `whole` (1.0 when part is empty)."""
+    if not part:
+        return 1.0
+    return len(part & whole) / len(part)
+
+
+def _merge_page_spans(
+    spans_by_source: Dict[str, List[Dict[str, Any]]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reconcile the readings of one page. The canonical reading (see
+    canonical.rank_sources) wins; readings mostly contained in it are
+    dropped as duplicates, the others are kept (e.g. OCR text of a scanned
+    figure the text layer does not have).
+    """
+    texts = {
+        source: "\n".join(s.get("text") or "" for s in spans)
+        for source, spans in spans_by_source.items()
+    }
+    candidates = [
+        (source, spans_by_source[source], _WORD_RE.findall(texts[source].lower()))
+        for source in rank_sources(texts)
+    ]
+
+    chosen_source, chosen_spans, chosen_words = candidates[0]
+    kept_spans = list(chosen_spans)
+    kept_shingles = _shingles(chosen_words)
+    provenance: Dict[str, Any] = {"chosen": chosen_source, "duplicates": [], "alternates": []}
+
+    for source, spans, words in candidates[1:]:
+        shingles = _shingles(words)
+        if _containment(shingles, kept_shingles) >= TEXT_CONTAINMENT_THRESHOLD:
+            provenance["duplicates"].append(source)
+            continue
+        kept_spans.extend(spans)
+        kept_shingles |= shingles
+        provenance["alternates"].append(source)
+
+    return kept_spans, provenance
+
+
+def _table_cell_texts(table: Dict[str, Any]) -> List[str]:
+    if "rows" in table:
+        return [cell for row in table["rows"] for cell in row if cell]
+    return [c.get("text") or "" for c in table.get("cells", []) if c.get("text")]
+
+
+def _table_fingerprint(table: Dict[str, Any]) -> Set[str]:
+    """Normalized cell texts, so whitespace / case differences do not matter."""
+    return {" ".join(_WORD_RE.findall(text.lower())) for text in _table_cell_texts(table)} - {""}
+
+
+def _merge_page_tables(tables: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    De-duplicate the tables found on one page: a table whose cells are
+    mostly contained in an already kept table (compared as hashed cell
+    texts) is dropped. Bigger tables are considered first.
+    """
+    ordered = sorted(
+        tables,
+        key=lambda t: (-len(_table_cell_texts(t)), source_rank(t.get("source", ""))),
+    )
+    kept: List[Tuple[Dict[str, Any], Set[str], Dict[str, Any]]] = []
+    for table in ordered:
+        fingerprint = _table_fingerprint(table)
+        if not fingerprint:
+            continue
+        for _, kept_fingerprint, provenance in kept:
+            if _containment(fingerprint, kept_fingerprint) >= TABLE_CONTAINMENT_THRESHOLD:
+                provenance["duplicates"].append(table.get("source"))
+                break
+        else:
+            kept.append((table, fingerprint, {"chosen": table.get("source"), "duplicates": []}))
+
+    return [t for t, _, _ in kept], [p for _, _, p in kept]
 
 
 def merge_extractions(
@@ -9,15 +111,38 @@ def merge_extractions(
     docai_data: Dict[str, Any],
 ) -> Dict[str, Any]:
     """
-    For now we just concatenate text_spans and tables from all tools.
-    Later you can add smarter merging / de-duplication.
+    Reconcile the output of all tools page by page:
+    - text: keep the richest reading of each page, drop readings that
+      repeat it (shingle containment), keep ones that add content
+    - tables: drop tables another tool already found on the same page
+    Which tool was kept / dropped for each page is recorded in
+    meta["provenance"].
     """
-    all_text_spans: List[Dict[str, Any]] = []
-    all_tables: List[Dict[str, Any]] = []
+    spans_by_page: Dict[int, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+    tables_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    spans_in = tables_in = 0
 
     for data in (pdfplumber_data, pymupdf_data, docai_data):
-        all_text_spans.extend(data.get("text_spans", []))
-        all_tables.extend(data.get("tables", []))
+        for span in data.get("text_spans", []):
+            spans_by_page[span.get("page", 0)][span.get("source", "unknown")].append(span)
+            spans_in += 1
+        for table in data.get("tables", []):
+            tables_by_page[table.get("page", 0)].append(table)
+            tables_in += 1
+
+    all_text_spans: List[Dict[str, Any]] = []
+    text_provenance: Dict[str, Any] = {}
+    for page in sorted(spans_by_page):
+        page_spans, provenance = _merge_page_spans(spans_by_page[page])
+        all_text_spans.extend(page_spans)
+        text_provenance[str(page)] = provenance
+
+    all_tables: List[Dict[str, Any]] = []
+    table_provenance: Dict[str, Any] = {}
+    for page in sorted(tables_by_page):
+        page_tables, provenance = _merge_page_tables(tables_by_page[page])
+        all_tables.extend(page_tables)
+        table_provenance[str(page)] = provenance
 
     num_pages_candidates = []
     for data in (pdfplumber_data, pymupdf_data, docai_data):
@@ -30,7 +155,20 @@ def merge_extractions(
     merged_meta: Dict[str, Any] = {
         "tools_used": [d.get("meta", {}).get("tool") for d in (pdfplumber_data, pymupdf_data, docai_data)],
         "num_pages": num_pages,
+        "merge": {
+            "text_spans_in": spans_in,
+            "text_spans_out": len(all_text_spans),
+            "tables_in": tables_in,
+            "tables_out": len(all_tables),
+        },
+        "provenance": {
+            "text": text_provenance,
+            "tables": table_provenance,
+        },
     }
+    routing = pymupdf_data.get("meta", {}).get("routing")
+    if routing:
+        merged_meta["routing"] = routing
 
     return {
         "meta": merged_meta,
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+from config.settings import settings
+from src.pdf_ingestion.extractors.page_parallel import extract_pages_in_parallel
+from src.pdf_ingestion.extractors.pymupdf_extractor import _iter_page_spans
+
+ROUTE_DIGITAL = "digital"  # usable text layer
+ROUTE_SCANNED = "scanned"  # little text, covered by images -> OCR
+ROUTE_SPARSE = "sparse"    # little text, no images (cover / blank pages)
+
+
+def skipped_result(tool: str, reason: str) -> Dict[str, Any]:
+    """Empty extractor output for a tool the router did not run."""
+    return {
+        "meta": {
+            "num_pages": 0,
+            "tool": tool,
+            "skipped": True,
+            "reason": reason,
+        },
+        "text_spans": [],
+        "tables": [],
+    }
+
+
+def _image_coverage(page: fitz.Page) -> float:
+    """Share of the page area covered by images (overlaps counted once per image)."""
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page_rect)
+    return min(1.0, covered / page_area)
+
+
+def _page_ranges(pages: List[int]) -> List[str]:
+    """[1, 2, 3, 7] -> ["1-3", "7"], to keep the decision log short."""
+    ranges: List[List[int]] = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return [f"{a}-{b}" if a != b else str(a) for a, b in ranges]
+
+
+def score_pages(
+    pdf_path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Read the text layer of the given pages (default: all) and score each one:
+    - text_chars: non-whitespace characters in the text layer
+    - image_coverage: share of the page covered by images
+    - lines: vector line / rectangle items on text pages (ruled tables)
+    Returns extract_with_pymupdf() output plus the per-page "decisions".
+    Top-level so extract_pages_in_parallel can split it across processes.
+    """
+    min_chars = settings.ROUTING_MIN_TEXT_CHARS
+    min_coverage = settings.ROUTING_MIN_IMAGE_COVERAGE
+
+    decisions: List[Dict[str, Any]] = []
+    with fitz.open(pdf_path) as doc:
+        num_pages = doc.page_count
+        text_spans = list(_iter_page_spans(doc, page_numbers))
+        page_texts = {span["page"]: span["text"] for span in text_spans}
+        for page_number in range(1, num_pages + 1) if page_numbers is None else page_numbers:
+            text_chars = len("".join(page_texts.get(page_number, "").split()))
+            page = doc.load_page(page_number - 1)
+            decision: Dict[str, Any] = {"page": page_number, "text_chars": text_chars}
+            if text_chars >= min_chars:
+                # A whole grid is often a single drawing: count its items
+                lines = sum(len(d["items"]) for d in page.get_drawings())
+                decision.update(route=ROUTE_DIGITAL, lines=lines)
+            else:
+                coverage = round(_image_coverage(page), 3)
+                decision["image_coverage"] = coverage
+                decision["route"] = ROUTE_SCANNED if coverage >= min_coverage else ROUTE_SPARSE
+            decisions.append(decision)
+
+    return {
+        "meta": {
+            "num_pages": num_pages,
+            "tool": "pymupdf",
+        },
+        "text_spans": text_spans,
+        "tables": [],
+        "decisions": decisions,
+    }
+
+
+def plan_extraction(
+    pdf_path: str,
+    page_workers: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    One cheap PyMuPDF pass over the document (see score_pages) that both
+    extracts its text layer and decides which slow extractor each page needs:
+    - digital pages -> pdfplumber only if they look like they hold a table
+    - scanned pages -> DocAI (sent as a subset PDF)
+    - sparse pages  -> nothing beyond PyMuPDF
+    Large documents are split across page_workers processes like the other
+    extractors (see extract_pages_in_parallel).
+    Returns (plan, pymupdf_data); pymupdf_data has the same shape as
+    extract_with_pymupdf() output (all spans kept: see there).
+    """
+    pymupdf_data = extract_pages_in_parallel([score_pages], pdf_path, workers=page_workers)[0]
+    decisions = pymupdf_data.pop("decisions", [])
+
+    min_lines = settings.ROUTING_MIN_TABLE_LINES
+    pdfplumber_pages = [
+        d["page"] for d in decisions if d["route"] == ROUTE_DIGITAL and d["lines"] >= min_lines
+    ]
+    docai_pages = [d["page"] for d in decisions if d["route"] == ROUTE_SCANNED]
+
+    counts = {route: 0 for route in (ROUTE_DIGITAL, ROUTE_SCANNED, ROUTE_SPARSE)}
+    for decision in decisions:
+        counts[decision["route"]] += 1
+
+    plan = {
+        "mode": "adaptive",
+        "num_pages": pymupdf_data["meta"]["num_pages"],
+        "routes": counts,
+        "pdfplumber_pages": pdfplumber_pages,
+        "docai_pages": docai_pages,
+        "decisions": decisions,
+    }
+    return plan, pymupdf_data
+
+
+def routing_log(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Decision log stored with the document (page lists as ranges)."""
+    return {
+        "mode": plan["mode"],
+        "routes": plan["routes"],
+        "pdfplumber_pages": _page_ranges(plan["pdfplumber_pages"]),
+        "docai_pages": _page_ranges(plan["docai_pages"]),
+        "decisions": plan["decisions"],
+    }
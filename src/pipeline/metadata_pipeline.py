@@ -1,41 +1,206 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+import datetime
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 from config.settings import settings
-from src.storage.super_json_reader import get_super_json_record
+from src.models.super_json_schema import SuperJSON
+from src.storage.super_json_reader import (
+    get_document_projection,
+    get_super_json_record,
+    iter_document_projections,
+    iter_super_json_records,
+)
 from src.llm.gemini_client import generate_contract_metadata, GeminiError
+from src.llm.payload_builder import build_llm_payload
+from src.storage.serialization import encode_super_json
 from src.storage.contract_metadata_repository import insert_contract_metadata_row
 
 
-def extract_and_store_contract_metadata(doc_id: str) -> Dict[str, Any]:
+def extract_and_store_contract_metadata(
+    doc_id: str,
+    refresh: bool = False,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> Dict[str, Any]:
     """
     Step 2 main function:
-    - Reads JSON (super_json) from BigQuery for the given doc_id
+    - Reads JSON (super_json) from the document store for the given doc_id
+      (ingested_since narrows the BigQuery read to the recent partitions)
+    - Compacts it into a de-duplicated, token-budgeted payload
     - Sends it to Gemini with the contract metadata prompt
+      (answered from the local response cache unless refresh=True)
     - Parses the normalized JSON
     - Stores result in contract_metadata table
     - Returns the metadata dict
     """
-    record = get_super_json_record(doc_id)
+    if settings.LLM_COMPACT_PAYLOAD:
+        # The compact payload only uses each page's canonical text
+        record = get_document_projection(doc_id, ingested_since=ingested_since)
+    else:
+        record = get_super_json_record(doc_id, ingested_since=ingested_since)
     if record is None:
         raise RuntimeError(f"No record found in {settings.BQ_TABLE} for doc_id={doc_id}")
 
-    json_payload = record["super_json"]  # string
-    filename = record["filename"]
+    return extract_and_store_from_record(record, refresh=refresh)
 
+
+def extract_and_store_from_record(record: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+    """
+    Same as extract_and_store_contract_metadata, for a super_json record
+    that was already fetched (keys: doc_id, filename, and super_json, or
+    document for a projection read from the structured tables).
+    """
+    if "document" in record:
+        # Already parsed, and only what the compact payload needs
+        json_payload = _compact_payload(record["doc_id"], record["document"])
+    else:
+        json_payload = record["super_json"]  # string
+        if settings.LLM_COMPACT_PAYLOAD:
+            json_payload = _compact_payload(record["doc_id"], json.loads(json_payload))
+
+    return _generate_and_store(record["doc_id"], record["filename"], json_payload, refresh=refresh)
+
+
+def extract_and_store_from_super_json(
+    super_json: SuperJSON,
+    refresh: bool = False,
+    to_bigquery: bool = True,
+    on_stored: Optional[Callable[[bool, Optional[str]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Step 2 for a SuperJSON still in memory (streaming `run` command): the
+    document goes to Gemini straight from step 1, without reading it back
+    from BigQuery. With to_bigquery=False the metadata row is only kept in
+    the local SQLite store.
+    on_stored(ok, error) is called once the contract_metadata row is
+    inserted or given up on.
+    """
+    if settings.LLM_COMPACT_PAYLOAD:
+        json_payload = _compact_payload(super_json.doc_id, super_json.model_dump())
+    else:
+        # Same string step 1 stores, so both paths share response cache entries
+        json_payload = encode_super_json(super_json)
+
+    return _generate_and_store(
+        super_json.doc_id,
+        super_json.filename,
+        json_payload,
+        refresh=refresh,
+        to_bigquery=to_bigquery,
+        on_stored=on_stored,
+    )
+
+
+def _compact_payload(doc_id: str, super_json: Dict[str, Any]) -> str:
+    json_payload, stats = build_llm_payload(super_json)
+    print(
+        f"[LLM] {doc_id}: ~{stats['tokens_before']} -> ~{stats['tokens_after']} input tokens "
+        f"({stats['pages_kept']} pages kept, {stats['pages_omitted_budget']} omitted for budget)"
+    )
+    return json_payload
+
+
+def _generate_and_store(
+    doc_id: str,
+    filename: str,
+    json_payload: str,
+    refresh: bool = False,
+    to_bigquery: bool = True,
+    on_stored: Optional[Callable[[bool, Optional[str]], None]] = None,
+) -> Dict[str, Any]:
     # Call Gemini
     try:
-        metadata = generate_contract_metadata(json_payload)
+        metadata = generate_contract_metadata(json_payload, refresh=refresh)
     except GeminiError as e:
         raise RuntimeError(f"Gemini error while processing doc_id={doc_id}: {e}") from e
 
-    # Insert into BigQuery
+    # Insert into the document store (BigQuery and / or local SQLite)
     insert_contract_metadata_row(
-        doc_id=record["doc_id"],
+        doc_id=doc_id,
         filename=filename,
         llm_model=settings.GEMINI_MODEL,
         metadata=metadata,
+        on_stored=on_stored,
+        to_bigquery=to_bigquery,
     )
 
     return metadata
+
+
+def iter_metadata_records(
+    doc_ids: Optional[List[str]] = None,
+    pending_only: bool = False,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Records to feed extract_metadata_for_records: with LLM_COMPACT_PAYLOAD,
+    only the canonical text and tables of each document (projected from
+    the structured tables where it has rows there), otherwise the whole
+    super_json strings.
+    """
+    if settings.LLM_COMPACT_PAYLOAD:
+        return iter_document_projections(doc_ids, pending_only=pending_only, ingested_since=ingested_since)
+    return iter_super_json_records(doc_ids, pending_only=pending_only, ingested_since=ingested_since)
+
+
+def extract_metadata_for_records(
+    records: Iterable[Dict[str, Any]],
+    on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    concurrency: Optional[int] = None,
+    refresh: bool = False,
+) -> Dict[str, int]:
+    """
+    Step 2 over many documents. records is consumed lazily (e.g. straight
+    from iter_metadata_records), so the first documents go to Gemini while
+    later ones are still being fetched.
+    Up to `concurrency` documents (default GEMINI_MAX_CONCURRENCY) are in
+    flight at once; the shared rate limiter keeps them within quota.
+    A failing document is reported and skipped.
+    Returns total / succeeded / failed counts.
+    """
+    concurrency = settings.GEMINI_MAX_CONCURRENCY if concurrency is None else concurrency
+    concurrency = max(1, concurrency)
+
+    counts = {"total": 0, "failed": 0}
+
+    def report(doc_id: str, metadata: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+        # Always called from this (the submitting) thread
+        counts["total"] += 1
+        if error is not None:
+            counts["failed"] += 1
+            print(f"  [{counts['total']}] ✘ Failed {doc_id}: {error}")
+            return
+        print(f"  [{counts['total']}] ✔ Done {doc_id}")
+        if on_result is not None:
+            on_result(doc_id, metadata)
+
+    if concurrency == 1:
+        for record in records:
+            try:
+                metadata = extract_and_store_from_record(record, refresh=refresh)
+            except Exception as e:
+                report(record["doc_id"], None, e)
+                continue
+            report(record["doc_id"], metadata, None)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gemini") as pool:
+            in_flight: Dict[Future, str] = {}
+            for record in records:
+                # Bounded window: do not pull records faster than we can use them
+                if len(in_flight) >= concurrency * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        doc_id = in_flight.pop(future)
+                        report(doc_id, None if future.exception() else future.result(), future.exception())
+                future = pool.submit(extract_and_store_from_record, record, refresh=refresh)
+                in_flight[future] = record["doc_id"]
+
+            for future in list(in_flight):
+                error = future.exception()
+                report(in_flight.pop(future), None if error else future.result(), error)
+
+    total, failed = counts["total"], counts["failed"]
+    print(f"Metadata extraction finished: {total - failed} ok, {failed} failed, {total} total")
+    return {"total": total, "succeeded": total - failed, "failed": failed}
@@ -1,29 +1,222 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from config.settings import settings
-from src.pdf_ingestion.loaders import list_pdfs, ensure_dir
-from src.pipeline.steps import build_and_store_super_json
+from src.pdf_ingestion.loaders import iter_pdfs, ensure_dir
+from src.pipeline.steps import build_and_store_super_json, resume_super_json
+from src.storage.bq_writer import flush_all_writers
+from src.storage.ledger import GAVE_UP, RUN, STAGE_EXTRACTED, STAGE_STORED, get_ledger
+from src.storage.local_store import sends_to_bigquery
 
 
-def process_single_pdf(pdf_path: str, to_bigquery: bool = True) -> None:
+def process_single_pdf(
+    pdf_path: str,
+    to_bigquery: bool = True,
+    page_workers: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    deterministic_ids: Optional[bool] = None,
+    routing: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Process one PDF. Returns {"rows_failed": n}: BigQuery rows given up on
+    (the batch writers report them instead of raising).
+    """
     processed_dir = str(Path("data") / "processed")
     ensure_dir(processed_dir)
-    build_and_store_super_json(pdf_path, processed_dir=processed_dir, to_bigquery=to_bigquery)
+    build_and_store_super_json(
+        pdf_path,
+        processed_dir=processed_dir,
+        to_bigquery=to_bigquery,
+        page_workers=page_workers,
+        use_cache=use_cache,
+        deterministic_ids=deterministic_ids,
+        routing=routing,
+    )
+    rows_failed = 0
+    if to_bigquery:
+        rows_failed = sum(counts["failed"] for counts in flush_all_writers().values())
+    return {"rows_failed": rows_failed}
 
 
-def process_batch(input_dir: str, to_bigquery: bool = True) -> None:
+def process_batch(
+    input_dir: str,
+    to_bigquery: bool = True,
+    workers: int = 1,
+    use_cache: Optional[bool] = None,
+    deterministic_ids: Optional[bool] = None,
+    routing: Optional[str] = None,
+    use_ledger: Optional[bool] = None,
+    discovery: Optional[Dict[str, Any]] = None,
+    pdf_files: Optional[Iterable[Path]] = None,
+) -> Dict[str, int]:
+    """
+    Process every PDF under input_dir (recursively; discovery holds the
+    other loaders.iter_pdfs options: recursive, pattern, min_size, max_size,
+    modified_since), or the given pdf_files instead.
+    Files are discovered lazily: the first ones are processed while the
+    rest of the tree is still being listed.
+    - workers <= 1: one file at a time, in this process
+    - workers > 1: pdfplumber / PyMuPDF run in a pool of `workers` processes,
+      while DocAI and BigQuery calls are overlapped from a thread pool
+    With the processing ledger (default LEDGER_ENABLED), files whose stages
+    are all done are skipped, a file interrupted after extraction is only
+    stored, and failed files are retried until LEDGER_MAX_ATTEMPTS.
+    A failing file is reported and skipped; it never aborts the batch.
+    Returns a small summary with total / succeeded / failed / skipped counts,
+    and rows_failed: BigQuery rows given up on.
+    """
     processed_dir = str(Path("data") / "processed")
     ensure_dir(processed_dir)
 
-    pdf_files: List[Path] = list_pdfs(input_dir)
-    if not pdf_files:
+    if pdf_files is None:
+        pdf_files = iter_pdfs(input_dir, **(discovery or {}))
+
+    build_kwargs = {
+        "processed_dir": processed_dir,
+        "to_bigquery": to_bigquery,
+        "use_cache": use_cache,
+        "deterministic_ids": deterministic_ids,
+        "routing": routing,
+    }
+    use_ledger = settings.LEDGER_ENABLED if use_ledger is None else use_ledger
+    stages = [STAGE_EXTRACTED] + ([STAGE_STORED] if sends_to_bigquery(to_bigquery) else [])
+    work = _ledger_work(pdf_files, stages) if use_ledger else ((pdf_path, None, None) for pdf_path in pdf_files)
+
+    started = time.perf_counter()
+    if workers <= 1:
+        summary = _process_sequential(work, build_kwargs)
+    else:
+        summary = _process_parallel(work, build_kwargs, workers)
+    if not summary["total"]:
         print(f"No PDF files found in {input_dir}")
-        return
+        return summary
+
+    summary["rows_failed"] = 0
+    if to_bigquery:
+        # Rows are written in bulk: push out whatever is still buffered
+        for table_id, counts in flush_all_writers().items():
+            print(f"[BQ] {table_id}: {counts['inserted']} rows inserted, {counts['failed']} failed")
+            summary["rows_failed"] += counts["failed"]
+
+    elapsed = time.perf_counter() - started
+    rate = (summary["succeeded"] + summary["failed"]) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Batch finished: {summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{summary['skipped']} skipped, {summary['total']} total in {elapsed:.1f}s ({rate:.2f} files/s)"
+    )
+    return summary
+
+
+# (pdf path, ledger key, stages still to do). Without the ledger key and
+# stages are None; a file with nothing left to do has stages == [].
+_Work = Tuple[Path, Optional[str], Optional[List[str]]]
 
+
+def _ledger_work(pdf_files: Iterable[Path], stages: List[str]) -> Iterator[_Work]:
+    """Every file with what the ledger says is left of `stages` for it."""
+    ledger = get_ledger()
     for pdf_path in pdf_files:
+        key = ledger.register(str(pdf_path))
+        decision, pending = ledger.plan(key, stages)
+        if decision == GAVE_UP:
+            print(f"  [Ledger] Skipping {pdf_path.name}: {pending[0]} failed {ledger.max_attempts} times")
+        yield pdf_path, key, pending if decision == RUN else []
+
+
+def _build(pdf_path: Path, key: Optional[str], pending: Optional[List[str]], **kwargs: Any) -> Any:
+    if key is None:
+        return build_and_store_super_json(str(pdf_path), **kwargs)
+    return resume_super_json(str(pdf_path), key, pending, **kwargs)
+
+
+def _report(done: int, pdf_path: Path, error: Optional[BaseException]) -> None:
+    # The total is not known up front: files are still being discovered
+    if error is None:
+        print(f"  [{done}] ✔ Done {pdf_path}")
+    else:
+        print(f"  [{done}] ✘ Failed {pdf_path}: {error}")
+
+
+def _process_sequential(
+    work: Iterable[_Work],
+    build_kwargs: Dict[str, Any],
+) -> Dict[str, int]:
+    done = 0
+    failed = 0
+    skipped = 0
+
+    for pdf_path, key, pending in work:
+        done += 1
+        if pending == []:
+            skipped += 1
+            continue
         print(f"Processing: {pdf_path}")
-        build_and_store_super_json(str(pdf_path), processed_dir=processed_dir, to_bigquery=to_bigquery)
-        print(f"  ✔ Done {pdf_path.name}")
+        error: Optional[BaseException] = None
+        try:
+            _build(pdf_path, key, pending, **build_kwargs)
+        except Exception as e:
+            error = e
+            failed += 1
+        _report(done, pdf_path, error)
+
+    return {"total": done, "succeeded": done - failed - skipped, "failed": failed, "skipped": skipped}
+
+
+def _process_parallel(
+    work: Iterable[_Work],
+    build_kwargs: Dict[str, Any],
+    workers: int,
+) -> Dict[str, int]:
+    done = 0
+    failed = 0
+    skipped = 0
+
+    # Enough orchestration threads to keep every CPU worker busy while other
+    # documents wait on DocAI / BigQuery.
+    io_threads = workers * 2
+    max_in_flight = io_threads * 2
+
+    # "spawn" so worker processes never inherit gRPC / HTTP state from the
+    # parent's DocAI and BigQuery threads (forking those is not safe).
+    mp_context = multiprocessing.get_context("spawn")
+
+    print(f"Processing files with {workers} workers (pid {os.getpid()})")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="batch-io") as io_pool:
+        in_flight: Dict[Future, Path] = {}
+        pending_work = iter(work)
+
+        def submit_next() -> bool:
+            nonlocal done, skipped
+            for pdf_path, key, pending in pending_work:
+                if pending == []:
+                    done += 1
+                    skipped += 1
+                    continue
+                future = io_pool.submit(_build, pdf_path, key, pending, cpu_pool=cpu_pool, **build_kwargs)
+                in_flight[future] = pdf_path
+                return True
+            return False
+
+        # Bounded window: never queue more work than we can keep moving
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                pdf_path = in_flight.pop(future)
+                error = future.exception()
+                done += 1
+                if error is not None:
+                    failed += 1
+                _report(done, pdf_path, error)
+                submit_next()
+
+    return {"total": done, "succeeded": done - failed - skipped, "failed": failed, "skipped": skipped}
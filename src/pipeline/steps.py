@@ -1,60 +1,303 @@
 from __future__ import annotations
 
-import json
+import os
 import uuid
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Tuple
+from typing import Any, List, Optional, Tuple
 
 from src.pdf_ingestion.extractors.pdfplumber_extractor import extract_with_pdfplumber
 from src.pdf_ingestion.extractors.pymupdf_extractor import extract_with_pymupdf
 from src.pdf_ingestion.extractors.docai_extractor import process_with_docai
+from src.pdf_ingestion.extractors.page_parallel import extract_pages_in_parallel
 from src.pdf_ingestion.normalizer.merging import merge_extractions
+from src.pdf_ingestion.routing import plan_extraction, routing_log, skipped_result
 from src.pdf_ingestion.normalizer.builders import build_super_json
-from src.pdf_ingestion.loaders import ensure_dir, get_processed_json_path
+from src.pdf_ingestion.loaders import ensure_dir
 from src.models.super_json_schema import SuperJSON
-from src.storage.super_json_repository import save_super_json_to_bq
+from src.storage.super_json_repository import save_super_json
+from src.storage.serialization import encode_super_json, read_processed_json, write_processed_json
+from src.storage.extraction_cache import extraction_cache_key, file_sha256, get_extraction_cache
+from src.storage.ledger import STAGE_EXTRACTED, STAGE_STORED, get_ledger
+from src.storage.local_store import sends_to_bigquery
+from src.metrics.recorder import get_metrics, stage
+from config.settings import settings
 
 
-def run_extraction(pdf_path: str) -> Tuple[dict, dict, dict]:
-    pdfplumber_data = extract_with_pdfplumber(pdf_path)
-    pymupdf_data = extract_with_pymupdf(pdf_path)
+def run_local_extraction(
+    pdf_path: str,
+    page_workers: Optional[int] = None,
+) -> Tuple[dict, dict]:
+    """
+    CPU-bound part of the extraction (pdfplumber + PyMuPDF).
+    Kept as a top-level function so it can be shipped to a process pool.
+    Large documents are split across page_workers processes
+    (default: settings.PAGE_PARALLEL_WORKERS); pass 1 to stay single-process.
+    """
+    pdfplumber_data, pymupdf_data = extract_pages_in_parallel(
+        [extract_with_pdfplumber, extract_with_pymupdf],
+        pdf_path,
+        workers=page_workers,
+    )
+    return pdfplumber_data, pymupdf_data
+
+
+def run_docai_extraction(pdf_path: str, page_numbers: Optional[List[int]] = None) -> dict:
+    """I/O-bound part of the extraction (Document AI round-trip)."""
+    with stage("docai") as info:
+        # DocAI reads the file chunk by chunk, never the whole PDF at once
+        docai_data = process_with_docai(pdf_path, page_numbers=page_numbers)
+
+        meta = docai_data.get("meta", {})
+        info["bytes"] = os.path.getsize(pdf_path)
+        info["pages"] = meta.get("pages_sent") or 0
+        info["failed_chunks"] = len(meta.get("failed_chunks", []))
+        if meta.get("skipped"):
+            info["skip_reason"] = meta.get("reason")
+    return docai_data
+
+
+def run_routed_extraction(
+    pdf_path: str,
+    cpu_pool: Optional[Executor] = None,
+    page_workers: Optional[int] = None,
+) -> Tuple[dict, dict, dict]:
+    """
+    Adaptive extraction: PyMuPDF reads and scores every page, then
+    pdfplumber only runs on pages that look like tables and DocAI only on
+    scanned pages. The routing decision log ends up in the PyMuPDF meta.
+    """
+    with stage("routing") as info:
+        if cpu_pool is None:
+            plan, pymupdf_data = plan_extraction(pdf_path, page_workers=page_workers)
+        else:
+            # Files are already spread over the pool: one process per file
+            plan, pymupdf_data = cpu_pool.submit(plan_extraction, pdf_path, 1).result()
+        info["pages"] = plan["num_pages"]
+    pymupdf_data["meta"]["routing"] = routing_log(plan)
+
+    pdfplumber_pages = plan["pdfplumber_pages"]
+    docai_pages = plan["docai_pages"]
+    print(
+        f"[Routing] {Path(pdf_path).name}: {plan['routes']} -> "
+        f"pdfplumber {len(pdfplumber_pages)} pages, DocAI {len(docai_pages)} pages"
+    )
+
+    plumber_future = None
+    if pdfplumber_pages and cpu_pool is not None:
+        plumber_future = cpu_pool.submit(extract_with_pdfplumber, pdf_path, pdfplumber_pages)
+
+    try:
+        if docai_pages:
+            docai_data = run_docai_extraction(pdf_path, page_numbers=docai_pages)
+        else:
+            docai_data = skipped_result("docai", "no_scanned_pages")
+            get_metrics().skip("docai", "no_scanned_pages")
+    finally:
+        if plumber_future is not None:
+            pdfplumber_data = plumber_future.result()
+
+    if plumber_future is None:
+        if pdfplumber_pages:
+            with stage("pdfplumber", pages=len(pdfplumber_pages)):
+                pdfplumber_data = extract_pages_in_parallel(
+                    [extract_with_pdfplumber], pdf_path, workers=page_workers, page_numbers=pdfplumber_pages
+                )[0]
+        else:
+            pdfplumber_data = skipped_result("pdfplumber", "no_table_pages")
+            get_metrics().skip("pdfplumber", "no_table_pages")
+
+    return pdfplumber_data, pymupdf_data, docai_data
+
+
+def run_extraction(
+    pdf_path: str,
+    cpu_pool: Optional[Executor] = None,
+    page_workers: Optional[int] = None,
+    routing: Optional[str] = None,
+) -> Tuple[dict, dict, dict]:
+    """
+    Run the extractors on one PDF.
+    routing (default settings.EXTRACTION_ROUTING): "adaptive" only runs the
+    slow extractors on the pages that need them, "all" runs every
+    extractor on every page.
+    If a cpu_pool is given, the local extractors run there while the DocAI
+    call is made from the current thread, so both overlap. The pool already
+    spreads documents across cores, so pages are not split any further.
+    """
+    routing = settings.EXTRACTION_ROUTING if routing is None else routing
+    with stage("extract") as info:
+        if routing == "adaptive":
+            extractions = run_routed_extraction(pdf_path, cpu_pool=cpu_pool, page_workers=page_workers)
+        else:
+            extractions = run_all_extractors(pdf_path, cpu_pool=cpu_pool, page_workers=page_workers)
+        info["pages"] = max(data.get("meta", {}).get("num_pages") or 0 for data in extractions)
+        info["bytes"] = os.path.getsize(pdf_path)
+    return extractions
+
+
+def run_all_extractors(
+    pdf_path: str,
+    cpu_pool: Optional[Executor] = None,
+    page_workers: Optional[int] = None,
+) -> Tuple[dict, dict, dict]:
+    """pdfplumber, PyMuPDF and DocAI on every page (routing "all")."""
+    if cpu_pool is None:
+        pdfplumber_data, pymupdf_data = run_local_extraction(pdf_path, page_workers=page_workers)
+        docai_data = run_docai_extraction(pdf_path)
+        return pdfplumber_data, pymupdf_data, docai_data
 
-    # Read bytes for DocAI
-    with open(pdf_path, "rb") as f:
-        pdf_bytes = f.read()
-    docai_data = process_with_docai(pdf_bytes)
+    local_future = cpu_pool.submit(run_local_extraction, pdf_path, 1)
+    try:
+        docai_data = run_docai_extraction(pdf_path)
+    finally:
+        # Always wait, so a DocAI failure does not leave orphaned work behind
+        pdfplumber_data, pymupdf_data = local_future.result()
 
     return pdfplumber_data, pymupdf_data, docai_data
 
 
+def make_doc_id(pdf_path: str, content_hash: Optional[str] = None) -> str:
+    """
+    <filename stem>-<8 hex chars>. The suffix comes from the content hash
+    when one is given (same PDF -> same doc_id), otherwise from a UUID.
+    """
+    base_name = Path(pdf_path).stem
+    suffix = content_hash[:8] if content_hash else uuid.uuid4().hex[:8]
+    return f"{base_name}-{suffix}"
+
+
+def run_cached_extraction(
+    pdf_path: str,
+    content_hash: str,
+    cpu_pool: Optional[Executor] = None,
+    page_workers: Optional[int] = None,
+    routing: Optional[str] = None,
+) -> Tuple[dict, dict, dict]:
+    """run_extraction() behind the local content-addressed cache."""
+    routing = settings.EXTRACTION_ROUTING if routing is None else routing
+    cache = get_extraction_cache()
+    key = extraction_cache_key(content_hash, routing)
+
+    cached = cache.get(key)
+    if cached is not None:
+        print(f"[Cache] Hit for {Path(pdf_path).name} ({content_hash[:12]})")
+        get_metrics().count("extraction_cache_hit")
+        return cached
+    get_metrics().count("extraction_cache_miss")
+
+    extractions = run_extraction(pdf_path, cpu_pool=cpu_pool, page_workers=page_workers, routing=routing)
+    cache.put(key, extractions)
+    return extractions
+
+
 def build_and_store_super_json(
     pdf_path: str,
     processed_dir: str,
     to_bigquery: bool = True,
+    cpu_pool: Optional[Executor] = None,
+    page_workers: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    deterministic_ids: Optional[bool] = None,
+    routing: Optional[str] = None,
+    ledger_key: Optional[str] = None,
 ) -> SuperJSON:
-    # Generate ID from filename + UUID
+    """
+    Step 1 for one PDF: extract, merge, build the SuperJSON, write it to
+    processed_dir and store it (save_super_json). With a ledger_key, the
+    processing ledger records the local file as extracted and the row as
+    stored once BigQuery has accepted it.
+    """
+    use_cache = settings.EXTRACTION_CACHE_ENABLED if use_cache is None else use_cache
+    if deterministic_ids is None:
+        deterministic_ids = settings.DETERMINISTIC_DOC_IDS
+
+    content_hash = file_sha256(pdf_path) if (use_cache or deterministic_ids) else None
+
+    # Generate ID from filename + content hash (deterministic) or UUID
     filename = Path(pdf_path).name
-    base_name = Path(pdf_path).stem
-    doc_id = f"{base_name}-{uuid.uuid4().hex[:8]}"
+    doc_id = make_doc_id(pdf_path, content_hash if deterministic_ids else None)
 
-    pdfplumber_data, pymupdf_data, docai_data = run_extraction(pdf_path)
-    merged = merge_extractions(pdfplumber_data, pymupdf_data, docai_data)
+    if use_cache:
+        pdfplumber_data, pymupdf_data, docai_data = run_cached_extraction(
+            pdf_path, content_hash, cpu_pool=cpu_pool, page_workers=page_workers, routing=routing
+        )
+    else:
+        pdfplumber_data, pymupdf_data, docai_data = run_extraction(
+            pdf_path, cpu_pool=cpu_pool, page_workers=page_workers, routing=routing
+        )
+    with stage("merge") as info:
+        merged = merge_extractions(pdfplumber_data, pymupdf_data, docai_data)
+        info["pages"] = merged["meta"]["num_pages"]
+    if content_hash:
+        merged["meta"]["content_sha256"] = content_hash
 
-    super_json = build_super_json(
-        merged_data=merged,
-        doc_id=doc_id,
-        filename=filename,
-        source_path=str(Path(pdf_path).resolve()),
-    )
+    with stage("build"):
+        super_json = build_super_json(
+            merged_data=merged,
+            doc_id=doc_id,
+            filename=filename,
+            source_path=str(Path(pdf_path).resolve()),
+        )
+
+    # Serialize once, for both the local file and BigQuery
+    with stage("serialize") as info:
+        encoded = encode_super_json(super_json)
+        info["bytes"] = len(encoded)
 
     # Save to local processed JSON
     ensure_dir(processed_dir)
-    out_path = get_processed_json_path(processed_dir, doc_id)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(super_json.model_dump(), f, ensure_ascii=False, indent=2)
+    with stage("write_local") as info:
+        out_path = write_processed_json(processed_dir, super_json, encoded)
+        info["bytes"] = out_path.stat().st_size
+    if ledger_key:
+        get_ledger().finish(ledger_key, STAGE_EXTRACTED, doc_id=doc_id, output_path=str(out_path))
 
-    # Save to BigQuery
-    if to_bigquery:
-        save_super_json_to_bq(super_json)
+    # Save to the document store (local SQLite only with to_bigquery=False)
+    on_stored = None
+    if ledger_key and sends_to_bigquery(to_bigquery):
+        get_ledger().start(ledger_key, STAGE_STORED)
+        on_stored = get_ledger().completion(ledger_key, STAGE_STORED)
+    save_super_json(super_json, encoded=encoded, on_stored=on_stored, to_bigquery=to_bigquery)
 
     return super_json
+
+
+def resume_super_json(
+    pdf_path: str,
+    ledger_key: str,
+    pending: List[str],
+    processed_dir: str,
+    to_bigquery: bool = True,
+    **build_kwargs: Any,
+) -> SuperJSON:
+    """
+    The part of step 1 the processing ledger says is left for pdf_path:
+    the whole build if it was never extracted, otherwise only the BigQuery
+    store, from the SuperJSON file of the earlier run (same doc_id, no
+    re-extraction). A row BigQuery already accepted is never sent again.
+    Stages that raise are recorded as failed.
+    """
+    ledger = get_ledger()
+    output_path = (ledger.file_info(ledger_key) or {}).get("output_path")
+    store = sends_to_bigquery(to_bigquery) and STAGE_STORED in pending
+    try:
+        if STAGE_EXTRACTED in pending or not (output_path and os.path.exists(output_path)):
+            ledger.start(ledger_key, STAGE_EXTRACTED)
+            return build_and_store_super_json(
+                pdf_path,
+                processed_dir=processed_dir,
+                to_bigquery=store,
+                ledger_key=ledger_key,
+                **build_kwargs,
+            )
+
+        with stage("read_local"):
+            super_json = SuperJSON.model_validate(read_processed_json(output_path))
+        if store:
+            ledger.start(ledger_key, STAGE_STORED)
+            save_super_json(super_json, on_stored=ledger.completion(ledger_key, STAGE_STORED))
+        return super_json
+    except Exception as e:
+        ledger.fail(ledger_key, None, e)
+        raise
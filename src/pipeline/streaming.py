@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import settings
+from src.models.super_json_schema import SuperJSON
+from src.pdf_ingestion.loaders import iter_pdfs, ensure_dir
+from src.pipeline.metadata_pipeline import extract_and_store_from_super_json
+from src.pipeline.steps import build_and_store_super_json, resume_super_json
+from src.storage.bq_writer import flush_all_writers
+from src.storage.ledger import GAVE_UP, RUN, STAGE_EXTRACTED, STAGE_METADATA, STAGE_STORED, get_ledger
+from src.storage.local_store import sends_to_bigquery
+
+# Tells a stage worker that its input is exhausted
+_DONE = object()
+
+
+class _Progress:
+    """Thread-safe counters and the one-line-per-event progress log."""
+
+    def __init__(self) -> None:
+        self.counts = {"extracted": 0, "extract_failed": 0, "metadata_ok": 0, "metadata_failed": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, message: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+            print(f"  [{key} {self.counts[key]}] {message}")
+
+
+def _run_stage(
+    name: str,
+    workers: int,
+    inbox: "queue.Queue[Any]",
+    handle: Callable[[Any], None],
+) -> List[threading.Thread]:
+    """Start `workers` threads that call handle(item) until they get _DONE."""
+
+    def work() -> None:
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            handle(item)
+
+    threads = [
+        threading.Thread(target=work, name=f"{name}-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_streaming_pipeline(
+    input_dir: str,
+    to_bigquery: bool = True,
+    extract_workers: int = 1,
+    llm_workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    deterministic_ids: Optional[bool] = None,
+    routing: Optional[str] = None,
+    refresh: bool = False,
+    on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    use_ledger: Optional[bool] = None,
+    discovery: Optional[Dict[str, Any]] = None,
+    pdf_files: Optional[Iterable[Path]] = None,
+) -> Dict[str, int]:
+    """
+    Step 1 and step 2 in one pass, connected by bounded queues:
+
+        PDF paths -> [extract + build + store SuperJSON] -> [Gemini + contract_metadata]
+
+    PDF paths are discovered lazily under input_dir (see process_batch for
+    discovery), unless pdf_files is given.
+
+    - extract_workers > 1: pdfplumber / PyMuPDF run in a pool of that many
+      processes, driven by 2x as many threads so DocAI / BigQuery waits overlap
+    - llm_workers (default GEMINI_MAX_CONCURRENCY) threads call Gemini on the
+      SuperJSON handed over in memory, so nothing is read back from BigQuery
+    - queue_size (default PIPELINE_QUEUE_SIZE) bounds each queue: a fast
+      stage blocks instead of piling up documents in memory
+    - with the processing ledger (default LEDGER_ENABLED) finished files are
+      skipped and interrupted ones resume at the stage they stopped in (a
+      document already stored only goes to Gemini, read from data/processed)
+    A failing document is reported and dropped at the stage it failed in.
+    Returns total / extracted / extract_failed / metadata_ok / metadata_failed
+    / skipped.
+    """
+    llm_workers = max(1, settings.GEMINI_MAX_CONCURRENCY if llm_workers is None else llm_workers)
+    queue_size = max(1, settings.PIPELINE_QUEUE_SIZE if queue_size is None else queue_size)
+    extract_workers = max(1, extract_workers)
+
+    processed_dir = str(Path("data") / "processed")
+    ensure_dir(processed_dir)
+
+    if pdf_files is None:
+        pdf_files = iter_pdfs(input_dir, **(discovery or {}))
+
+    build_kwargs = {
+        "processed_dir": processed_dir,
+        "to_bigquery": to_bigquery,
+        "use_cache": use_cache,
+        "deterministic_ids": deterministic_ids,
+        "routing": routing,
+    }
+    use_ledger = settings.LEDGER_ENABLED if use_ledger is None else use_ledger
+    ledger = get_ledger() if use_ledger else None
+    stages = [STAGE_EXTRACTED] + ([STAGE_STORED] if sends_to_bigquery(to_bigquery) else []) + [STAGE_METADATA]
+    progress = _Progress()
+    paths: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+    documents: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+
+    cpu_pool: Optional[ProcessPoolExecutor] = None
+    extract_threads = 1
+    if extract_workers > 1:
+        # "spawn": see run_pipeline._process_parallel
+        cpu_pool = ProcessPoolExecutor(
+            max_workers=extract_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        extract_threads = extract_workers * 2
+
+    def extract(work: Tuple[Path, Optional[str], List[str]]) -> None:
+        pdf_path, key, pending = work
+        try:
+            if key is None:
+                super_json = build_and_store_super_json(str(pdf_path), cpu_pool=cpu_pool, **build_kwargs)
+            else:
+                super_json = resume_super_json(str(pdf_path), key, pending, cpu_pool=cpu_pool, **build_kwargs)
+        except Exception as e:
+            progress.record("extract_failed", f"✘ Extraction failed {pdf_path.name}: {e}")
+            return
+        progress.record("extracted", f"✔ Extracted {pdf_path.name} -> {super_json.doc_id}")
+        documents.put((super_json, key))  # blocks while the LLM stage is behind
+
+    def extract_metadata(item: Tuple[SuperJSON, Optional[str]]) -> None:
+        super_json, key = item
+        try:
+            # Ledger calls too: a locked / failing ledger must not kill the
+            # worker, or the bounded queue fills up and the run hangs
+            on_stored = None
+            if key is not None:
+                ledger.start(key, STAGE_METADATA)
+                on_stored = ledger.completion(key, STAGE_METADATA) if to_bigquery else None
+            metadata = extract_and_store_from_super_json(
+                super_json, refresh=refresh, to_bigquery=to_bigquery, on_stored=on_stored
+            )
+            if key is not None and not to_bigquery:
+                ledger.finish(key, STAGE_METADATA)
+        except Exception as e:
+            if key is not None:
+                try:
+                    ledger.fail(key, STAGE_METADATA, e)
+                except Exception as ledger_error:
+                    print(f"[Ledger] Could not record failure of {super_json.doc_id}: {ledger_error}")
+            progress.record("metadata_failed", f"✘ Metadata failed {super_json.doc_id}: {e}")
+            return
+        progress.record("metadata_ok", f"✔ Metadata {super_json.doc_id}")
+        if on_result is not None:
+            on_result(super_json.doc_id, metadata)
+
+    print(
+        f"Running {input_dir}: {extract_workers} extraction workers, "
+        f"{llm_workers} LLM workers, queues of {queue_size}"
+    )
+    started = time.perf_counter()
+    total = 0
+    try:
+        extractors = _run_stage("extract", extract_threads, paths, extract)
+        llm_threads = _run_stage("llm", llm_workers, documents, extract_metadata)
+
+        for pdf_path in pdf_files:
+            total += 1
+            key, pending = None, stages
+            if ledger is not None:
+                key = ledger.register(str(pdf_path))
+                decision, pending = ledger.plan(key, stages)
+                if decision != RUN:
+                    reason = f"{pending[0]} failed {ledger.max_attempts} times" if decision == GAVE_UP else "already done"
+                    progress.record("skipped", f"- Skipped {pdf_path.name}: {reason}")
+                    continue
+            paths.put((pdf_path, key, pending))  # blocks while the extraction stage is behind
+        for _ in extractors:
+            paths.put(_DONE)
+        for thread in extractors:
+            thread.join()
+
+        for _ in llm_threads:
+            documents.put(_DONE)
+        for thread in llm_threads:
+            thread.join()
+    finally:
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+
+    if to_bigquery:
+        for table_id, counts in flush_all_writers().items():
+            print(f"[BQ] {table_id}: {counts['inserted']} rows inserted, {counts['failed']} failed")
+
+    if not total:
+        print(f"No PDF files found in {input_dir}")
+    summary = {"total": total, **progress.counts}
+    elapsed = time.perf_counter() - started
+    rate = summary["metadata_ok"] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Run finished: {summary['extracted']}/{summary['total']} extracted, "
+        f"{summary['metadata_ok']} with metadata, "
+        f"{summary['extract_failed'] + summary['metadata_failed']} failed, {summary['skipped']} skipped "
+        f"in {elapsed:.1f}s ({rate:.2f} docs/s end-to-end)"
+    )
+    return summary
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config.settings import settings
+from src.metrics.recorder import get_metrics, stage
+from src.pdf_ingestion.loaders import pdf_matches
+from src.storage.ledger import (
+    RUN,
+    STAGE_EXTRACTED,
+    STAGE_METADATA,
+    STAGE_STORED,
+    ProcessingLedger,
+    get_ledger,
+    ledger_file_key,
+)
+from src.storage.local_store import sends_to_bigquery
+
+
+class InboxScanner:
+    """
+    Incremental scan of an inbox folder tree. scan() returns the PDFs that
+    appeared (or were replaced) since the previous scan, once they have not
+    been modified for settle_seconds (so half-copied files are left alone).
+    Cheap when nothing changed: a folder is only listed again when its own
+    mtime changed (a file was added, removed or renamed in it), so an idle
+    scan costs one stat() per folder plus one per file still settling.
+    retry(paths) hands files out again at the next scan, unchanged or not.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        recursive: bool = True,
+        pattern: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_since: Optional[float] = None,
+        settle_seconds: float = 5.0,
+    ) -> None:
+        self.root = root
+        self.recursive = recursive
+        self.pattern = pattern
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_since = modified_since
+        self.settle_seconds = settle_seconds
+        # folder -> (mtime_ns, sub-folders, PDF paths) as of its last listing
+        self._dirs: Dict[str, Tuple[int, List[str], List[str]]] = {}
+        # (size, mtime_ns) of files already handed out, and of files settling
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._settling: Dict[str, Tuple[int, int]] = {}
+        self._retry: Set[str] = set()
+
+    def _list(self, directory: str, mtime_ns: int) -> Tuple[List[str], List[str]]:
+        subdirs: List[str] = []
+        pdfs: List[str] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        subdirs.append(entry.path)
+                elif entry.is_file():
+                    relative_path = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                    if pdf_matches(entry, relative_path, self.pattern):
+                        pdfs.append(entry.path)
+
+        # Files removed from the folder since its last listing
+        previous = self._dirs.get(directory)
+        if previous is not None:
+            for path in set(previous[2]) - set(pdfs):
+                self._seen.pop(path, None)
+                self._settling.pop(path, None)
+        self._dirs[directory] = (mtime_ns, subdirs, pdfs)
+        return subdirs, pdfs
+
+    def _candidates(self) -> List[str]:
+        """Files of folders that changed since their last listing."""
+        candidates: List[str] = []
+        live_dirs = set()
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+                cached = self._dirs.get(directory)
+                if cached is not None and cached[0] == mtime_ns:
+                    subdirs = cached[1]
+                else:
+                    subdirs, pdfs = self._list(directory, mtime_ns)
+                    candidates.extend(pdfs)
+            except OSError as e:
+                print(f"[Watch] Skipping {directory}: {e}")
+                continue
+            live_dirs.add(directory)
+            stack.extend(subdirs)
+
+        # Forget folders that are gone, and the files that were in them
+        for directory in set(self._dirs) - live_dirs:
+            for path in self._dirs.pop(directory)[2]:
+                self._seen.pop(path, None)
+                self._settling.pop(path, None)
+        return candidates
+
+    def retry(self, paths: List[Path]) -> None:
+        for path in paths:
+            self._seen.pop(str(path), None)
+            self._retry.add(str(path))
+
+    def scan(self) -> List[Path]:
+        now = time.time()
+        ready: List[Path] = []
+        retry, self._retry = self._retry, set()
+        for path in set(self._candidates()) | set(self._settling) | retry:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._seen.pop(path, None)
+                self._settling.pop(path, None)
+                continue
+            state = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(path) == state:
+                continue  # listed again because a sibling changed
+            if now - st.st_mtime < self.settle_seconds:
+                self._settling[path] = state
+                continue
+            self._settling.pop(path, None)
+            self._seen[path] = state
+            if self.min_size is not None and st.st_size < self.min_size:
+                continue
+            if self.max_size is not None and st.st_size > self.max_size:
+                continue
+            if self.modified_since is not None and st.st_mtime < self.modified_since:
+                continue
+            ready.append(Path(path))
+        return sorted(ready)
+
+
+def _unfinished(ledger: ProcessingLedger, paths: List[Path], stages: List[str]) -> List[Path]:
+    """Files the ledger still has work for (failed, not given up on yet)."""
+    unfinished: List[Path] = []
+    for path in paths:
+        try:
+            key = ledger_file_key(str(path), ledger.key_mode)
+        except OSError:
+            continue  # removed meanwhile
+        if ledger.plan(key, stages)[0] == RUN:
+            unfinished.append(path)
+    return unfinished
+
+
+def watch_inbox(
+    input_dir: str,
+    interval: Optional[float] = None,
+    settle_seconds: Optional[float] = None,
+    max_scans: Optional[int] = None,
+    with_metadata: bool = False,
+    discovery: Optional[Dict[str, Any]] = None,
+    metrics_dir: Optional[str] = None,
+    **pipeline_kwargs: Any,
+) -> Dict[str, int]:
+    """
+    Poll input_dir every `interval` seconds (default WATCH_INTERVAL_SECONDS)
+    and ingest the PDFs that appeared since the last scan: step 1 like
+    process_batch, or steps 1 + 2 like the streaming `run` with
+    with_metadata=True. pipeline_kwargs go to that function (workers or
+    extract_workers / llm_workers, to_bigquery, routing, use_ledger...).
+    The first scan picks up every file already there; with the processing
+    ledger, files finished by an earlier run are skipped, so a restarted
+    watch resumes where it stopped, and files a batch did not finish are
+    offered again at the next scan until LEDGER_MAX_ATTEMPTS (without the
+    ledger, failed files are only retried when they change).
+    With metrics_dir, the run's metrics (summary JSON and Prometheus
+    textfile) are rewritten after every batch, not only at exit.
+    Stops after max_scans scans (None: until interrupted) and returns the
+    summed counts of every batch.
+    """
+    interval = settings.WATCH_INTERVAL_SECONDS if interval is None else interval
+    settle_seconds = settings.WATCH_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    scanner = InboxScanner(input_dir, settle_seconds=settle_seconds, **(discovery or {}))
+
+    if with_metadata:
+        from src.pipeline.streaming import run_streaming_pipeline as ingest
+    else:
+        from src.pipeline.run_pipeline import process_batch as ingest
+
+    use_ledger = pipeline_kwargs.get("use_ledger")
+    use_ledger = settings.LEDGER_ENABLED if use_ledger is None else use_ledger
+    ledger = get_ledger() if use_ledger else None
+    stages = [STAGE_EXTRACTED]
+    if sends_to_bigquery(pipeline_kwargs.get("to_bigquery", True)):
+        stages.append(STAGE_STORED)
+    if with_metadata:
+        stages.append(STAGE_METADATA)
+
+    totals: Dict[str, int] = {}
+    scans = 0
+    print(f"[Watch] Watching {input_dir} every {interval:g}s (files settle for {settle_seconds:g}s)")
+    try:
+        while True:
+            with stage("watch_scan") as info:
+                ready = scanner.scan()
+                info["files"] = len(ready)
+            scans += 1
+            if ready:
+                print(f"[Watch] {len(ready)} new files")
+                summary = ingest(input_dir, pdf_files=ready, **pipeline_kwargs)
+                for key, value in summary.items():
+                    totals[key] = totals.get(key, 0) + value
+                if ledger is not None:
+                    unfinished = _unfinished(ledger, ready, stages)
+                    if unfinished:
+                        print(f"[Watch] {len(unfinished)} files not finished, retrying at the next scan")
+                        scanner.retry(unfinished)
+                if metrics_dir:
+                    get_metrics().write(metrics_dir, command="watch")
+            if max_scans is not None and scans >= max_scans:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("[Watch] Stopped")
+    return totals
@@ -1,59 +1,258 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import threading
+from typing import Any, Callable, Dict, List, Optional
 
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 
 from config.settings import settings
+from src.clients.registry import get_client
+from src.metrics.recorder import stage
+
+
+class SchemaDriftError(RuntimeError):
+    """Existing table schema is incompatible with what the pipeline writes."""
+
+
+# super_json_docs schema:
+# - doc_id: string
+# - source_path: string
+# - filename: string
+# - super_json: string (JSON serialized)
+# - ingested_at: timestamp (NULL in rows written before it was added)
+# - num_pages: integer
+# - structured: whether its spans / tables are also in the child tables
+#   (see structured_tables)
+SUPER_JSON_SCHEMA = [
+    bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("source_path", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("filename", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("super_json", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("ingested_at", "TIMESTAMP"),
+    bigquery.SchemaField("num_pages", "INTEGER"),
+    bigquery.SchemaField("structured", "BOOL"),
+]
+# Daily partitions by ingestion time, clustered by doc_id: a doc_id lookup
+# only reads the storage blocks holding that document, and a time filter
+# only the partitions it covers
+SUPER_JSON_PARTITION_FIELD = "ingested_at"
+SUPER_JSON_CLUSTERING = ["doc_id"]
+
+# Legacy SQL type names returned by the API for standard SQL ones
+_TYPE_ALIASES = {"BOOL": "BOOLEAN", "INT64": "INTEGER", "FLOAT64": "FLOAT", "STRUCT": "RECORD"}
+
+# Tables already checked (or found broken) by this process, so the steady
+# state write path does no get_dataset / get_table round-trips.
+_ensured: Dict[str, Optional[Exception]] = {}
+_ensure_lock = threading.Lock()
 
 
 def get_bq_client() -> bigquery.Client:
+    """Shared BigQuery client for this process (see src.clients.registry)."""
     if not settings.GCP_PROJECT_ID:
         raise RuntimeError("GCP_PROJECT_ID is not set in environment.")
-    return bigquery.Client(project=settings.GCP_PROJECT_ID)
+    return get_client(
+        f"bigquery:{settings.GCP_PROJECT_ID}",
+        lambda: bigquery.Client(project=settings.GCP_PROJECT_ID),
+    )
 
 
-def ensure_super_json_table_exists() -> None:
+def dataset_id() -> str:
+    return f"{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}"
+
+
+def table_id(table_name: str) -> str:
+    return f"{dataset_id()}.{table_name}"
+
+
+def find_schema_drift(
+    actual: List[bigquery.SchemaField],
+    expected: List[bigquery.SchemaField],
+) -> Dict[str, List[str]]:
+    """
+    Compare an existing table schema with the expected one.
+    Returns {"missing": [...], "incompatible": [...]}: missing NULLABLE /
+    REPEATED columns can be added in place; anything in "incompatible"
+    (type or mode changes, missing REQUIRED columns) needs a migration.
+    Extra columns in the table are fine.
+    """
+    actual_by_name = {f.name: f for f in actual}
+    missing: List[str] = []
+    incompatible: List[str] = []
+
+    for field in expected:
+        current = actual_by_name.get(field.name)
+        if current is None:
+            if field.mode == "REQUIRED":
+                incompatible.append(f"{field.name}: missing REQUIRED column")
+            else:
+                missing.append(field.name)
+            continue
+        current_type = _TYPE_ALIASES.get(current.field_type, current.field_type)
+        expected_type = _TYPE_ALIASES.get(field.field_type, field.field_type)
+        if current_type != expected_type:
+            incompatible.append(f"{field.name}: type {current.field_type}, expected {field.field_type}")
+        elif (current.mode == "REPEATED") != (field.mode == "REPEATED"):
+            incompatible.append(f"{field.name}: mode {current.mode}, expected {field.mode}")
+        elif current.mode == "REQUIRED" and field.mode == "NULLABLE":
+            # We may write NULL there, which the table would reject
+            incompatible.append(f"{field.name}: REQUIRED in table, written as NULLABLE")
+
+    return {"missing": missing, "incompatible": incompatible}
+
+
+def find_layout_drift(
+    table: bigquery.Table,
+    partition_field: Optional[str] = None,
+    clustering_fields: Optional[List[str]] = None,
+) -> Dict[str, List[str]]:
+    """
+    Compare an existing table's partitioning / clustering with the expected
+    layout (daily partitions on partition_field). Returns
+    {"partitioning": [...], "clustering": [...]}: clustering can be changed
+    in place, partitioning only by rewriting the table (migrate-storage).
+    """
+    drift: Dict[str, List[str]] = {"partitioning": [], "clustering": []}
+    partitioning = table.time_partitioning
+    if partition_field and (
+        partitioning is None
+        or partitioning.field != partition_field
+        or partitioning.type_ != bigquery.TimePartitioningType.DAY
+    ):
+        current = "none" if partitioning is None else f"{partitioning.type_} on {partitioning.field or '_PARTITIONTIME'}"
+        drift["partitioning"].append(f"partitioned {current}, expected DAY on {partition_field}")
+    if clustering_fields and list(table.clustering_fields or []) != list(clustering_fields):
+        current = ", ".join(table.clustering_fields or []) or "none"
+        drift["clustering"].append(f"clustered by {current}, expected {', '.join(clustering_fields)}")
+    return drift
+
+
+def run_query(
+    query: str,
+    query_parameters: Optional[List[Any]] = None,
+    stage_name: str = "bq_query",
+    page_size: Optional[int] = None,
+) -> Any:
+    """
+    Run a query job as one call of stage `stage_name`, report the bytes it
+    processed / billed (printed, and summed in the stage metrics), and
+    return its row iterator: the job is done, rows are fetched page by page
+    (page_size rows per request) as it is consumed.
+    """
     client = get_bq_client()
-    dataset_id = f"{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}"
-    table_id = f"{dataset_id}.{settings.BQ_TABLE}"
+    with stage(stage_name) as info:
+        job = client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters or []))
+        rows = job.result(page_size=page_size)
+        info["bytes_processed"] = getattr(job, "total_bytes_processed", None) or 0
+        info["bytes_billed"] = getattr(job, "total_bytes_billed", None) or 0
+    print(
+        f"[BQ] {stage_name}: {info['bytes_processed'] / 1e6:.1f} MB processed, "
+        f"{info['bytes_billed'] / 1e6:.1f} MB billed"
+    )
+    return rows
 
-    # Create dataset if not exists
+
+def _ensure_dataset(client: bigquery.Client) -> None:
     try:
-        client.get_dataset(dataset_id)
-    except Exception:
-        dataset = bigquery.Dataset(dataset_id)
+        client.get_dataset(dataset_id())
+    except NotFound:
+        dataset = bigquery.Dataset(dataset_id())
         dataset.location = "US"
         client.create_dataset(dataset, exists_ok=True)
 
-    # Try to get table; if it exists, we assume schema is fine and return
-    try:
-        client.get_table(table_id)
+
+def ensure_table(
+    table_name: str,
+    schema: List[bigquery.SchemaField],
+    partition_field: Optional[str] = None,
+    clustering_fields: Optional[List[str]] = None,
+) -> None:
+    """
+    Create the dataset / table if needed and check an existing table for
+    schema drift: missing optional columns are added, incompatible changes
+    raise SchemaDriftError. New tables get daily partitions on
+    partition_field and clustering_fields; an existing table laid out
+    otherwise still works, with a hint to run migrate-storage.
+    The outcome is memoized per process, so only the first call for a
+    table talks to BigQuery.
+    """
+    full_id = table_id(table_name)
+    if full_id in _ensured:
+        error = _ensured[full_id]
+        if error is not None:
+            raise error
         return
-    except Exception:
-        pass
-
-    # New table schema:
-    # - doc_id: string
-    # - source_path: string
-    # - filename: string
-    # - super_json: string (JSON serialized)
-    schema = [
-        bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("source_path", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("filename", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("super_json", "STRING", mode="REQUIRED"),
-    ]
-
-    table = bigquery.Table(table_id, schema=schema)
-    client.create_table(table, exists_ok=True)
-
-
-def insert_super_json_row(row: Dict[str, Any]) -> None:
-    client = get_bq_client()
-    dataset_id = f"{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}"
-    table_id = f"{dataset_id}.{settings.BQ_TABLE}"
 
-    errors = client.insert_rows_json(table_id, [row])
-    if errors:
-        raise RuntimeError(f"Error inserting rows into BigQuery: {errors}")
+    with _ensure_lock:
+        if full_id in _ensured:
+            error = _ensured[full_id]
+            if error is not None:
+                raise error
+            return
+
+        client = get_bq_client()
+        _ensure_dataset(client)
+
+        try:
+            table = client.get_table(full_id)
+        except NotFound:
+            table = bigquery.Table(full_id, schema=schema)
+            if partition_field:
+                table.time_partitioning = bigquery.TimePartitioning(
+                    type_=bigquery.TimePartitioningType.DAY, field=partition_field
+                )
+            if clustering_fields:
+                table.clustering_fields = list(clustering_fields)
+            client.create_table(table, exists_ok=True)
+            print(f"[BQ] Created table {full_id}")
+            _ensured[full_id] = None
+            return
+
+        drift = find_schema_drift(list(table.schema), schema)
+        if drift["incompatible"]:
+            error = SchemaDriftError(
+                f"Schema drift in {full_id}: " + "; ".join(drift["incompatible"])
+            )
+            _ensured[full_id] = error
+            raise error
+
+        if drift["missing"]:
+            # Additive change: safe to apply in place
+            by_name = {f.name: f for f in schema}
+            table.schema = list(table.schema) + [by_name[name] for name in drift["missing"]]
+            client.update_table(table, ["schema"])
+            print(f"[BQ] Added missing columns to {full_id}: {', '.join(drift['missing'])}")
+
+        layout = find_layout_drift(table, partition_field, clustering_fields)
+        if layout["partitioning"] or layout["clustering"]:
+            print(
+                f"[BQ] {full_id} is " + "; ".join(layout["partitioning"] + layout["clustering"])
+                + " (queries scan more than needed; run `migrate-storage`)"
+            )
+
+        _ensured[full_id] = None
+
+
+def reset_ensured_tables() -> None:
+    """Forget memoized table checks (e.g. after a migration)."""
+    with _ensure_lock:
+        _ensured.clear()
+
+
+def ensure_super_json_table_exists() -> None:
+    ensure_table(settings.BQ_TABLE, SUPER_JSON_SCHEMA, SUPER_JSON_PARTITION_FIELD, SUPER_JSON_CLUSTERING)
+
+
+def insert_super_json_row(row: Dict[str, Any], on_done: Optional[Callable[[bool, Optional[str]], None]] = None) -> None:
+    """
+    Queue the row on the shared batch writer for the super_json table.
+    Rows are sent in bulk; call bq_writer.flush_all_writers() to force it.
+    on_done(ok, error) is called once the row is inserted or given up on.
+    """
+    from src.storage.bq_writer import get_batch_writer
+
+    if not settings.GCP_PROJECT_ID:
+        raise RuntimeError("GCP_PROJECT_ID is not set in environment.")
+
+    get_batch_writer(table_id(settings.BQ_TABLE)).add(row, on_done=on_done)
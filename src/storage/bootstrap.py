@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import GoogleAPIError, NotFound
+from google.cloud import bigquery
+
+from config.settings import settings
+from src.storage.bigquery_client import (
+    SUPER_JSON_CLUSTERING,
+    SUPER_JSON_PARTITION_FIELD,
+    SUPER_JSON_SCHEMA,
+    SchemaDriftError,
+    ensure_table,
+    find_layout_drift,
+    find_schema_drift,
+    get_bq_client,
+    reset_ensured_tables,
+    run_query,
+    table_id,
+)
+from src.storage.contract_metadata_repository import (
+    CONTRACT_METADATA_CLUSTERING,
+    CONTRACT_METADATA_PARTITION_FIELD,
+    CONTRACT_METADATA_SCHEMA,
+    CONTRACT_METADATA_TABLE,
+)
+from src.storage.structured_tables import (
+    STRUCTURED_CLUSTERING,
+    STRUCTURED_PARTITION_FIELD,
+    TABLES_SCHEMA,
+    TABLES_TABLE,
+    TEXT_SPANS_SCHEMA,
+    TEXT_SPANS_TABLE,
+)
+
+# (table name, schema, daily partitioning column, clustering columns)
+ManagedTable = Tuple[str, List[bigquery.SchemaField], Optional[str], Optional[List[str]]]
+
+
+def managed_tables() -> List[ManagedTable]:
+    """Every table the pipeline writes to, with its expected schema and layout."""
+    tables: List[ManagedTable] = [
+        (settings.BQ_TABLE, SUPER_JSON_SCHEMA, SUPER_JSON_PARTITION_FIELD, SUPER_JSON_CLUSTERING),
+        (
+            CONTRACT_METADATA_TABLE,
+            CONTRACT_METADATA_SCHEMA,
+            CONTRACT_METADATA_PARTITION_FIELD,
+            CONTRACT_METADATA_CLUSTERING,
+        ),
+    ]
+    if settings.BQ_STRUCTURED_TABLES:
+        tables += [
+            (TEXT_SPANS_TABLE, TEXT_SPANS_SCHEMA, STRUCTURED_PARTITION_FIELD, STRUCTURED_CLUSTERING),
+            (TABLES_TABLE, TABLES_SCHEMA, STRUCTURED_PARTITION_FIELD, STRUCTURED_CLUSTERING),
+        ]
+    return tables
+
+
+def check_storage() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Read-only drift report for every managed table: schema drift
+    (missing / incompatible) and layout drift (partitioning / clustering,
+    fixed by migrate_storage).
+    Tables that do not exist are reported as {"missing_table": [...]}.
+    """
+    client = get_bq_client()
+    report: Dict[str, Dict[str, List[str]]] = {}
+    for table_name, schema, partition_field, clustering_fields in managed_tables():
+        full_id = table_id(table_name)
+        try:
+            table = client.get_table(full_id)
+        except NotFound:
+            report[full_id] = {"missing_table": [full_id]}
+            continue
+        report[full_id] = {
+            **find_schema_drift(list(table.schema), schema),
+            **find_layout_drift(table, partition_field, clustering_fields),
+        }
+    return report
+
+
+def init_storage() -> bool:
+    """
+    One-time bootstrap: create the dataset and every managed table, add
+    missing optional columns, and report incompatible schema drift.
+    Returns True when all tables are ready to be written to.
+    """
+    ok = True
+    for table_name, schema, partition_field, clustering_fields in managed_tables():
+        full_id = table_id(table_name)
+        try:
+            ensure_table(table_name, schema, partition_field, clustering_fields)
+            print(f"[BQ] {full_id}: ok")
+        except SchemaDriftError as e:
+            ok = False
+            print(f"[BQ] {e}")
+    return ok
+
+
+def migrate_storage(dry_run: bool = False) -> bool:
+    """
+    Rewrite every managed table that is not partitioned / clustered as
+    expected (tables created before the layout existed):
+    1. add missing columns (ingested_at is NULL in older rows, which land
+       in the __NULL__ partition)
+    2. CREATE TABLE <name>__migrating PARTITION BY ... CLUSTER BY ...
+       AS SELECT * FROM <name>
+    3. check both have the same number of rows, then rename <name> to
+       <name>__pre_migration_<timestamp> and <name>__migrating to <name>
+    The old table is kept as a backup; drop it once the new one checks out.
+    Run it with the pipeline stopped: rows inserted during the copy would
+    stay in the backup, and BigQuery refuses to rename a table that still
+    has recently streamed rows in its buffer (re-run later in that case).
+    dry_run only prints what would be done. Returns True when every table
+    has (or, with dry_run, can get) the expected layout.
+    """
+    client = get_bq_client()
+    ok = True
+    for table_name, schema, partition_field, clustering_fields in managed_tables():
+        full_id = table_id(table_name)
+        try:
+            table = client.get_table(full_id)
+        except NotFound:
+            print(f"[BQ] {full_id}: does not exist" + ("" if dry_run else ", creating it"))
+            if not dry_run:
+                ensure_table(table_name, schema, partition_field, clustering_fields)
+            continue
+
+        drift = find_layout_drift(table, partition_field, clustering_fields)
+        if not drift["partitioning"] and not drift["clustering"]:
+            print(f"[BQ] {full_id}: layout ok")
+            continue
+        print(f"[BQ] {full_id}: " + "; ".join(drift["partitioning"] + drift["clustering"]))
+
+        staging_name = f"{table_name}__migrating"
+        backup_name = f"{table_name}__pre_migration_{datetime.datetime.utcnow():%Y%m%d%H%M%S}"
+        layout = ""
+        if partition_field:
+            layout += f" PARTITION BY TIMESTAMP_TRUNC({partition_field}, DAY)"
+        if clustering_fields:
+            layout += f" CLUSTER BY {', '.join(clustering_fields)}"
+        statements = [
+            f"CREATE OR REPLACE TABLE `{table_id(staging_name)}`{layout} AS SELECT * FROM `{full_id}`",
+            f"ALTER TABLE `{full_id}` RENAME TO `{backup_name}`",
+            f"ALTER TABLE `{table_id(staging_name)}` RENAME TO `{table_name}`",
+        ]
+        if dry_run:
+            print(f"  would rewrite {(table.num_bytes or 0) / 1e6:.1f} MB ({table.num_rows or 0} rows):")
+            for statement in statements:
+                print(f"  {statement};")
+            continue
+
+        try:
+            # Columns the copy must carry (e.g. ingested_at on an old table)
+            ensure_table(table_name, schema)
+            run_query(statements[0], stage_name="bq_migrate")
+            counts = [
+                next(iter(run_query(f"SELECT COUNT(*) AS n FROM `{ref}`", stage_name="bq_migrate")))["n"]
+                for ref in (full_id, table_id(staging_name))
+            ]
+            if counts[0] != counts[1]:
+                ok = False
+                print(
+                    f"[BQ] {full_id}: {counts[0]} rows but {counts[1]} in the copy (still being written to?); "
+                    f"left unchanged, re-run with the pipeline stopped"
+                )
+                continue
+            for statement in statements[1:]:
+                run_query(statement, stage_name="bq_migrate")
+        except (GoogleAPIError, SchemaDriftError) as e:
+            ok = False
+            print(f"[BQ] Migration of {full_id} failed: {e} (a finished copy, if any, is {table_id(staging_name)})")
+            continue
+        print(f"[BQ] {full_id}: migrated ({counts[0]} rows); previous table kept as {table_id(backup_name)}")
+
+    reset_ensured_tables()
+    return ok
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import atexit
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from src.metrics.recorder import get_metrics, stage
+from src.storage.bigquery_client import get_bq_client
+
+# Called once a buffered row is inserted (True, None) or given up on (False, error)
+OnDone = Callable[[bool, Optional[str]], None]
+
+# {"insertId": "<32 hex>", "json": ...}, around each row in the request
+_ROW_OVERHEAD = 64
+
+# (insert_id, row, encoded size, on_done)
+_Buffered = Tuple[str, Dict[str, Any], int, Optional[OnDone]]
+
+
+def _row_size(row: Dict[str, Any]) -> int:
+    """
+    Encoded size of a row in the request body. The client encodes it with
+    json.dumps() defaults (ensure_ascii), where each non-ASCII character
+    becomes a 6-byte \\uXXXX escape, so UTF-8 byte counts fall short for
+    e.g. Spanish or German contracts. Includes the insertId wrapper.
+    """
+    return len(json.dumps(row, default=str)) + _ROW_OVERHEAD
+
+
+class BigQueryBatchWriter:
+    """
+    Buffers rows for one table and streams them with insert_rows_json in
+    batches, instead of one request per row.
+    A batch is sent when it reaches max_rows or max_bytes (kept under the
+    10 MB streaming request limit), or when its oldest row has waited
+    flush_interval seconds. Rows BigQuery rejects as invalid are taken out
+    of the batch and the rest re-sent; failed requests are retried whole,
+    with backoff, up to max_retries times. Rows that still fail are logged
+    and counted in `failed`.
+    Every row gets an insertId, so a retried row is de-duplicated by BigQuery.
+    add(row, on_done) reports the outcome of that row once it is known.
+    """
+
+    def __init__(
+        self,
+        table_id: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> None:
+        self.table_id = table_id
+        self.max_rows = max_rows or settings.BQ_BATCH_MAX_ROWS
+        self.max_bytes = max_bytes or settings.BQ_BATCH_MAX_BYTES
+        self.flush_interval = flush_interval or settings.BQ_BATCH_FLUSH_SECONDS
+        self.max_retries = settings.BQ_INSERT_MAX_RETRIES if max_retries is None else max_retries
+
+        self.inserted = 0
+        self.failed = 0
+
+        self._buffer: List[_Buffered] = []
+        self._buffer_bytes = 0
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        # Batches taken from the buffer and not yet fully sent (any thread)
+        self._in_flight = 0
+        self._idle = threading.Condition(self._lock)
+        self._closed = threading.Event()
+        self._timer = threading.Thread(
+            target=self._flush_periodically,
+            name=f"bq-writer-{table_id.rsplit('.', 1)[-1]}",
+            daemon=True,
+        )
+        self._timer.start()
+
+    def add(self, row: Dict[str, Any], on_done: Optional[OnDone] = None) -> None:
+        size = _row_size(row)
+        batch: Optional[List[_Buffered]] = None
+
+        with self._lock:
+            # Never let one request grow past max_bytes
+            if self._buffer and self._buffer_bytes + size > self.max_bytes:
+                batch = self._take_buffer()
+            self._buffer.append((uuid.uuid4().hex, row, size, on_done))
+            self._buffer_bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if batch is None and len(self._buffer) >= self.max_rows:
+                batch = self._take_buffer()
+
+        if batch:
+            self._send(batch)
+
+    def flush(self) -> None:
+        """Send the buffered rows and wait for batches other threads are sending."""
+        with self._lock:
+            batch = self._take_buffer()
+        if batch:
+            self._send(batch)
+        with self._idle:
+            self._idle.wait_for(lambda: self._in_flight == 0)
+
+    def buffered(self) -> int:
+        """Rows added and not yet taken by a batch."""
+        with self._lock:
+            return len(self._buffer)
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._timer is not threading.current_thread():
+            self._timer.join()
+        self.flush()
+
+    def _take_buffer(self) -> List[_Buffered]:
+        """Called with the lock held; a non-empty batch must then go to _send."""
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        if batch:
+            self._in_flight += 1
+        return batch
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(min(1.0, self.flush_interval)):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+                batch = self._take_buffer() if due else None
+            if batch:
+                self._send(batch)
+
+    def _insert(self, batch: List[_Buffered]) -> Dict[int, Any]:
+        """Send one request; return {index in batch: error} for rejected rows."""
+        try:
+            errors = get_bq_client().insert_rows_json(
+                self.table_id,
+                [row for _, row, _, _ in batch],
+                row_ids=[insert_id for insert_id, _, _, _ in batch],
+            )
+        except Exception as e:
+            return {i: str(e) for i in range(len(batch))}
+        return {err["index"]: err.get("errors") for err in errors or []}
+
+    def _send(self, batch: List[_Buffered]) -> None:
+        try:
+            self._send_batch(batch)
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def _send_batch(self, batch: List[_Buffered]) -> None:
+        # A bad row makes BigQuery reject its whole request: it reports that
+        # row as "invalid" and the others as "stopped". Those are re-sent at
+        # once without it; requests failing for other reasons (5xx, timeouts)
+        # are retried whole, with backoff, up to max_retries times.
+        pending = batch
+        invalid: List[Tuple[_Buffered, Any]] = []
+        attempt = 0
+        while pending:
+            with stage("bq_insert", rows=len(pending), bytes=sum(size for _, _, size, _ in pending)) as info:
+                failed = self._insert(pending)
+                info["rows_rejected"] = len(failed)
+            self._count(inserted=len(pending) - len(failed))
+
+            retry: List[Tuple[_Buffered, Any]] = []
+            found_invalid = False
+            for index, item in enumerate(pending):
+                if index not in failed:
+                    _notify(item, True, None)
+                elif _is_invalid(failed[index]):
+                    invalid.append((item, failed[index]))
+                    found_invalid = True
+                else:
+                    retry.append((item, failed[index]))
+            pending = [item for item, _ in retry]
+            if not pending or found_invalid:
+                continue
+
+            if attempt == self.max_retries:
+                for item, error in retry:
+                    self._give_up(item, error)
+                break
+            time.sleep(min(10.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+            attempt += 1
+            get_metrics().count("bq_batch_retries")
+
+        # Last resort for the rows reported invalid: each on its own, once
+        for item, _ in invalid:
+            get_metrics().count("bq_row_retries")
+            retry_failed = self._insert([item])
+            if retry_failed:
+                self._give_up(item, retry_failed[0])
+            else:
+                self._count(inserted=1)
+                _notify(item, True, None)
+
+    def _give_up(self, item: _Buffered, error: Any) -> None:
+        self._count(failed=1)
+        get_metrics().count("bq_rows_failed")
+        print(f"[BQ] Giving up on row for {self.table_id}: {error}")
+        _notify(item, False, str(error))
+
+    def _count(self, inserted: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self.inserted += inserted
+            self.failed += failed
+
+
+def _is_invalid(errors: Any) -> bool:
+    """Whether insert errors blame the row itself (not "stopped" / transient)."""
+    return isinstance(errors, list) and any(e.get("reason") == "invalid" for e in errors)
+
+
+def _notify(item: _Buffered, ok: bool, error: Optional[str]) -> None:
+    on_done = item[3]
+    if on_done is None:
+        return
+    try:
+        on_done(ok, error)
+    except Exception as e:
+        # A broken callback must not lose the rest of the batch
+        print(f"[BQ] Row callback failed: {e}")
+
+
+def all_done(on_done: Optional[OnDone], expected: int) -> Optional[OnDone]:
+    """
+    One on_done for a group of rows (possibly in several tables): calls
+    on_done(True, None) once all `expected` rows are inserted, or
+    on_done(False, error) for the first one given up on (and then no more).
+    """
+    if on_done is None:
+        return None
+    state = {"left": expected, "failed": False}
+    lock = threading.Lock()
+
+    def done(ok: bool, error: Optional[str] = None) -> None:
+        with lock:
+            if state["failed"]:
+                return
+            if ok:
+                state["left"] -= 1
+                if state["left"] > 0:
+                    return
+            else:
+                state["failed"] = True
+        on_done(ok, error)
+
+    return done
+
+
+_writers: Dict[str, BigQueryBatchWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_batch_writer(table_id: str) -> BigQueryBatchWriter:
+    """Shared writer for table_id; flushed automatically at interpreter exit."""
+    with _writers_lock:
+        writer = _writers.get(table_id)
+        if writer is None:
+            writer = BigQueryBatchWriter(table_id)
+            _writers[table_id] = writer
+        return writer
+
+
+def flush_all_writers() -> Dict[str, Dict[str, int]]:
+    """
+    Flush every shared writer, waiting for batches already being sent.
+    Repeats while row callbacks queue more rows (e.g. a super_json_docs row
+    added once its child rows are in). Returns inserted/failed counts per table.
+    """
+    while True:
+        with _writers_lock:
+            writers = list(_writers.values())
+        for writer in writers:
+            writer.flush()
+        with _writers_lock:
+            if len(_writers) == len(writers) and not any(writer.buffered() for writer in writers):
+                break
+    return {writer.table_id: {"inserted": writer.inserted, "failed": writer.failed} for writer in writers}
+
+
+def _close_all_writers() -> None:
+    # Flush first: callbacks of one writer may still add rows to another
+    flush_all_writers()
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(_close_all_writers)
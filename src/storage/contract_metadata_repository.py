@@ -3,68 +3,61 @@ from __future__ import annotations
 import datetime
 import json
 
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List
 
 from google.cloud import bigquery
 
-from config.settings import settings
-from src.storage.bigquery_client import get_bq_client
+from src.storage.bigquery_client import ensure_table, table_id as bq_table_id
+from src.storage.bq_writer import get_batch_writer
+from src.storage.local_store import get_local_store, storage_backend
+
+CONTRACT_METADATA_TABLE = "contract_metadata"
+
+CONTRACT_METADATA_SCHEMA = [
+    bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("filename", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("llm_model", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("created_at", "TIMESTAMP", mode="REQUIRED"),
+
+    bigquery.SchemaField("supplier_legal_name", "STRING"),
+    bigquery.SchemaField("supplier_names", "STRING"),
+    bigquery.SchemaField("sap_contract_number", "STRING"),
+    bigquery.SchemaField("scipartner", "STRING"),
+    bigquery.SchemaField("effective_date", "STRING"),
+    bigquery.SchemaField("agreement_type", "STRING"),
+    bigquery.SchemaField("agreement_names", "STRING"),
+    bigquery.SchemaField("parent_document", "STRING"),
+    bigquery.SchemaField("document_type", "STRING"),
+    bigquery.SchemaField("is_evergreen", "BOOL"),
+    bigquery.SchemaField("expiration_date", "STRING"),
+    bigquery.SchemaField("sap_supplier", "STRING"),
+    bigquery.SchemaField("document_url", "STRING"),
+    bigquery.SchemaField("file_name", "STRING"),
+    bigquery.SchemaField("expiration_email_recipients", "STRING", mode="REPEATED"),
+    bigquery.SchemaField("mime_type", "STRING"),
+    bigquery.SchemaField("file_source_url", "STRING"),
+
+    bigquery.SchemaField("raw_metadata_json", "STRING", mode="REQUIRED"),
+]
+# Daily partitions by created_at; clustered for the doc_id anti-join of
+# step 2 and for per-supplier (expiration) reporting
+CONTRACT_METADATA_PARTITION_FIELD = "created_at"
+CONTRACT_METADATA_CLUSTERING = ["doc_id", "supplier_legal_name"]
 
 
 def ensure_contract_metadata_table_exists() -> None:
     """
-    Create pdf_processing.contract_metadata if it does not exist.
+    Create pdf_processing.contract_metadata if it does not exist
+    (partitioned and clustered, see above).
     Stores flattened fields + the raw JSON.
+    Checked once per process (see bigquery_client.ensure_table).
     """
-    client: bigquery.Client = get_bq_client()
-
-    dataset_id = f"{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}"
-    table_id = f"{dataset_id}.contract_metadata"
-
-    # Ensure dataset exists
-    try:
-        client.get_dataset(dataset_id)
-    except Exception:
-        dataset = bigquery.Dataset(dataset_id)
-        dataset.location = "US"
-        client.create_dataset(dataset, exists_ok=True)
-
-    # Check table
-    try:
-        client.get_table(table_id)
-        return
-    except Exception:
-        pass
-
-    schema = [
-        bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("filename", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("llm_model", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("created_at", "TIMESTAMP", mode="REQUIRED"),
-
-        bigquery.SchemaField("supplier_legal_name", "STRING"),
-        bigquery.SchemaField("supplier_names", "STRING"),
-        bigquery.SchemaField("sap_contract_number", "STRING"),
-        bigquery.SchemaField("scipartner", "STRING"),
-        bigquery.SchemaField("effective_date", "STRING"),
-        bigquery.SchemaField("agreement_type", "STRING"),
-        bigquery.SchemaField("agreement_names", "STRING"),
-        bigquery.SchemaField("parent_document", "STRING"),
-        bigquery.SchemaField("document_type", "STRING"),
-        bigquery.SchemaField("is_evergreen", "BOOL"),
-        bigquery.SchemaField("expiration_date", "STRING"),
-        bigquery.SchemaField("sap_supplier", "STRING"),
-        bigquery.SchemaField("document_url", "STRING"),
-        bigquery.SchemaField("file_name", "STRING"),
-        bigquery.SchemaField("expiration_email_recipients", "STRING", mode="REPEATED"),
-        bigquery.SchemaField("mime_type", "STRING"),
-        bigquery.SchemaField("file_source_url", "STRING"),
-
-        bigquery.SchemaField("raw_metadata_json", "STRING", mode="REQUIRED"),
-    ]
-
-    table = bigquery.Table(table_id, schema=schema)
-    client.create_table(table, exists_ok=True)
+    ensure_table(
+        CONTRACT_METADATA_TABLE,
+        CONTRACT_METADATA_SCHEMA,
+        CONTRACT_METADATA_PARTITION_FIELD,
+        CONTRACT_METADATA_CLUSTERING,
+    )
 
 
 def insert_contract_metadata_row(
@@ -72,16 +65,17 @@ def insert_contract_metadata_row(
     filename: str,
     llm_model: str,
     metadata: Dict[str, Any],
+    on_stored: Optional[Callable[[bool, Optional[str]], None]] = None,
+    to_bigquery: bool = True,
 ) -> None:
     """
-    Flatten the metadata dict into columns and insert into contract_metadata table.
+    Flatten the metadata dict into columns and queue it for the
+    contract_metadata table (sent in bulk by the shared batch writer).
+    The row goes where STORAGE_BACKEND says (see
+    super_json_repository.save_super_json); to_bigquery=False keeps it in
+    the local SQLite store only.
+    on_stored(ok, error) is called once the row is inserted or given up on.
     """
-    client: bigquery.Client = get_bq_client()
-    ensure_contract_metadata_table_exists()
-
-    dataset_id = f"{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}"
-    table_id = f"{dataset_id}.contract_metadata"
-
     # Helper to safely get keys
     def g(key: str, default=None):
         return metadata.get(key, default)
@@ -136,6 +130,13 @@ def insert_contract_metadata_row(
         "raw_metadata_json": json.dumps(metadata, ensure_ascii=False),
     }
 
-    errors = client.insert_rows_json(table_id, [row])
-    if errors:
-        raise RuntimeError(f"Error inserting contract metadata into BigQuery: {errors}")
+    backend = storage_backend() if to_bigquery else "sqlite"
+    if backend in ("sqlite", "mirror"):
+        get_local_store().put_contract_metadata(row)
+        if backend == "sqlite":
+            if on_stored is not None:
+                on_stored(True, None)
+            return
+
+    ensure_contract_metadata_table_exists()
+    get_batch_writer(bq_table_id(CONTRACT_METADATA_TABLE)).add(row, on_done=on_stored)
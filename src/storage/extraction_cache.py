@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config.settings import settings
+
+# Bump when the shape of extractor output changes in a way the package
+# versions below would not reveal (e.g. a fix in one of our extractors).
+EXTRACTION_CACHE_VERSION = "3"
+
+# DocAI results skipped for these reasons are transient and must be retried
+_UNCACHEABLE_DOCAI_REASONS = {"unexpected_error", "invalid_argument"}
+
+Extractions = Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of the file content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "missing"
+
+
+def extractor_versions() -> Dict[str, str]:
+    """Everything besides the PDF bytes that can change the extraction output."""
+    return {
+        "cache": EXTRACTION_CACHE_VERSION,
+        "pdfplumber": _package_version("pdfplumber"),
+        "pymupdf": _package_version("PyMuPDF"),
+        "documentai": _package_version("google-cloud-documentai"),
+        "docai_processor": f"{settings.DOC_AI_PROJECT_ID}/{settings.DOC_AI_LOCATION}/{settings.DOC_AI_PROCESSOR_ID}",
+    }
+
+
+def routing_config(routing: str) -> Dict[str, Any]:
+    """Routing mode and thresholds: they decide which pages each extractor sees."""
+    if routing != "adaptive":
+        return {"mode": routing}
+    return {
+        "mode": routing,
+        "min_text_chars": settings.ROUTING_MIN_TEXT_CHARS,
+        "min_image_coverage": settings.ROUTING_MIN_IMAGE_COVERAGE,
+        "min_table_lines": settings.ROUTING_MIN_TABLE_LINES,
+    }
+
+
+def extraction_cache_key(content_hash: str, routing: str = "all") -> str:
+    payload = json.dumps(
+        {"content": content_hash, "versions": extractor_versions(), "routing": routing_config(routing)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cacheable(docai_data: Dict[str, Any]) -> bool:
+    """
+    False for DocAI results that a retry may complete: skipped for a
+    transient reason, or missing the pages of chunks that failed.
+    """
+    docai_meta = docai_data.get("meta", {})
+    if docai_meta.get("skipped") and docai_meta.get("reason") in _UNCACHEABLE_DOCAI_REASONS:
+        return False
+    return not docai_meta.get("failed_chunks")
+
+
+class ExtractionCache:
+    """
+    Local on-disk cache of raw extractor output (pdfplumber, PyMuPDF, DocAI),
+    keyed by extraction_cache_key(). One gzip'd JSON file per document.
+    When the cache grows past max_bytes, least recently used entries
+    (by mtime, refreshed on every hit) are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # computed lazily on first write
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[Extractions]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[Cache] Ignoring unreadable cache entry {path.name}: {e}")
+            return None
+        if not _cacheable(data["docai"]):
+            # Written before partial DocAI results were kept out of the cache
+            return None
+        return data["pdfplumber"], data["pymupdf"], data["docai"]
+
+    def put(self, key: str, extractions: Extractions) -> None:
+        pdfplumber_data, pymupdf_data, docai_data = extractions
+        if not _cacheable(docai_data):
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(
+                {"pdfplumber": pdfplumber_data, "pymupdf": pymupdf_data, "docai": docai_data},
+                f,
+                ensure_ascii=False,
+            )
+        # Atomic, so concurrent workers never read a half-written entry
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += path.stat().st_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json.gz"):
+                    yield entry
+
+    def _disk_usage(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self) -> None:
+        """Delete oldest entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(
+            ((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()),
+        )
+        size = sum(s for _, s, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, entry_size, entry_path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass  # another worker got there first
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        if evicted:
+            print(f"[Cache] Evicted {evicted} entries, cache size now {size} bytes")
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                cache_dir=settings.EXTRACTION_CACHE_DIR,
+                max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+            )
+        return _cache
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+from src.storage.extraction_cache import file_sha256
+
+# Stages of a document, in pipeline order
+STAGE_EXTRACTED = "extracted"    # SuperJSON built and written to data/processed
+STAGE_STORED = "stored_bq"       # super_json row accepted by BigQuery
+STAGE_METADATA = "metadata"      # Gemini metadata extracted (and its row accepted)
+STAGES = (STAGE_EXTRACTED, STAGE_STORED, STAGE_METADATA)
+
+# What plan() decides for a file
+RUN = "run"
+DONE = "done"
+GAVE_UP = "gave_up"
+
+
+def ledger_file_key(pdf_path: str, mode: str = "stat") -> str:
+    """
+    Identity of an input file in the ledger.
+    - stat: absolute path + size + mtime (no read; a touched file is new work)
+    - hash: content SHA-256 (reads the file; a moved or copied file is not)
+    """
+    if mode == "hash":
+        return file_sha256(pdf_path)
+    st = os.stat(pdf_path)
+    ident = f"{os.path.abspath(pdf_path)}\0{st.st_size}\0{st.st_mtime_ns}"
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+
+class ProcessingLedger:
+    """
+    Local SQLite record of what happened to every input file, so an
+    interrupted batch can be re-run without redoing finished work or
+    writing duplicate rows.
+    Each (file, stage) is pending, running, done or failed, with the number
+    of attempts and the last error. A stage that was still running when a
+    run died counts as not done. Files whose failed stage has used up
+    max_attempts are skipped until reset_failed().
+    Safe to share between threads, and to read from another process while a
+    run is going (WAL mode).
+    """
+
+    def __init__(self, path: str, max_attempts: int, key_mode: str = "stat") -> None:
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.key_mode = key_mode
+        self._lock = threading.Lock()
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ledger_files (
+                file_key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                doc_id TEXT,
+                output_path TEXT,
+                first_seen_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ledger_stages (
+                file_key TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (file_key, stage)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ledger_stages_status ON ledger_stages (stage, status)"
+        )
+        self._conn.commit()
+
+    # -- files -------------------------------------------------------------
+
+    def register(self, pdf_path: str) -> str:
+        """Record pdf_path (if new) and return its file key."""
+        key = ledger_file_key(pdf_path, self.key_mode)
+        st = os.stat(pdf_path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ledger_files (file_key, path, size, mtime, first_seen_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (file_key) DO UPDATE SET path = excluded.path
+                """,
+                (key, os.path.abspath(pdf_path), st.st_size, st.st_mtime, now, now),
+            )
+            self._conn.commit()
+        return key
+
+    def file_info(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, doc_id, output_path FROM ledger_files WHERE file_key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"path": row[0], "doc_id": row[1], "output_path": row[2]}
+
+    # -- stages ------------------------------------------------------------
+
+    def states(self, key: str) -> Dict[str, Tuple[str, int]]:
+        """{stage: (status, attempts)} for the stages seen so far."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, status, attempts FROM ledger_stages WHERE file_key = ?",
+                (key,),
+            ).fetchall()
+        return {stage: (status, attempts) for stage, status, attempts in rows}
+
+    def plan(self, key: str, stages: Sequence[str]) -> Tuple[str, List[str]]:
+        """
+        (RUN, stages still to do), (DONE, []) or (GAVE_UP, [failed stage])
+        for a file that needs `stages`.
+        """
+        states = self.states(key)
+        pending = [s for s in stages if states.get(s, ("pending", 0))[0] != "done"]
+        if not pending:
+            return DONE, []
+        status, attempts = states.get(pending[0], ("pending", 0))
+        if status != "done" and attempts >= self.max_attempts:
+            return GAVE_UP, pending[:1]
+        return RUN, pending
+
+    def start(self, key: str, stage: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ledger_stages (file_key, stage, status, attempts, updated_at)
+                VALUES (?, ?, 'running', 1, ?)
+                ON CONFLICT (file_key, stage) DO UPDATE SET
+                    status = 'running', attempts = attempts + 1, updated_at = excluded.updated_at
+                """,
+                (key, stage, now),
+            )
+            self._conn.commit()
+
+    def finish(
+        self,
+        key: str,
+        stage: str,
+        doc_id: Optional[str] = None,
+        output_path: Optional[str] = None,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ledger_stages (file_key, stage, status, attempts, updated_at)
+                VALUES (?, ?, 'done', 1, ?)
+                ON CONFLICT (file_key, stage) DO UPDATE SET
+                    status = 'done', last_error = NULL, updated_at = excluded.updated_at
+                """,
+                (key, stage, now),
+            )
+            if doc_id is not None or output_path is not None:
+                self._conn.execute(
+                    """
+                    UPDATE ledger_files SET doc_id = COALESCE(?, doc_id),
+                        output_path = COALESCE(?, output_path), updated_at = ?
+                    WHERE file_key = ?
+                    """,
+                    (doc_id, output_path, now, key),
+                )
+            self._conn.commit()
+
+    def fail(self, key: str, stage: Optional[str], error: Any) -> None:
+        """Mark stage (or, with stage=None, every running stage) as failed."""
+        now = time.time()
+        message = str(error)[:2000]
+        with self._lock:
+            if stage is None:
+                self._conn.execute(
+                    """
+                    UPDATE ledger_stages SET status = 'failed', last_error = ?, updated_at = ?
+                    WHERE file_key = ? AND status = 'running'
+                    """,
+                    (message, now, key),
+                )
+            else:
+                self._conn.execute(
+                    """
+                    INSERT INTO ledger_stages (file_key, stage, status, attempts, last_error, updated_at)
+                    VALUES (?, ?, 'failed', 1, ?, ?)
+                    ON CONFLICT (file_key, stage) DO UPDATE SET
+                        status = 'failed', last_error = excluded.last_error, updated_at = excluded.updated_at
+                    WHERE status != 'done'
+                    """,
+                    (key, stage, message, now),
+                )
+            self._conn.commit()
+
+    def completion(self, key: str, stage: str) -> Callable[[bool, Optional[str]], None]:
+        """Callback for asynchronous stages (rows buffered by bq_writer)."""
+
+        def done(ok: bool, error: Optional[str] = None) -> None:
+            if ok:
+                self.finish(key, stage)
+            else:
+                self.fail(key, stage, error or "not stored")
+
+        return done
+
+    def reset_failed(self) -> int:
+        """Give failed stages a fresh set of attempts. Returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ledger_stages SET attempts = 0 WHERE status = 'failed'"
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    # -- progress ----------------------------------------------------------
+
+    def progress(self) -> Dict[str, Any]:
+        """Files known, and {stage: {status: count}}."""
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM ledger_files").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT stage, status, COUNT(*) FROM ledger_stages GROUP BY stage, status"
+            ).fetchall()
+        stages: Dict[str, Dict[str, int]] = {stage: {} for stage in STAGES}
+        for stage, status, count in rows:
+            stages.setdefault(stage, {})[status] = count
+        return {"files": files, "stages": stages}
+
+    def failures(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent failed stages, with their file and last error."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT f.path, s.stage, s.attempts, s.last_error, s.updated_at
+                FROM ledger_stages s JOIN ledger_files f USING (file_key)
+                WHERE s.status = 'failed'
+                ORDER BY s.updated_at DESC
+                LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "path": path,
+                "stage": stage,
+                "attempts": attempts,
+                "gave_up": attempts >= self.max_attempts,
+                "error": error,
+                "updated_at": updated_at,
+            }
+            for path, stage, attempts, error, updated_at in rows
+        ]
+
+
+_ledger: Optional[ProcessingLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> ProcessingLedger:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = ProcessingLedger(
+                path=settings.LEDGER_PATH,
+                max_attempts=settings.LEDGER_MAX_ATTEMPTS,
+                key_mode=settings.LEDGER_KEY,
+            )
+        return _ledger
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.settings import settings
+
+# SQLite's limit on bound parameters is 32766; stay well under it
+_MAX_PARAMS = 500
+
+
+class LocalDocumentStore:
+    """
+    Embedded SQLite copy of the two BigQuery tables (super_json_docs and
+    contract_metadata), keyed by doc_id: point lookups are a primary-key
+    read, bulk scans stream rows page by page. Holds one row per doc_id
+    (the latest write wins), where BigQuery appends.
+    Used on its own (STORAGE_BACKEND=sqlite: offline runs, steps 1 and 2)
+    or as a read-through mirror in front of BigQuery (STORAGE_BACKEND=mirror).
+    Safe to share between threads; other processes can read while a run
+    writes (WAL mode).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS super_json_docs (
+                doc_id TEXT PRIMARY KEY,
+                source_path TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                super_json TEXT NOT NULL,
+                ingested_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contract_metadata (
+                doc_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                llm_model TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                row_json TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable enough for a local copy, and much faster per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # -- super_json_docs -----------------------------------------------------
+
+    def put_super_json(self, row: Dict[str, Any]) -> None:
+        """row: doc_id, source_path, filename, super_json (serialized)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO super_json_docs VALUES (?, ?, ?, ?, ?)",
+                (row["doc_id"], row["source_path"], row["filename"], row["super_json"], time.time()),
+            )
+            self._conn.commit()
+
+    def get_super_json(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Same shape as super_json_reader.get_super_json_record."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, filename, super_json FROM super_json_docs WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"doc_id": row[0], "filename": row[1], "super_json": row[2]}
+
+    def iter_super_json(
+        self,
+        doc_ids: Optional[List[str]] = None,
+        pending_only: bool = False,
+        page_size: int = 50,
+        ingested_since: Optional[datetime.datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream records (see super_json_reader.iter_super_json_records) on a
+        connection of its own, so writers are not blocked while it is consumed.
+        """
+        query = "SELECT s.doc_id, s.filename, s.super_json FROM super_json_docs s WHERE TRUE"
+        params: List[Any] = []
+        if ingested_since is not None:
+            if ingested_since.tzinfo is None:
+                ingested_since = ingested_since.replace(tzinfo=datetime.timezone.utc)
+            query += " AND s.ingested_at >= ?"
+            params.append(ingested_since.timestamp())
+        if pending_only:
+            query += " AND NOT EXISTS (SELECT 1 FROM contract_metadata m WHERE m.doc_id = s.doc_id)"
+
+        batches: List[List[str]] = [[]] if doc_ids is None else [
+            list(doc_ids[i:i + _MAX_PARAMS]) for i in range(0, len(doc_ids), _MAX_PARAMS)
+        ]
+        conn = self._connect()
+        try:
+            for batch in batches:
+                sql = query
+                if doc_ids is not None:
+                    sql += f" AND s.doc_id IN ({', '.join('?' * len(batch))})"
+                cursor = conn.execute(sql, params + batch)
+                while True:
+                    rows = cursor.fetchmany(page_size)
+                    if not rows:
+                        break
+                    for doc_id, filename, super_json in rows:
+                        yield {"doc_id": doc_id, "filename": filename, "super_json": super_json}
+        finally:
+            conn.close()
+
+    # -- contract_metadata ---------------------------------------------------
+
+    def put_contract_metadata(self, row: Dict[str, Any]) -> None:
+        """row: a contract_metadata row as sent to BigQuery."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contract_metadata VALUES (?, ?, ?, ?, ?)",
+                (
+                    row["doc_id"],
+                    row["filename"],
+                    row["llm_model"],
+                    row["created_at"],
+                    json.dumps(row, ensure_ascii=False, default=str),
+                ),
+            )
+            self._conn.commit()
+
+    def get_contract_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row_json FROM contract_metadata WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("super_json_docs", "contract_metadata")
+            }
+
+
+_store: Optional[LocalDocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_local_store() -> LocalDocumentStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalDocumentStore(settings.LOCAL_STORE_PATH)
+        return _store
+
+
+def storage_backend() -> str:
+    """STORAGE_BACKEND, checked: "bigquery", "sqlite" or "mirror"."""
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend not in ("bigquery", "sqlite", "mirror"):
+        raise ValueError(f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND!r} (bigquery, sqlite or mirror)")
+    return backend
+
+
+def sends_to_bigquery(to_bigquery: bool = True) -> bool:
+    """
+    Whether a document stored with to_bigquery reaches BigQuery (not with
+    STORAGE_BACKEND=sqlite), i.e. whether the ledger's stored_bq stage applies.
+    """
+    return to_bigquery and storage_backend() != "sqlite"
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config.settings import settings
+from src.models.super_json_schema import SuperJSON
+from src.pdf_ingestion.loaders import get_processed_json_path
+
+try:  # optional, faster than the stdlib encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # optional, only needed for PROCESSED_JSON_FORMAT=zstd
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PROCESSED_JSON_SUFFIXES = {
+    "json": ".json",
+    "pretty": ".json",
+    "gzip": ".json.gz",
+    "zstd": ".json.zst",
+}
+
+
+def encode_super_json(super_json: SuperJSON, encoder: Optional[str] = None) -> str:
+    """
+    Compact JSON for a SuperJSON, produced once per document and shared by
+    the local file and the BigQuery row.
+    encoder (default settings.JSON_ENCODER):
+    - "pydantic": model_dump_json (serialized in Rust, no intermediate dicts)
+    - "orjson": model_dump + orjson (falls back to "json" if not installed)
+    - "json": model_dump + the stdlib encoder (previous behaviour)
+    """
+    encoder = settings.JSON_ENCODER if encoder is None else encoder
+    if encoder == "pydantic":
+        return super_json.model_dump_json()
+    if encoder == "orjson" and orjson is not None:
+        return orjson.dumps(super_json.model_dump()).decode("utf-8")
+    return json.dumps(super_json.model_dump(), ensure_ascii=False, separators=(",", ":"))
+
+
+def write_processed_json(
+    processed_dir: str,
+    super_json: SuperJSON,
+    encoded: str,
+    fmt: Optional[str] = None,
+) -> Path:
+    """
+    Write the local copy of a SuperJSON, from its already encoded JSON.
+    fmt (default settings.PROCESSED_JSON_FORMAT): "json" (compact), "gzip",
+    "zstd" (needs the zstandard package, else falls back to gzip) or
+    "pretty" (indented for reading by hand; the only format that encodes
+    the document a second time).
+    """
+    fmt = settings.PROCESSED_JSON_FORMAT if fmt is None else fmt
+    if fmt not in PROCESSED_JSON_SUFFIXES:
+        raise ValueError(f"Unknown PROCESSED_JSON_FORMAT: {fmt!r}")
+    if fmt == "zstd" and zstandard is None:
+        print("[Storage] zstandard is not installed, writing gzip instead")
+        fmt = "gzip"
+
+    out_path = get_processed_json_path(processed_dir, super_json.doc_id, PROCESSED_JSON_SUFFIXES[fmt])
+    if fmt == "pretty":
+        data = super_json.model_dump_json(indent=2).encode("utf-8")
+    else:
+        data = encoded.encode("utf-8")
+        if fmt == "gzip":
+            data = gzip.compress(data, compresslevel=settings.PROCESSED_JSON_COMPRESSION_LEVEL)
+        elif fmt == "zstd":
+            data = zstandard.ZstdCompressor(level=settings.PROCESSED_JSON_COMPRESSION_LEVEL).compress(data)
+
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def read_processed_json(path: str) -> Dict[str, Any]:
+    """Load a local SuperJSON file written in any PROCESSED_JSON_FORMAT."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        data = gzip.decompress(data)
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return json.loads(data)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from google.cloud import bigquery
+
+from src.pdf_ingestion.normalizer.canonical import canonical_sources
+from src.storage.bigquery_client import ensure_table, table_id
+from src.storage.bq_writer import OnDone, get_batch_writer
+
+if TYPE_CHECKING:
+    # Only for annotations: the pydantic models are slow to import
+    from src.models.super_json_schema import SuperJSON
+
+# Child tables of super_json_docs: one row per text span / table of a
+# document, so readers can select pages, sources or only the canonical
+# text instead of downloading and parsing the whole super_json string.
+# Rows carry the ingested_at of their super_json_docs row, which tells
+# apart the rows of a document ingested more than once.
+TEXT_SPANS_TABLE = "super_json_text_spans"
+TABLES_TABLE = "super_json_tables"
+
+TEXT_SPANS_SCHEMA = [
+    bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("ingested_at", "TIMESTAMP", mode="REQUIRED"),
+    bigquery.SchemaField("page", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("source", "STRING", mode="REQUIRED"),
+    # Position in SuperJSON.text_spans, to restore the original order
+    bigquery.SchemaField("span_index", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("text", "STRING"),
+    bigquery.SchemaField("bbox", "FLOAT", mode="REPEATED"),
+    # Span of the extractor whose text is used for its page (see
+    # normalizer.canonical)
+    bigquery.SchemaField("canonical", "BOOL", mode="REQUIRED"),
+]
+
+TABLES_SCHEMA = [
+    bigquery.SchemaField("doc_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("ingested_at", "TIMESTAMP", mode="REQUIRED"),
+    bigquery.SchemaField("page", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("source", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("table_index", "INTEGER", mode="REQUIRED"),
+    # Row-major cells as JSON (null where the extractor found no cell)
+    bigquery.SchemaField("rows_json", "STRING", mode="REQUIRED"),
+]
+
+STRUCTURED_PARTITION_FIELD = "ingested_at"
+STRUCTURED_CLUSTERING = ["doc_id", "page", "source"]
+
+
+def ensure_structured_tables_exist() -> None:
+    """Create both child tables if needed (checked once per process)."""
+    ensure_table(TEXT_SPANS_TABLE, TEXT_SPANS_SCHEMA, STRUCTURED_PARTITION_FIELD, STRUCTURED_CLUSTERING)
+    ensure_table(TABLES_TABLE, TABLES_SCHEMA, STRUCTURED_PARTITION_FIELD, STRUCTURED_CLUSTERING)
+
+
+def structured_rows(
+    super_json: SuperJSON,
+    ingested_at: str,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(text span rows, table rows) of one document."""
+    spans = super_json.text_spans
+    canonical = canonical_sources([{"page": s.page, "source": s.source, "text": s.text} for s in spans])
+
+    span_rows = [
+        {
+            "doc_id": super_json.doc_id,
+            "ingested_at": ingested_at,
+            "page": span.page,
+            "source": span.source,
+            "span_index": i,
+            "text": span.text,
+            "bbox": span.bbox or [],
+            "canonical": canonical.get(span.page) == span.source,
+        }
+        for i, span in enumerate(spans)
+    ]
+    table_rows = [
+        {
+            "doc_id": super_json.doc_id,
+            "ingested_at": ingested_at,
+            "page": table.page,
+            "source": table.source,
+            "table_index": i,
+            "rows_json": json.dumps(table.rows, ensure_ascii=False),
+        }
+        for i, table in enumerate(super_json.tables)
+    ]
+    return span_rows, table_rows
+
+
+def insert_structured_rows(
+    span_rows: List[Dict[str, Any]],
+    table_rows: List[Dict[str, Any]],
+    on_done: Optional[OnDone] = None,
+) -> None:
+    """Queue the rows on the shared batch writers; on_done is called per row."""
+    for table_name, rows in ((TEXT_SPANS_TABLE, span_rows), (TABLES_TABLE, table_rows)):
+        if not rows:
+            continue
+        writer = get_batch_writer(table_id(table_name))
+        for row in rows:
+            writer.add(row, on_done=on_done)
@@ -1,49 +1,286 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import datetime
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from google.cloud import bigquery
 
 from config.settings import settings
-from src.storage.bigquery_client import get_bq_client
+from src.metrics.recorder import stage
+from src.storage.bigquery_client import run_query
+from src.storage.local_store import get_local_store, storage_backend
 
 
-def get_super_json_record(doc_id: str) -> Optional[Dict[str, Any]]:
+def get_super_json_record(
+    doc_id: str,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Fetch a single record from super_json_docs by doc_id.
     Returns a dict with keys: doc_id, filename, super_json.
+    ingested_since: the document was ingested at or after this time, so
+    BigQuery only reads those partitions (the doc_id clustering prunes the
+    rest of the scan either way).
+    Read from STORAGE_BACKEND; with "mirror" the local SQLite copy answers
+    first and documents only found in BigQuery are copied into it.
     """
-    client: bigquery.Client = get_bq_client()
+    backend = storage_backend()
+    if backend in ("sqlite", "mirror"):
+        with stage("local_read") as info:
+            record = get_local_store().get_super_json(doc_id)
+            info["rows"] = int(record is not None)
+        if record is not None or backend == "sqlite":
+            return record
+
+    row = _get_bq_super_json_row(doc_id, ingested_since)
+    if row is None:
+        return None
+    if backend == "mirror":
+        get_local_store().put_super_json(row)
+    return {"doc_id": row["doc_id"], "filename": row["filename"], "super_json": row["super_json"]}
 
-    dataset = settings.BQ_DATASET
-    table = settings.BQ_TABLE
-    project = settings.GCP_PROJECT_ID
 
-    table_ref = f"`{project}.{dataset}.{table}`"
+def _get_bq_super_json_row(
+    doc_id: str,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    conditions = ["doc_id = @doc_id"]
+    query_parameters = [bigquery.ScalarQueryParameter("doc_id", "STRING", doc_id)]
+    if ingested_since is not None:
+        conditions.append("ingested_at >= @ingested_since")
+        query_parameters.append(bigquery.ScalarQueryParameter("ingested_since", "TIMESTAMP", ingested_since))
 
+    # Latest ingestion first if the doc_id was stored more than once
     query = f"""
-        SELECT doc_id, filename, super_json
-        FROM {table_ref}
-        WHERE doc_id = @doc_id
+        SELECT doc_id, source_path, filename, super_json
+        FROM {_table_ref(settings.BQ_TABLE)}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY ingested_at DESC
         LIMIT 1
     """
 
-    job = client.query(
-        query,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("doc_id", "STRING", doc_id),
-            ]
-        ),
-    )
-
-    rows = list(job.result())
+    rows = list(run_query(query, query_parameters, stage_name="bq_read"))
     if not rows:
         return None
 
     row = rows[0]
     return {
         "doc_id": row["doc_id"],
+        "source_path": row["source_path"],
         "filename": row["filename"],
         "super_json": row["super_json"],  # stored as STRING
     }
+
+
+def iter_super_json_records(
+    doc_ids: Optional[List[str]] = None,
+    pending_only: bool = False,
+    page_size: int = 50,
+    ingested_since: Optional[datetime.datetime] = None,
+    structured: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream many super_json_docs records with a single query job.
+    - doc_ids: restrict to these doc_ids (None = all)
+    - pending_only: only docs that have no row in contract_metadata yet
+    - ingested_since: only docs ingested at or after this time; both tables
+      are then read from the matching partitions only (a document's
+      metadata is always created after it was ingested)
+    - structured: only docs stored with (True) / without (False) rows in
+      the structured child tables (BigQuery only)
+    Rows are fetched page by page (page_size rows per request), so callers
+    can start on the first documents while the rest is still downloading.
+    Yields dicts with keys: doc_id, filename, super_json.
+    The SQLite backend scans the local store. "mirror" scans BigQuery (the
+    complete copy) and adds the documents it streams to the local store.
+    """
+    backend = storage_backend()
+    if backend == "sqlite":
+        yield from get_local_store().iter_super_json(
+            doc_ids, pending_only=pending_only, page_size=page_size, ingested_since=ingested_since
+        )
+        return
+    local_store = get_local_store() if backend == "mirror" else None
+
+    conditions, query_parameters = _doc_conditions(doc_ids, pending_only, ingested_since)
+    query = f"""
+        SELECT s.doc_id, s.source_path, s.filename, s.super_json
+        FROM {_table_ref(settings.BQ_TABLE)} s
+        WHERE {" AND ".join(conditions)}
+        {_latest_row(structured)}
+    """
+
+    for row in run_query(query, query_parameters, stage_name="bq_scan", page_size=page_size):
+        if local_store is not None:
+            local_store.put_super_json(row)
+        yield {
+            "doc_id": row["doc_id"],
+            "filename": row["filename"],
+            "super_json": row["super_json"],  # stored as STRING
+        }
+
+
+def get_document_projection(
+    doc_id: str,
+    pages: Optional[List[int]] = None,
+    canonical_only: bool = True,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Part of a document, read from the structured child tables instead of
+    the super_json string: only `pages` (None = all) and, with
+    canonical_only, only the text of the extractor chosen for each page.
+    Returns {"doc_id", "filename", "document"}, where document is a
+    SuperJSON-shaped dict (doc_id, filename, source_path, num_pages,
+    text_spans, tables; no metadata).
+    Documents without child rows (SQLite backend, BQ_STRUCTURED_TABLES off,
+    or stored before it) come back whole, as get_super_json_record records.
+    """
+    backend = storage_backend()
+    if backend == "sqlite" or not settings.BQ_STRUCTURED_TABLES:
+        return get_super_json_record(doc_id, ingested_since=ingested_since)
+    if backend == "mirror":
+        with stage("local_read") as info:
+            record = get_local_store().get_super_json(doc_id)
+            info["rows"] = int(record is not None)
+        if record is not None:
+            return record
+
+    for record in _iter_bq_projections([doc_id], False, 1, ingested_since, pages, canonical_only):
+        return record
+    return get_super_json_record(doc_id, ingested_since=ingested_since)
+
+
+def iter_document_projections(
+    doc_ids: Optional[List[str]] = None,
+    pending_only: bool = False,
+    page_size: int = 50,
+    ingested_since: Optional[datetime.datetime] = None,
+    pages: Optional[List[int]] = None,
+    canonical_only: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    iter_super_json_records, projected like get_document_projection: one
+    query over the child tables for documents stored with them, then the
+    super_json strings of the others.
+    """
+    if storage_backend() == "sqlite" or not settings.BQ_STRUCTURED_TABLES:
+        yield from iter_super_json_records(doc_ids, pending_only, page_size, ingested_since)
+        return
+    yield from _iter_bq_projections(doc_ids, pending_only, page_size, ingested_since, pages, canonical_only)
+    yield from iter_super_json_records(doc_ids, pending_only, page_size, ingested_since, structured=False)
+
+
+def _iter_bq_projections(
+    doc_ids: Optional[List[str]],
+    pending_only: bool,
+    page_size: int,
+    ingested_since: Optional[datetime.datetime],
+    pages: Optional[List[int]],
+    canonical_only: bool,
+) -> Iterator[Dict[str, Any]]:
+    from src.storage.structured_tables import TABLES_TABLE, TEXT_SPANS_TABLE
+
+    conditions, query_parameters = _doc_conditions(doc_ids, pending_only, ingested_since)
+
+    # Filters repeated on the child tables so their partitions / clusters
+    # are pruned too (the join on docs alone would not)
+    child_conditions = ["TRUE"]
+    if doc_ids is not None:
+        child_conditions.append("t.doc_id IN UNNEST(@doc_ids)")
+    if ingested_since is not None:
+        child_conditions.append("t.ingested_at >= @ingested_since")
+    if pages is not None:
+        child_conditions.append("t.page IN UNNEST(@pages)")
+        query_parameters.append(bigquery.ArrayQueryParameter("pages", "INT64", list(pages)))
+    span_conditions = child_conditions + (["t.canonical"] if canonical_only else [])
+
+    query = f"""
+        WITH docs AS (
+            SELECT s.doc_id, s.filename, s.source_path, s.num_pages, s.ingested_at
+            FROM {_table_ref(settings.BQ_TABLE)} s
+            WHERE {" AND ".join(conditions)}
+            {_latest_row(True)}
+        ),
+        spans AS (
+            SELECT t.doc_id, ARRAY_AGG(STRUCT(t.page, t.source, t.text) ORDER BY t.page, t.span_index) AS text_spans
+            FROM {_table_ref(TEXT_SPANS_TABLE)} t
+            JOIN docs d ON t.doc_id = d.doc_id AND t.ingested_at = d.ingested_at
+            WHERE {" AND ".join(span_conditions)}
+            GROUP BY t.doc_id
+        ),
+        doc_tables AS (
+            SELECT t.doc_id, ARRAY_AGG(STRUCT(t.page, t.source, t.rows_json) ORDER BY t.page, t.table_index) AS tables
+            FROM {_table_ref(TABLES_TABLE)} t
+            JOIN docs d ON t.doc_id = d.doc_id AND t.ingested_at = d.ingested_at
+            WHERE {" AND ".join(child_conditions)}
+            GROUP BY t.doc_id
+        )
+        SELECT d.doc_id, d.filename, d.source_path, d.num_pages, spans.text_spans, doc_tables.tables
+        FROM docs d
+        LEFT JOIN spans USING (doc_id)
+        LEFT JOIN doc_tables USING (doc_id)
+    """
+
+    for row in run_query(query, query_parameters, stage_name="bq_projection", page_size=page_size):
+        document = {
+            "doc_id": row["doc_id"],
+            "filename": row["filename"],
+            "source_path": row["source_path"],
+            "num_pages": row["num_pages"],
+            "text_spans": [dict(span) for span in row["text_spans"] or []],
+            "tables": [
+                {"page": table["page"], "source": table["source"], "rows": json.loads(table["rows_json"])}
+                for table in row["tables"] or []
+            ],
+        }
+        yield {"doc_id": row["doc_id"], "filename": row["filename"], "document": document}
+
+
+def _table_ref(table_name: str) -> str:
+    return f"`{settings.GCP_PROJECT_ID}.{settings.BQ_DATASET}.{table_name}`"
+
+
+def _latest_row(structured: Optional[bool] = None) -> str:
+    """
+    A doc_id may have been ingested more than once: keep its latest row,
+    if it was (structured=True) or was not (False) stored with child rows.
+    """
+    clause = "QUALIFY ROW_NUMBER() OVER (PARTITION BY s.doc_id ORDER BY s.ingested_at DESC) = 1"
+    if structured is True:
+        clause += " AND s.structured IS TRUE"
+    elif structured is False:
+        clause += " AND s.structured IS NOT TRUE"
+    return clause
+
+
+def _doc_conditions(
+    doc_ids: Optional[List[str]],
+    pending_only: bool,
+    ingested_since: Optional[datetime.datetime],
+) -> Tuple[List[str], List[Any]]:
+    """WHERE conditions on super_json_docs (alias s) and their parameters."""
+    from src.storage.contract_metadata_repository import (
+        CONTRACT_METADATA_TABLE,
+        ensure_contract_metadata_table_exists,
+    )
+
+    conditions = ["TRUE"]
+    metadata_conditions = ["m.doc_id = s.doc_id"]
+    query_parameters: List[Any] = []
+    if doc_ids is not None:
+        conditions.append("s.doc_id IN UNNEST(@doc_ids)")
+        query_parameters.append(bigquery.ArrayQueryParameter("doc_ids", "STRING", list(doc_ids)))
+    if ingested_since is not None:
+        conditions.append("s.ingested_at >= @ingested_since")
+        metadata_conditions.append("m.created_at >= @ingested_since")
+        query_parameters.append(bigquery.ScalarQueryParameter("ingested_since", "TIMESTAMP", ingested_since))
+    if pending_only:
+        # The anti-join needs the table to exist, even if it is still empty
+        ensure_contract_metadata_table_exists()
+        conditions.append(
+            f"NOT EXISTS (SELECT 1 FROM {_table_ref(CONTRACT_METADATA_TABLE)} m "
+            f"WHERE {' AND '.join(metadata_conditions)})"
+        )
+    return conditions, query_parameters
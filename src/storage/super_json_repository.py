@@ -1,35 +1,120 @@
 from __future__ import annotations
 
-import json
+import datetime
+from typing import Any, Callable, Dict, List, Optional
 
+from config.settings import settings
 from src.models.super_json_schema import SuperJSON
 from src.storage.bigquery_client import (
     ensure_super_json_table_exists,
     insert_super_json_row,
 )
+from src.metrics.recorder import get_metrics, stage
+from src.storage.bq_writer import all_done
+from src.storage.local_store import get_local_store, storage_backend
+from src.storage.serialization import encode_super_json
+from src.storage.structured_tables import (
+    ensure_structured_tables_exist,
+    insert_structured_rows,
+    structured_rows,
+)
+
+
+def save_super_json(
+    super_json: SuperJSON,
+    encoded: Optional[str] = None,
+    on_stored: Optional[Callable[[bool, Optional[str]], None]] = None,
+    to_bigquery: bool = True,
+) -> None:
+    """
+    Save SuperJSON into the document store (STORAGE_BACKEND): BigQuery,
+    the local SQLite store, or both ("mirror"). to_bigquery=False stores
+    it in the local SQLite store only, whatever the backend, so step 2 can
+    still read it back offline.
+    on_stored(ok, error): see save_super_json_to_bq; with the SQLite store
+    alone it is called before this returns.
+    """
+    backend = storage_backend() if to_bigquery else "sqlite"
+    if backend in ("sqlite", "mirror"):
+        with stage("store_local"):
+            get_local_store().put_super_json(_super_json_row(super_json, encoded))
+        if backend == "sqlite":
+            if on_stored is not None:
+                on_stored(True, None)
+            return
+
+    with stage("store_bq"):
+        save_super_json_to_bq(super_json, encoded=encoded, on_stored=on_stored)
 
 
-def save_super_json_to_bq(super_json: SuperJSON) -> None:
+def save_super_json_to_bq(
+    super_json: SuperJSON,
+    encoded: Optional[str] = None,
+    on_stored: Optional[Callable[[bool, Optional[str]], None]] = None,
+) -> None:
     """
-    Save SuperJSON into BigQuery.
+    Save SuperJSON into BigQuery: its super_json_docs row and, with
+    BQ_STRUCTURED_TABLES, one row per text span / table in the child tables.
+    encoded: the document already serialized by encode_super_json(), so it
+    is not encoded a second time.
+    on_stored(ok, error): called once all its rows are in BigQuery, or
+    known not to be (skipped or given up on). Child rows are inserted
+    first; the super_json_docs row follows once they are in.
     If GCP is not configured, we skip gracefully.
     """
     try:
         ensure_super_json_table_exists()
+        if settings.BQ_STRUCTURED_TABLES:
+            ensure_structured_tables_exist()
     except RuntimeError as e:
         # BigQuery not configured → just log and skip
         print(f"[BQ] Skipping BigQuery storage: {e}")
+        get_metrics().skip("store_bq", "not_configured" if "not set" in str(e) else type(e).__name__)
+        if on_stored is not None:
+            on_stored(False, str(e))
+        return
+
+    row = _super_json_row(super_json, encoded)
+    span_rows: List[Dict[str, Any]] = []
+    table_rows: List[Dict[str, Any]] = []
+    if settings.BQ_STRUCTURED_TABLES:
+        span_rows, table_rows = structured_rows(super_json, row["ingested_at"])
+
+    def insert_doc_row(children_ok: bool = True, error: Optional[str] = None) -> None:
+        # The super_json_docs row is the commit marker: readers only project
+        # documents whose row says "structured", so it goes in after all of
+        # its child rows are in. If some of those were given up on, it still
+        # goes in, read as a whole super_json string like legacy documents.
+        if not children_ok:
+            print(f"[BQ] Structured rows of {row['doc_id']} failed, storing super_json only: {error}")
+            row["structured"] = False
+        try:
+            insert_super_json_row(row, on_done=on_stored)
+        except RuntimeError as e:
+            print(f"[BQ] Error inserting row into BigQuery, skipping: {e}")
+            get_metrics().skip("store_bq", "insert_error")
+            if on_stored is not None:
+                on_stored(False, str(e))
+
+    if not span_rows and not table_rows:
+        insert_doc_row()
         return
+    try:
+        on_children_done = all_done(insert_doc_row, len(span_rows) + len(table_rows))
+        insert_structured_rows(span_rows, table_rows, on_done=on_children_done)
+    except RuntimeError as e:
+        insert_doc_row(False, str(e))
 
-    row = {
+
+def _super_json_row(super_json: SuperJSON, encoded: Optional[str] = None) -> Dict[str, Any]:
+    return {
         "doc_id": super_json.doc_id,
         "source_path": super_json.source_path,
         "filename": super_json.filename,
         # Store the entire structure as a JSON string
-        "super_json": json.dumps(super_json.model_dump(), ensure_ascii=False),
+        "super_json": encoded if encoded is not None else encode_super_json(super_json),
+        # Partitioning column of super_json_docs
+        "ingested_at": datetime.datetime.utcnow().isoformat(),
+        "num_pages": super_json.num_pages,
+        "structured": settings.BQ_STRUCTURED_TABLES,
     }
-
-    try:
-        insert_super_json_row(row)
-    except RuntimeError as e:
-        print(f"[BQ] Error inserting row into BigQuery, skipping: {e}")
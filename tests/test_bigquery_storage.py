@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from benchmarks.fakes import FakeBigQueryClient, install_fakes
+from config.settings import settings
+from src.models.super_json_schema import SuperJSON, Table, TextSpan
+from src.storage import bq_writer
+from src.storage.bigquery_client import reset_ensured_tables
+from src.storage.bq_writer import BigQueryBatchWriter
+from src.storage.super_json_repository import save_super_json_to_bq
+
+
+class _ScriptedClient:
+    """insert_rows_json() rejects rows whose "bad" flag is set, or raises `errors` in turn."""
+
+    def __init__(self, errors: List[Exception] = ()) -> None:
+        self.errors = list(errors)
+        self.requests: List[List[Dict[str, Any]]] = []
+
+    def insert_rows_json(self, table, rows, row_ids=None):
+        self.requests.append(rows)
+        if self.errors:
+            raise self.errors.pop(0)
+        bad = [i for i, row in enumerate(rows) if row.get("bad")]
+        if not bad:
+            return []
+        return [
+            {"index": i, "errors": [{"reason": "invalid" if i in bad else "stopped", "message": "x"}]}
+            for i in range(len(rows))
+        ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = _ScriptedClient()
+    monkeypatch.setattr(bq_writer, "get_bq_client", lambda: client)
+    monkeypatch.setattr(bq_writer.time, "sleep", lambda s: None)
+    return client
+
+
+def _write(rows, **kwargs):
+    writer = BigQueryBatchWriter("p.d.t", max_rows=10_000, flush_interval=3600, **kwargs)
+    outcomes = {}
+    for row in rows:
+        writer.add(row, on_done=lambda ok, error, i=row["i"]: outcomes.__setitem__(i, ok))
+    writer.close()
+    return writer, outcomes
+
+
+def test_invalid_row_is_dropped_and_batch_resent(client):
+    rows = [{"i": i, "bad": i == 7} for i in range(500)]
+
+    writer, outcomes = _write(rows)
+
+    # Whole batch, the batch without the invalid row, the invalid row alone
+    assert [len(r) for r in client.requests] == [500, 499, 1]
+    assert writer.inserted == 499 and writer.failed == 1
+    assert outcomes[7] is False
+    assert sum(outcomes.values()) == 499
+
+
+def test_failed_request_is_retried_whole(client):
+    client.errors = [RuntimeError("503 backend error")] * 2
+    rows = [{"i": i} for i in range(300)]
+
+    writer, outcomes = _write(rows, max_retries=3)
+
+    assert [len(r) for r in client.requests] == [300, 300, 300]
+    assert writer.inserted == 300 and writer.failed == 0
+    assert all(outcomes.values())
+
+
+def test_request_gives_up_after_max_retries(client):
+    client.errors = [RuntimeError("503 backend error")] * 10
+    rows = [{"i": i} for i in range(50)]
+
+    writer, outcomes = _write(rows, max_retries=2)
+
+    assert len(client.requests) == 3
+    assert writer.failed == 50
+    assert not any(outcomes.values())
+
+
+def test_flush_waits_for_batches_sent_by_other_threads(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    class _SlowClient(_ScriptedClient):
+        def insert_rows_json(self, table, rows, row_ids=None):
+            started.set()
+            release.wait(5)
+            return super().insert_rows_json(table, rows, row_ids)
+
+    monkeypatch.setattr(bq_writer, "get_bq_client", lambda: _SlowClient())
+    writer = BigQueryBatchWriter("p.d.t", max_rows=2, flush_interval=3600)
+    sender = threading.Thread(target=lambda: [writer.add({"i": i}) for i in range(2)])
+    sender.start()
+    assert started.wait(5)
+
+    flushed = threading.Event()
+    flusher = threading.Thread(target=lambda: (writer.flush(), flushed.set()))
+    flusher.start()
+    assert not flushed.wait(0.2)
+
+    release.set()
+    assert flushed.wait(5)
+    assert writer.inserted == 2
+    sender.join()
+    flusher.join()
+    writer.close()
+    assert not writer._timer.is_alive()
+
+
+class _OrderedFakeBigQuery(FakeBigQueryClient):
+    """Records which table each insert request went to; rejects rows of `reject_table`."""
+
+    def __init__(self, reject_table=None):
+        super().__init__(insert_latency_s=0, query_latency_s=0)
+        self.reject_table = reject_table
+        self.inserts: List[str] = []
+
+    def insert_rows_json(self, table, rows, row_ids=None):
+        name = str(table).rsplit(".", 1)[-1]
+        self.inserts.append(name)
+        if name == self.reject_table:
+            return [{"index": i, "errors": [{"reason": "invalid", "message": "x"}]} for i in range(len(rows))]
+        return super().insert_rows_json(table, rows, row_ids)
+
+
+@pytest.fixture
+def fake_bq(monkeypatch):
+    def install(**kwargs):
+        fake = _OrderedFakeBigQuery(**kwargs)
+        monkeypatch.setattr(settings, "GCP_PROJECT_ID", "test-project")
+        monkeypatch.setattr(settings, "BQ_STRUCTURED_TABLES", True)
+        monkeypatch.setattr(bq_writer, "_writers", {})
+        monkeypatch.setattr(bq_writer.time, "sleep", lambda s: None)
+        install_fakes(bigquery=fake)
+        reset_ensured_tables()
+        return fake
+
+    yield install
+    bq_writer.flush_all_writers()
+    reset_ensured_tables()
+
+
+def _super_json() -> SuperJSON:
+    return SuperJSON(
+        doc_id="doc-1",
+        filename="doc.pdf",
+        source_path="in/doc.pdf",
+        num_pages=1,
+        text_spans=[TextSpan(page=1, text="hello", source="pymupdf")],
+        tables=[Table(page=1, rows=[["a", "b"]], source="pdfplumber")],
+    )
+
+
+def test_doc_row_is_inserted_after_its_child_rows(fake_bq):
+    fake = fake_bq()
+    outcomes = []
+
+    save_super_json_to_bq(_super_json(), on_stored=lambda ok, error: outcomes.append(ok))
+    bq_writer.flush_all_writers()
+
+    assert fake.inserts[-1] == settings.BQ_TABLE
+    assert set(fake.inserts[:-1]) == {"super_json_text_spans", "super_json_tables"}
+    assert outcomes == [True]
+    doc_rows = [r for t, rows in fake.rows.items() if t.endswith(settings.BQ_TABLE) for r in rows]
+    assert [r["structured"] for r in doc_rows] == [True]
+
+
+def test_doc_row_falls_back_to_blob_when_child_rows_fail(fake_bq):
+    fake = fake_bq(reject_table="super_json_text_spans")
+    outcomes = []
+
+    save_super_json_to_bq(_super_json(), on_stored=lambda ok, error: outcomes.append(ok))
+    bq_writer.flush_all_writers()
+
+    assert outcomes == [True]
+    doc_rows = [r for t, rows in fake.rows.items() if t.endswith(settings.BQ_TABLE) for r in rows]
+    assert [r["structured"] for r in doc_rows] == [False]
+
+
+def test_row_size_counts_non_ascii_as_json_escapes():
+    row = {"doc_id": "d", "super_json": "Cláusula de rescisión: año, señal, compañía. " * 1000}
+
+    encoded = len(json.dumps(row))  # what the client sends (ensure_ascii)
+    assert bq_writer._row_size(row) >= encoded
+    assert bq_writer._row_size(row) - encoded <= bq_writer._ROW_OVERHEAD
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from src.storage.extraction_cache import ExtractionCache
+
+_PDFPLUMBER = {"pages": [{"page": 1, "text": "a"}]}
+_PYMUPDF = {"pages": [{"page": 1, "text": "a"}]}
+
+
+def _docai(**meta):
+    return {"pages": [{"page": 1, "text": "a"}], "meta": meta}
+
+
+def test_complete_result_is_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=10_000_000)
+    extractions = (_PDFPLUMBER, _PYMUPDF, _docai())
+
+    cache.put("k" * 64, extractions)
+
+    assert cache.get("k" * 64) == extractions
+
+
+def test_result_with_failed_chunks_is_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=10_000_000)
+    failed = [{"first_page": 16, "last_page": 30, "reason": "unexpected_error"}]
+
+    cache.put("k" * 64, (_PDFPLUMBER, _PYMUPDF, _docai(failed_chunks=failed)))
+
+    assert cache.get("k" * 64) is None
+    assert not list(tmp_path.rglob("*.json.gz"))
+
+
+def test_transiently_skipped_result_is_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=10_000_000)
+
+    cache.put("k" * 64, (_PDFPLUMBER, _PYMUPDF, _docai(skipped=True, reason="unexpected_error")))
+
+    assert cache.get("k" * 64) is None
@@ -0,0 +1,36 @@
+"""
+Memory regression: peak RSS of each extractor must stay flat between a
+small and a large synthetic contract (see benchmarks.memory_check, which
+runs each measurement in a fresh interpreter).
+"""
+from __future__ import annotations
+
+import pytest
+
+from benchmarks.memory_check import measure
+from benchmarks.synthetic import make_contract_pdf
+
+SMALL_PAGES, LARGE_PAGES = 10, 150
+# Allowed extra peak RSS for the large document
+BUDGET_MB = 16.0
+
+
+@pytest.fixture(scope="module")
+def contracts(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("memcheck")
+    small, large = str(workdir / "small.pdf"), str(workdir / "large.pdf")
+    make_contract_pdf(small, SMALL_PAGES, seed=0)
+    make_contract_pdf(large, LARGE_PAGES, seed=0)
+    return small, large
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("check", ["pdfplumber", "pymupdf", "docai"])
+def test_peak_rss_does_not_grow_with_page_count(check, contracts):
+    small, large = contracts
+
+    small_result = measure(check, small)
+    large_result = measure(check, large)
+
+    assert large_result["pages"] > small_result["pages"]
+    assert large_result["growth_mb"] - small_result["growth_mb"] <= BUDGET_MB
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from config.settings import settings
+from src.llm import gemini_client
+
+
+class _FlakyModels:
+    """generate_content() raises `errors` in turn, then answers."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+
+class _NoLimit:
+    def acquire(self, amount):
+        return 0.0
+
+    def record_usage(self, estimated, actual):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _no_waiting(monkeypatch):
+    monkeypatch.setattr(gemini_client, "get_rate_limiter", lambda: _NoLimit())
+    monkeypatch.setattr(gemini_client.time, "sleep", lambda s: None)
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 3)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.exceptions.ConnectionError("connection reset"),
+        requests.exceptions.ReadTimeout("read timed out"),
+        ConnectionResetError("connection reset"),
+    ],
+)
+def test_network_errors_are_retried(error):
+    models = _FlakyModels([error, error])
+    client = SimpleNamespace(models=models)
+
+    response = gemini_client._generate_with_retry(client, "prompt")
+
+    assert response.text == "{}"
+    assert models.calls == 3
+
+
+def test_network_errors_give_up_after_max_retries():
+    error = requests.exceptions.ConnectionError("connection reset")
+    models = _FlakyModels([error] * 10)
+    client = SimpleNamespace(models=models)
+
+    with pytest.raises(gemini_client.GeminiError, match="connection error"):
+        gemini_client._generate_with_retry(client, "prompt")
+    assert models.calls == settings.GEMINI_MAX_RETRIES + 1
+
+
+def test_response_cache_is_keyed_on_the_built_prompt(tmp_path, monkeypatch):
+    from src.llm import prompt_templates, response_cache
+
+    models = _FlakyModels([])
+    monkeypatch.setattr(gemini_client, "_get_client", lambda: SimpleNamespace(models=models))
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", True)
+    cache = response_cache.LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_seconds=3600, max_entries=100)
+    monkeypatch.setattr(response_cache, "_cache", cache)
+
+    gemini_client.generate_contract_metadata('{"fullContent": "..."}')
+    gemini_client.generate_contract_metadata('{"fullContent": "..."}')
+    assert models.calls == 1
+
+    # Same template and payload, different framing around them
+    build = prompt_templates.build_contract_metadata_prompt
+    monkeypatch.setattr(prompt_templates, "build_contract_metadata_prompt", lambda payload: build(payload) + "\n")
+    gemini_client.generate_contract_metadata('{"fullContent": "..."}')
+    assert models.calls == 2
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import pytest
+
+from config.settings import settings
+from src.models.super_json_schema import SuperJSON
+from src.pipeline import steps
+from src.storage.ledger import (
+    DONE,
+    GAVE_UP,
+    RUN,
+    STAGE_EXTRACTED,
+    STAGE_METADATA,
+    STAGE_STORED,
+    ProcessingLedger,
+)
+
+STAGES = [STAGE_EXTRACTED, STAGE_STORED]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ProcessingLedger(str(tmp_path / "ledger.sqlite"), max_attempts=2)
+
+
+@pytest.fixture
+def pdf_key(tmp_path, ledger):
+    pdf_path = tmp_path / "contract.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 not really")
+    return ledger.register(str(pdf_path))
+
+
+def test_plan_runs_only_the_stages_left(ledger, pdf_key):
+    assert ledger.plan(pdf_key, STAGES) == (RUN, STAGES)
+
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.finish(pdf_key, STAGE_EXTRACTED)
+    assert ledger.plan(pdf_key, STAGES) == (RUN, [STAGE_STORED])
+
+    ledger.start(pdf_key, STAGE_STORED)
+    ledger.finish(pdf_key, STAGE_STORED)
+    assert ledger.plan(pdf_key, STAGES) == (DONE, [])
+    assert ledger.plan(pdf_key, STAGES + [STAGE_METADATA]) == (RUN, [STAGE_METADATA])
+
+
+def test_plan_retries_then_gives_up_at_max_attempts(ledger, pdf_key):
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.fail(pdf_key, STAGE_EXTRACTED, "boom")
+    assert ledger.plan(pdf_key, STAGES) == (RUN, STAGES)
+
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.fail(pdf_key, STAGE_EXTRACTED, "boom again")
+    assert ledger.plan(pdf_key, STAGES) == (GAVE_UP, [STAGE_EXTRACTED])
+    assert ledger.failures()[0]["gave_up"] is True
+
+
+def test_fail_without_stage_only_marks_running_stages(ledger, pdf_key):
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.finish(pdf_key, STAGE_EXTRACTED)
+    ledger.start(pdf_key, STAGE_STORED)
+
+    ledger.fail(pdf_key, None, RuntimeError("killed"))
+
+    assert ledger.states(pdf_key) == {STAGE_EXTRACTED: ("done", 1), STAGE_STORED: ("failed", 1)}
+    assert ledger.failures()[0]["error"] == "killed"
+
+
+def test_reset_failed_gives_a_fresh_set_of_attempts(ledger, pdf_key):
+    for _ in range(ledger.max_attempts):
+        ledger.start(pdf_key, STAGE_EXTRACTED)
+        ledger.fail(pdf_key, STAGE_EXTRACTED, "boom")
+    assert ledger.plan(pdf_key, STAGES)[0] == GAVE_UP
+
+    assert ledger.reset_failed() == 1
+    assert ledger.plan(pdf_key, STAGES) == (RUN, STAGES)
+
+
+def test_resume_only_stores_an_already_extracted_file(tmp_path, monkeypatch, ledger, pdf_key):
+    super_json = SuperJSON(
+        doc_id="contract-1234abcd", filename="contract.pdf", source_path="contract.pdf", num_pages=1
+    )
+    output_path = tmp_path / "contract-1234abcd.json"
+    output_path.write_text(super_json.model_dump_json(), encoding="utf-8")
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.finish(pdf_key, STAGE_EXTRACTED, doc_id=super_json.doc_id, output_path=str(output_path))
+
+    stored = []
+
+    def fake_save(doc, on_stored=None):
+        stored.append(doc.doc_id)
+        on_stored(True, None)
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("an extracted file must not be extracted again")
+
+    monkeypatch.setattr(steps, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(steps, "save_super_json", fake_save)
+    monkeypatch.setattr(steps, "build_and_store_super_json", no_rebuild)
+
+    _, pending = ledger.plan(pdf_key, STAGES)
+    result = steps.resume_super_json("contract.pdf", pdf_key, pending, str(tmp_path))
+
+    assert result.doc_id == super_json.doc_id
+    assert stored == [super_json.doc_id]
+    assert ledger.plan(pdf_key, STAGES) == (DONE, [])
+
+
+def test_sqlite_backend_does_not_count_as_stored_in_bigquery(tmp_path, monkeypatch, ledger, pdf_key):
+    super_json = SuperJSON(
+        doc_id="contract-1234abcd", filename="contract.pdf", source_path="contract.pdf", num_pages=1
+    )
+    output_path = tmp_path / "contract-1234abcd.json"
+    output_path.write_text(super_json.model_dump_json(), encoding="utf-8")
+    ledger.start(pdf_key, STAGE_EXTRACTED)
+    ledger.finish(pdf_key, STAGE_EXTRACTED, doc_id=super_json.doc_id, output_path=str(output_path))
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(steps, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(steps, "save_super_json", lambda doc, on_stored=None: on_stored(True, None))
+    steps.resume_super_json("contract.pdf", pdf_key, [STAGE_STORED], str(tmp_path))
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "bigquery")
+    assert ledger.plan(pdf_key, STAGES) == (RUN, [STAGE_STORED])
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from src.metrics.recorder import MetricsRecorder
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = MetricsRecorder()
+    metrics.skip("store_bq", 'quota "exceeded"\nretry in C:\\tmp')
+
+    text = metrics.prometheus_text(metrics.summary(command="process-batch"))
+
+    assert (
+        'pdf_pipeline_stage_skips{command="process-batch",stage="store_bq",'
+        'reason="quota \\"exceeded\\"\\nretry in C:\\\\tmp"} 1'
+    ) in text.splitlines()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from src.llm.payload_builder import canonical_page_texts
+from src.pdf_ingestion.normalizer.canonical import canonical_sources
+from src.pdf_ingestion.normalizer.merging import merge_extractions
+
+
+def _extraction(source, pages):
+    return {
+        "meta": {"tool": source, "num_pages": len(pages)},
+        "text_spans": [{"page": page, "text": text, "source": source} for page, text in pages.items()],
+        "tables": [],
+    }
+
+
+def test_merger_and_payload_pick_the_same_canonical_source():
+    # Lots of word characters but little real text (underscores of a form)
+    # against a shorter, cleaner OCR reading
+    pymupdf = _extraction("pymupdf", {1: "______ ______ ______ ______ x"})
+    docai = _extraction("docai", {1: "Supplier agreement"})
+
+    merged = merge_extractions(_extraction("pdfplumber", {}), pymupdf, docai)
+    chosen = merged["meta"]["provenance"]["text"]["1"]["chosen"]
+
+    assert chosen == canonical_sources(merged["text_spans"])[1] == "docai"
+    assert canonical_page_texts(merged["text_spans"])[1] == "Supplier agreement"
+
+
+def test_ties_follow_source_preference():
+    spans = [
+        {"page": 1, "text": "same text", "source": "docai"},
+        {"page": 1, "text": "same text", "source": "pymupdf"},
+    ]
+
+    assert canonical_sources(spans) == {1: "pymupdf"}
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from benchmarks.synthetic import make_contract_pdf
+from config.settings import settings
+from src.pdf_ingestion.routing import plan_extraction
+
+
+def test_page_parallel_plan_matches_single_process(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "contract.pdf")
+    make_contract_pdf(pdf_path, 12, seed=0)
+    monkeypatch.setattr(settings, "PAGE_PARALLEL_MIN_PAGES", 1)
+
+    single_plan, single_data = plan_extraction(pdf_path, page_workers=1)
+    parallel_plan, parallel_data = plan_extraction(pdf_path, page_workers=3)
+
+    assert parallel_data["meta"]["page_parallel_chunks"] == 3
+    assert parallel_plan == single_plan
+    assert parallel_data["text_spans"] == single_data["text_spans"]
+    assert len(single_plan["decisions"]) == 12